@@ -13,6 +13,11 @@ public class MlSuggestionsResponse
     public List<MlCandidateDto> CategoryCandidates { get; set; } = new();
 }
 
+public class MlBatchSuggestionsResponse
+{
+    public List<MlSuggestionsResponse> Results { get; set; } = new();
+}
+
 public class MlPredictionResult
 {
     public Guid? TypeId { get; set; }
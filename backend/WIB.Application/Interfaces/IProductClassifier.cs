@@ -5,5 +5,17 @@ namespace WIB.Application.Interfaces;
 public interface IProductClassifier
 {
     Task<MlPredictionResult> PredictAsync(string labelRaw, CancellationToken ct);
+
+    /// <summary>
+    /// Classifies all labels of a receipt in one call. Results are in the same order as <paramref name="labels"/>.
+    /// The default implementation falls back to one <see cref="PredictAsync"/> per label.
+    /// </summary>
+    async Task<IReadOnlyList<MlPredictionResult>> PredictBatchAsync(IReadOnlyList<string> labels, CancellationToken ct)
+    {
+        var results = new List<MlPredictionResult>(labels.Count);
+        foreach (var label in labels)
+            results.Add(await PredictAsync(label, ct));
+        return results;
+    }
     Task FeedbackAsync(string labelRaw, string? brand, Guid typeId, Guid? categoryId, CancellationToken ct);
 }
@@ -2,6 +2,7 @@ using System;
 using System.IO;
 using System.Threading;
 using System.Threading.Tasks;
+using WIB.Application.Contracts.Ml;
 using WIB.Application.Interfaces;
 
 namespace WIB.Application.Receipts
@@ -137,22 +138,36 @@ namespace WIB.Application.Receipts
             }
 
             var idx = 0;
-            var mlCallCount = 0;
-            foreach (var l in kie.Lines)
+            var productLines = kie.Lines.Where(l => !LooksLikeTotalOrPayment(l.LabelRaw ?? string.Empty)).ToList();
+
+            // One ML round trip for the whole receipt; on failure each line falls back to a single prediction
+            IReadOnlyList<MlPredictionResult>? predictions = null;
+            if (productLines.Count > 0)
             {
-                if (LooksLikeTotalOrPayment(l.LabelRaw ?? string.Empty))
-                    continue;
+                try
+                {
+                    if (_redisLogger != null)
+                        await _redisLogger.InfoAsync("Calling ML Service", "Starting ML classification for receipt lines", new Dictionary<string, object> { ["objectKey"] = objectKey ?? "<null>", ["lineCount"] = productLines.Count }, ct);
+                    predictions = await _classifier.PredictBatchAsync(productLines.Select(l => l.LabelRaw ?? string.Empty).ToList(), ct);
+                }
+                catch (Exception ex)
+                {
+                    if (_redisLogger != null)
+                        await _redisLogger.WarningAsync("ML Batch Classification Failed", "Falling back to per-line classification", new Dictionary<string, object> { ["objectKey"] = objectKey ?? "<null>", ["error"] = ex.Message }, ct);
+                }
+            }
 
+            for (var lineIdx = 0; lineIdx < productLines.Count; lineIdx++)
+            {
+                var l = productLines[lineIdx];
                 var corrected = await _names.CorrectProductLabelAsync(l.LabelRaw ?? string.Empty, ct);
                 var labelRaw = (corrected ?? l.LabelRaw) ?? string.Empty;
 
                 try
                 {
-                    mlCallCount++;
-                    if (_redisLogger != null && mlCallCount == 1)
-                        await _redisLogger.InfoAsync("Calling ML Service", "Starting ML classification for receipt lines", new Dictionary<string, object> { ["objectKey"] = objectKey ?? "<null>", ["lineCount"] = kie.Lines.Count }, ct);
-
-                    var pred = await _classifier.PredictAsync(l.LabelRaw ?? string.Empty, ct);
+                    var pred = predictions != null
+                        ? predictions[lineIdx]
+                        : await _classifier.PredictAsync(l.LabelRaw ?? string.Empty, ct);
                     var typeId = pred.TypeId;
                     var categoryId = pred.CategoryId;
                     var confidence = pred.Confidence;
@@ -18,6 +18,25 @@ public class ProductClassifier : IProductClassifier
         using var resp = await _http.PostAsJsonAsync("/predict", new { labelRaw }, ct);
         resp.EnsureSuccessStatusCode();
         var sugg = await resp.Content.ReadFromJsonAsync<MlSuggestionsResponse>(cancellationToken: ct);
+        return ToPrediction(sugg);
+    }
+
+    public async Task<IReadOnlyList<MlPredictionResult>> PredictBatchAsync(IReadOnlyList<string> labels, CancellationToken ct)
+    {
+        if (labels.Count == 0)
+            return Array.Empty<MlPredictionResult>();
+        var body = new { items = labels.Select(l => new { labelRaw = l }) };
+        using var resp = await _http.PostAsJsonAsync("/predict/batch", body, ct);
+        resp.EnsureSuccessStatusCode();
+        var batch = await resp.Content.ReadFromJsonAsync<MlBatchSuggestionsResponse>(cancellationToken: ct);
+        var results = batch?.Results ?? new List<MlSuggestionsResponse>();
+        if (results.Count != labels.Count)
+            throw new InvalidOperationException($"ML batch prediction returned {results.Count} results for {labels.Count} labels");
+        return results.Select(ToPrediction).ToList();
+    }
+
+    private static MlPredictionResult ToPrediction(MlSuggestionsResponse? sugg)
+    {
         Guid? typeId = sugg?.TypeCandidates?.FirstOrDefault()?.Id;
         Guid? catId = sugg?.CategoryCandidates?.FirstOrDefault()?.Id;
         float conf = 0f;
@@ -0,0 +1,59 @@
+using System.Net;
+using System.Net.Http;
+using System.Text;
+using System.Text.Json;
+using WIB.Infrastructure.Clients;
+using Xunit;
+
+namespace WIB.Tests;
+
+public class ProductClassifierTests
+{
+    private static readonly Guid MilkType = Guid.Parse("00000000-0000-0000-0000-000000000001");
+    private static readonly Guid DairyCategory = Guid.Parse("00000000-0000-0000-0000-0000000000c8");
+
+    private sealed class FakeHandler : HttpMessageHandler
+    {
+        public List<string> Paths { get; } = new();
+
+        protected override Task<HttpResponseMessage> SendAsync(HttpRequestMessage request, CancellationToken cancellationToken)
+        {
+            Paths.Add(request.RequestUri!.AbsolutePath);
+            var json = JsonSerializer.Serialize(new
+            {
+                results = new object[]
+                {
+                    new
+                    {
+                        typeCandidates = new[] { new { id = MilkType, name = "", conf = 0.9f } },
+                        categoryCandidates = new[] { new { id = DairyCategory, name = "", conf = 0.7f } }
+                    },
+                    new { typeCandidates = Array.Empty<object>(), categoryCandidates = Array.Empty<object>() }
+                }
+            });
+            var resp = new HttpResponseMessage(HttpStatusCode.OK)
+            {
+                Content = new StringContent(json, Encoding.UTF8, "application/json")
+            };
+            return Task.FromResult(resp);
+        }
+    }
+
+    [Fact]
+    public async Task PredictBatchAsync_Uses_Single_Round_Trip_And_Preserves_Order()
+    {
+        var handler = new FakeHandler();
+        var http = new HttpClient(handler) { BaseAddress = new Uri("http://test") };
+        var client = new ProductClassifier(http);
+
+        var results = await client.PredictBatchAsync(new[] { "LATTE 1L", "???" }, CancellationToken.None);
+
+        Assert.Equal(new[] { "/predict/batch" }, handler.Paths);
+        Assert.Equal(2, results.Count);
+        Assert.Equal(MilkType, results[0].TypeId);
+        Assert.Equal(DairyCategory, results[0].CategoryId);
+        Assert.Equal(0.9f, results[0].Confidence);
+        Assert.Null(results[1].TypeId);
+        Assert.Equal(0f, results[1].Confidence);
+    }
+}
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Add shared module to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from shared.normalize import normalize_label
+
+
+@dataclass
+class Example:
+    """One distinct (text, brand, type, category) of a batch with the number of records behind it."""
+
+    labelRaw: str
+    brand: Optional[str]
+    finalTypeId: str
+    finalCategoryId: Optional[str]
+    weight: float
+    seqs: List[int]
+
+
+class FeedbackAggregator:
+    """Coalesces feedback before it reaches the models.
+
+    aggregate() normalizes label and brand and merges identical (text, brand, type, category)
+    records of a batch into one weighted example, so the trainer featurizes and fits each distinct
+    correction once with sample_weight = its count.
+
+    It also remembers, for `window` seconds and at most `max_texts` texts, which (type, category)
+    pairs each text was confirmed with; a text confirmed with two different pairs inside the
+    window is a conflict, counted and kept in `conflicts` (most recent last) for inspection.
+    """
+
+    def __init__(self, window: float = 3600.0, max_texts: int = 100_000, max_conflicts: int = 100):
+        self.window = window
+        self.max_texts = max_texts
+        self.max_conflicts = max_conflicts
+        self._recent: "OrderedDict[Tuple[str, Optional[str]], Dict[Tuple[str, Optional[str]], list]]" = OrderedDict()
+        self.conflicts: "OrderedDict[Tuple[str, Optional[str]], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.records = 0
+        self.examples = 0
+        self.conflict_count = 0
+
+    def aggregate(self, records: Sequence[dict], seqs: Sequence[int], track: bool = True) -> List[Example]:
+        groups: "OrderedDict[tuple, Example]" = OrderedDict()
+        for record, seq in zip(records, seqs):
+            label = normalize_label(record["labelRaw"])
+            brand = normalize_label(record["brand"]) if record.get("brand") else None
+            key = (label, brand, record["finalTypeId"], record.get("finalCategoryId") or None)
+            example = groups.get(key)
+            if example is None:
+                groups[key] = Example(label, brand, key[2], key[3], 1.0, [seq])
+            else:
+                example.weight += 1.0
+                example.seqs.append(seq)
+        examples = list(groups.values())
+        with self._lock:
+            self.records += len(records)
+            self.examples += len(examples)
+            if track:
+                self._track(examples)
+        return examples
+
+    def _track(self, examples: List[Example]):
+        now = time.monotonic()
+        for ex in examples:
+            text = (ex.labelRaw, ex.brand)
+            seen = self._recent.pop(text, {})
+            seen = {pair: entry for pair, entry in seen.items() if now - entry[1] <= self.window}
+            pair = (ex.finalTypeId, ex.finalCategoryId)
+            count = seen.get(pair, [0.0, now])[0] + ex.weight
+            seen[pair] = [count, now]
+            self._recent[text] = seen
+            if len(seen) > 1:
+                self.conflict_count += 1
+                self.conflicts.pop(text, None)
+                self.conflicts[text] = {
+                    "labelRaw": ex.labelRaw, "brand": ex.brand,
+                    "labels": [{"finalTypeId": t, "finalCategoryId": c, "count": e[0]}
+                               for (t, c), e in sorted(seen.items(), key=lambda p: -p[1][0])],
+                }
+                while len(self.conflicts) > self.max_conflicts:
+                    self.conflicts.popitem(last=False)
+        while len(self._recent) > self.max_texts:
+            self._recent.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "records": self.records, "examples": self.examples,
+                "coalesced": self.records - self.examples,
+                "ratio": round(self.examples / self.records, 4) if self.records else None,
+                "conflicts": self.conflict_count,
+                "recentConflicts": list(reversed(self.conflicts.values())),
+            }
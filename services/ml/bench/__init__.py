@@ -0,0 +1,15 @@
+from .synth import SynthConfig, build_catalog, catalog_records, generate_records, load_records, ocr_noise, write_records
+from .run import compare_results, run_benchmark, save_results
+
+__all__ = [
+    "SynthConfig",
+    "build_catalog",
+    "catalog_records",
+    "generate_records",
+    "load_records",
+    "ocr_noise",
+    "write_records",
+    "compare_results",
+    "run_benchmark",
+    "save_results",
+]
@@ -0,0 +1,62 @@
+"""CLI: python -m services.ml.bench {generate,run} ...
+
+  generate --out FILE --count N [--types T]   write a synthetic labelled corpus (NDJSON, /feedback schema)
+  run [--sizes 100,300,1000] [--http N]       profile ModelManager (and the HTTP endpoints) at growing
+      [--compare BASE.json]                   catalog sizes and save a JSON report
+"""
+import argparse
+import json
+import sys
+
+from .run import compare_results, format_report, run_benchmark, save_results
+from .synth import SynthConfig, write_records
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m services.ml.bench")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    gen = sub.add_parser("generate", help="write a synthetic product-label corpus")
+    gen.add_argument("--out", default=".data/bench/ml_corpus.ndjson")
+    gen.add_argument("--count", type=int, default=10000)
+    gen.add_argument("--types", type=int, default=1000)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--noise", type=float, default=0.03, help="per-character OCR confusion rate")
+    gen.add_argument("--zipf", type=float, default=1.1, help="popularity exponent")
+
+    run = sub.add_parser("run", help="profile latency, throughput, artifact size and memory per catalog size")
+    run.add_argument("--sizes", default="100,300,1000", help="comma-separated numbers of product types")
+    run.add_argument("--records-per-type", type=int, default=5)
+    run.add_argument("--feedback", type=int, default=200, help="single corrections timed per size")
+    run.add_argument("--queries", type=int, default=500, help="held-out labels predicted per size")
+    run.add_argument("--batch", type=int, default=20, help="labels per /predict/batch-style call")
+    run.add_argument("--http", type=int, default=0, help="also time this many HTTP requests per endpoint")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--noise", type=float, default=0.03)
+    run.add_argument("--zipf", type=float, default=1.1)
+    run.add_argument("--out", default=".data/bench/results")
+    run.add_argument("--compare", help="previous report to diff against")
+
+    args = ap.parse_args(argv)
+    cfg = SynthConfig(noise=args.noise, zipf=args.zipf)
+    if args.cmd == "generate":
+        cfg.types = args.types
+        path = write_records(args.out, args.count, cfg, seed=args.seed)
+        print(f"wrote {args.count} records ({args.types} types) to {path}")
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    report = run_benchmark(sizes, records_per_type=args.records_per_type, cfg=cfg, feedback=args.feedback,
+                           queries=args.queries, batch=args.batch, http=args.http, seed=args.seed)
+    path = save_results(report, args.out)
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            comparison = compare_results(json.load(f), report)
+    print(format_report(report, comparison))
+    print(f"saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
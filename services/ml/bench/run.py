@@ -0,0 +1,287 @@
+"""ML service load profile: how latency, throughput, artifact size and memory scale with the catalog.
+
+For each size (number of product types) a fresh ModelManager in a temporary MODEL_DIR is
+bulk-loaded with a synthetic corpus (every product once, then Zipfian repeats), then measured:
+
+  bulk      train_batch() mini-batches, examples/s
+  feedback  single corrections through feedback(): latency of each one (until visible to
+            predictions) and updates/s, both one at a time and with every update queued at once
+  predict   single-label latency on fresh noisy labels, with the prediction cache bypassed
+            (model cost) and enabled (Zipfian traffic), plus receipt-sized batches and top-1 accuracy
+  save      checkpoint() time and the size of the checkpoint on disk
+  memory    process RSS after the size and peak RSS
+  http      optional: POST /predict and POST /feedback through the FastAPI app (TestClient)
+
+Results are plain JSON (one file per run, tagged with the git commit) so that two runs
+can be compared with compare_results().
+"""
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ..checkpoint import latest_checkpoint
+from .synth import SynthConfig, build_catalog, catalog_records, generate_records
+
+# Metrics compared between two reports: (section, statistic)
+COMPARED = (("predict", "p50"), ("predict", "p99"), ("feedback", "p50"), ("feedback", "p99"),
+            ("httpPredict", "p50"), ("httpPredict", "p99"), ("httpFeedback", "p50"), ("httpFeedback", "p99"))
+
+
+def percentiles(samples_ms: list[float]) -> dict:
+    if not samples_ms:
+        return {"count": 0}
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "count": int(arr.size),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size (Linux); peak RSS never goes down, so it hides what a size releases."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def _timed_ms(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - t0) * 1000
+
+
+@contextmanager
+def _uncached(manager):
+    """Bypass the prediction cache, to time the model rather than a dict lookup."""
+    capacity, manager.cache.capacity = manager.cache.capacity, 0
+    try:
+        yield
+    finally:
+        manager.cache.capacity = capacity
+
+
+def _app_module(model_dir: str):
+    """Import the service once; its module-level manager is replaced per size, the app is reused."""
+    # The service reads its configuration at import: point it at a scratch dir (never the real
+    # model) and keep the Redis logger quiet, otherwise every request pays for a failed publish
+    if "services.ml.main" not in sys.modules:
+        os.environ["MODEL_DIR"] = model_dir
+        os.environ.setdefault("LOG_LEVEL", "ERROR")
+    import services.ml.main as mlmod
+
+    mlmod.manager.wait_ready()
+    return mlmod
+
+
+def _bench_size(mlmod, types: int, records_per_type: int, cfg: SynthConfig, feedback: int, queries: int,
+                batch: int, http: int, seed: int, work_dir: Path) -> dict:
+    cfg = SynthConfig(**{**cfg.__dict__, "types": types})
+    catalog = build_catalog(cfg, seed)
+    # Every product once (so every type reaches the model), then Zipfian repeats
+    records = catalog_records(catalog, cfg, seed)
+    records += generate_records(max(0, types * records_per_type - len(catalog)), cfg, seed + 10, catalog)
+    feedback = min(feedback, len(records) // 4)
+    stream, online = records[:len(records) - 2 * feedback], records[len(records) - 2 * feedback:]
+    held_out = generate_records(queries, cfg, seed + 20, catalog)
+
+    model_dir = work_dir / f"types-{types}"
+    result: dict = {"types": types, "records": len(records), "products": len(catalog)}
+    t0 = time.perf_counter()
+    manager = mlmod.ModelManager(str(model_dir), top_k=3)
+    result["startSeconds"] = round(time.perf_counter() - t0, 3)
+    try:
+        step = mlmod.STREAM_BATCH
+        t0 = time.perf_counter()
+        futures = [manager.train_batch(stream[i:i + step], publish=i + step >= len(stream))
+                   for i in range(0, len(stream), step)]
+        for fut in futures:
+            fut.result()
+        seconds = time.perf_counter() - t0
+        result["bulk"] = {"examples": len(stream), "seconds": round(seconds, 3),
+                          "examplesPerSecond": round(len(stream) / seconds, 1) if seconds else None}
+        result["classes"] = {"types": len(manager.type_labels), "categories": len(manager.cat_labels)}
+
+        # One correction at a time: each waits until the snapshot with it is published
+        samples = []
+        t0 = time.perf_counter()
+        for r in online[:feedback]:
+            samples.append(_timed_ms(lambda: manager.feedback(r["labelRaw"], r["brand"], r["finalTypeId"],
+                                                              r["finalCategoryId"]).result()))
+        seconds = time.perf_counter() - t0
+        result["feedback"] = percentiles(samples)
+        result["updatesPerSecond"] = {"sequential": round(feedback / seconds, 1) if seconds and feedback else None}
+        # The same load queued at once: the trainer coalesces it into batches
+        t0 = time.perf_counter()
+        futures = [manager.submit([r]) for r in online[feedback:]]
+        for fut in futures:
+            fut.result()
+        seconds = time.perf_counter() - t0
+        result["updatesPerSecond"]["queued"] = round(len(futures) / seconds, 1) if seconds and futures else None
+
+        labels = [(r["labelRaw"], r["brand"]) for r in held_out]
+        with _uncached(manager):
+            result["predict"] = percentiles([_timed_ms(manager.predict, *item) for item in labels])
+            result["predictBatch"] = percentiles([_timed_ms(manager.predict_batch, labels[i:i + batch])
+                                                  for i in range(0, len(labels), batch)])
+            result["predictBatch"]["batchSize"] = batch
+            top1 = [t[0].id if t else None for t, _ in manager.predict_batch(labels)]
+        hits = manager.cache.hits
+        result["predictCached"] = percentiles([_timed_ms(manager.predict, *item) for item in labels])
+        result["predictCached"]["hitRate"] = round((manager.cache.hits - hits) / len(labels), 4) if labels else None
+        result["top1Accuracy"] = round(float(np.mean([p == r["finalTypeId"] for p, r in zip(top1, held_out)])), 4)
+
+        t0 = time.perf_counter()
+        manager.checkpoint()
+        result["save"] = {"seconds": round(time.perf_counter() - t0, 3)}
+        latest = latest_checkpoint(model_dir)
+        result["save"]["checkpointBytes"] = dir_bytes(latest[0]) if latest else 0
+        result["save"]["walBytes"] = manager.feedback_path.stat().st_size
+
+        if http:
+            result.update(_bench_http(mlmod, manager, held_out[:http], seed))
+        result["rssMb"] = rss_mb()
+    finally:
+        manager.close()
+        shutil.rmtree(model_dir, ignore_errors=True)
+    return result
+
+
+def _bench_http(mlmod, manager, records: list[dict], seed: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    served, mlmod.manager = mlmod.manager, manager
+    try:
+        client = TestClient(mlmod.app)
+        with _uncached(manager):
+            predict = [_timed_ms(lambda: client.post("/predict", json={"labelRaw": r["labelRaw"], "brand": r["brand"]}))
+                       for r in records]
+        # Corrections flip some types so that the updates are real work, not confirmations
+        rnd = random.Random(seed)
+        types = manager.type_labels
+        feedback = []
+        for r in records:
+            body = {**r, "finalTypeId": rnd.choice(types) if rnd.random() < 0.2 else r["finalTypeId"]}
+            t0 = time.perf_counter()
+            client.post("/feedback", json=body)
+            feedback.append((time.perf_counter() - t0) * 1000)
+        return {"httpPredict": percentiles(predict), "httpFeedback": percentiles(feedback)}
+    finally:
+        mlmod.manager = served
+
+
+def run_benchmark(sizes: Sequence[int] = (100, 300, 1000), records_per_type: int = 5,
+                  cfg: Optional[SynthConfig] = None, feedback: int = 200, queries: int = 500, batch: int = 20,
+                  http: int = 0, seed: int = 0) -> dict:
+    """Profile the service at each catalog size; `http` > 0 also times that many HTTP requests per endpoint."""
+    cfg = cfg or SynthConfig()
+    work_dir = Path(tempfile.mkdtemp(prefix="ml-bench-"))
+    try:
+        mlmod = _app_module(str(work_dir / "service"))
+        results = []
+        for types in sizes:
+            results.append(_bench_size(mlmod, types, records_per_type, cfg, feedback, queries, batch, http, seed,
+                                       work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "sizes": list(sizes), "recordsPerType": records_per_type, "synth": dict(cfg.__dict__),
+            "feedback": feedback, "queries": queries, "batch": batch, "http": http, "seed": seed,
+            "hashFeatures": mlmod.HASH_FEATURES, "classifierMode": mlmod.CLASSIFIER_MODE,
+            "sgdNegatives": mlmod.SGD_NEGATIVES, "compiledInference": mlmod.COMPILED_INFERENCE, "knnMode": mlmod.KNN_MODE,
+        },
+        "sizes": results,
+        "peakRssMb": peak_rss_mb(),
+    }
+
+
+def save_results(report: dict, out_dir: str, prefix: str = "ml") -> Path:
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    stamp = report["timestamp"].replace(":", "").replace("-", "")[:15]
+    path = out / f"{prefix}-{report['commit']}-{stamp}.json"
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return path
+
+
+def compare_results(base: dict, head: dict) -> list[dict]:
+    """Latency deltas per size present in both reports; positive deltaPct means head is slower."""
+    before = {s["types"]: s for s in base.get("sizes", [])}
+    rows = []
+    for size in head.get("sizes", []):
+        old = before.get(size["types"])
+        if old is None:
+            continue
+        for section, m in COMPARED:
+            a, b = old.get(section, {}).get(m), size.get(section, {}).get(m)
+            if a and b is not None:
+                rows.append({"types": size["types"], "metric": f"{section}.{m}", "base": a, "head": b,
+                             "deltaPct": round((b - a) / a * 100, 1)})
+    return rows
+
+
+def format_report(report: dict, comparison: Optional[list[dict]] = None) -> str:
+    c = report["config"]
+    lines = [f"commit {report['commit']}  sizes={c['sizes']}  recordsPerType={c['recordsPerType']}  "
+             f"hashFeatures={c['hashFeatures']}"]
+    for s in report["sizes"]:
+        p, f, u, save = s["predict"], s["feedback"], s["updatesPerSecond"], s["save"]
+        lines.append(f"  types={s['types']:<6} classes={s['classes']['types']}/{s['classes']['categories']}  "
+                     f"records={s['records']}  top1={s['top1Accuracy']}")
+        lines.append(f"    predict   p50={p['p50']:>8.3f}ms  p99={p['p99']:>8.3f}ms  "
+                     f"cached p50={s['predictCached']['p50']:.3f}ms (hit {s['predictCached']['hitRate']})")
+        lines.append(f"    feedback  p50={f.get('p50', 0):>8.3f}ms  p99={f.get('p99', 0):>8.3f}ms  "
+                     f"{u['sequential']} upd/s sequential, {u['queued']} upd/s queued")
+        lines.append(f"    bulk      {s['bulk']['examplesPerSecond']} ex/s  save {save['seconds']}s  "
+                     f"checkpoint {save['checkpointBytes'] / 2 ** 20:.1f} MB  rss {s['rssMb']} MB")
+        for name in ("httpPredict", "httpFeedback"):
+            if name in s:
+                lines.append(f"    {name:<13} p50={s[name]['p50']:>8.3f}ms  p99={s[name]['p99']:>8.3f}ms")
+    lines.append(f"  peak RSS {report['peakRssMb']} MB")
+    for row in comparison or []:
+        lines.append(f"  types={row['types']:<6} {row['metric']:<17} {row['base']:.3f} -> {row['head']:.3f} ms "
+                     f"({row['deltaPct']:+.1f}%)")
+    return "\n".join(lines)
@@ -0,0 +1,142 @@
+"""Synthetic product-label corpora for the ML benchmark.
+
+A catalog of `types` product types (noun + qualifiers, one category per noun) with a few
+products each (brand, size); records draw products with Zipfian popularity, as on real
+receipts where a handful of products dominate, and print their label through OCR-style noise.
+Records use the /feedback schema (labelRaw, brand, finalTypeId, finalCategoryId).
+"""
+import json
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+NOUNS = [
+    "LATTE", "YOGURT", "PANE", "PASTA", "RISO", "BISCOTTI", "CAFFE", "ACQUA", "BIRRA", "VINO", "FORMAGGIO",
+    "PROSCIUTTO", "MOZZARELLA", "BURRO", "UOVA", "OLIO", "PASSATA", "TONNO", "MELE", "BANANE", "POMODORI",
+    "INSALATA", "DETERSIVO", "SHAMPOO", "CARTA", "SUCCO", "GELATO", "CIOCCOLATO", "SALAME", "CRACKERS",
+    "FARINA", "ZUCCHERO", "SALE", "AMMORBIDENTE", "DENTIFRICIO", "PATATE", "CAROTE", "PIZZA", "TE", "MERENDINE",
+]
+QUALIFIERS = [
+    "INTERO", "PS", "BIO", "INTEGRALE", "LIGHT", "CLASSICO", "FRESCO", "ZERO", "MINI", "GRAN", "ROSSO", "BIANCO",
+    "DOLCE", "NATURALE", "FRIZZANTE", "COTTO", "CRUDO", "STAGIONATO", "EXTRA", "DELICATO", "FORTE", "ARANCIA",
+    "LIMONE", "FRAGOLA", "VANIGLIA", "CLASSICA", "GRECO", "SENZA LATTOSIO", "PROTEICO", "FAMIGLIA",
+]
+BRANDS = [
+    "COOP", "CONAD", "ESSELUNGA", "BARILLA", "GRANAROLO", "PARMALAT", "LAVAZZA", "MULINO BIANCO", "DE CECCO",
+    "RIO MARE", "MUTTI", "SAN BENEDETTO", "PERONI", "MENABREA", "GALBANI", "CAMPOFRIO", "DIXAN", "PANTENE",
+]
+SIZES = ["1L", "0,5L", "1,5L", "500G", "250 G", "1KG", "125GX2", "6X1,5L", "33CL", "X4", "X6", "200ML", "750ML", "KG"]
+
+# Typical thermal-printer/OCR confusions, applied per character at the noise rate
+CONFUSIONS = {"O": "0", "0": "O", "S": "5", "5": "S", "I": "1", "1": "I", "L": "1", "B": "8", "8": "B", "E": "F",
+              "G": "6", "Z": "2"}
+
+
+@dataclass
+class SynthConfig:
+    types: int = 1000
+    products_per_type: int = 3
+    zipf: float = 1.1  # popularity exponent: weight of the product at rank r is 1 / r**zipf
+    noise: float = 0.03  # per-character OCR confusion rate
+    brand_rate: float = 0.6  # share of products sold under a brand
+    max_label_chars: int = 28  # receipt column width; longer labels are truncated
+
+
+@dataclass(frozen=True)
+class Product:
+    label: str
+    brand: Optional[str]
+    type_id: str
+    category_id: str
+
+
+def build_catalog(cfg: SynthConfig, seed: int = 0) -> List[Product]:
+    """`cfg.types` distinct types with `cfg.products_per_type` products each, shuffled by popularity rank."""
+    q = len(QUALIFIERS)
+    if cfg.types > len(NOUNS) * (q + q * (q - 1) // 2) // 2:
+        raise ValueError(f"cannot build {cfg.types} distinct types from the word pools")
+    rnd = random.Random(seed)
+    seen = set()
+    products: List[Product] = []
+    while len(seen) < cfg.types:
+        noun = rnd.choice(NOUNS)
+        words = tuple(sorted(rnd.sample(QUALIFIERS, rnd.randint(1, 2))))
+        if (noun, words) in seen:
+            continue
+        seen.add((noun, words))
+        type_id = f"t-{len(seen):05d}"
+        for _ in range(cfg.products_per_type):
+            brand = rnd.choice(BRANDS) if rnd.random() < cfg.brand_rate else None
+            label = " ".join((noun, *words, rnd.choice(SIZES)))
+            products.append(Product(label, brand, type_id, f"c-{noun.lower()}"))
+    rnd.shuffle(products)
+    return products
+
+
+def ocr_noise(text: str, rnd: random.Random, rate: float, max_chars: int = 0) -> str:
+    """Character confusions, dropped spaces/dots and column truncation, roughly as Tesseract returns them."""
+    out = []
+    for ch in text:
+        r = rnd.random()
+        if r < rate and ch in CONFUSIONS:
+            out.append(CONFUSIONS[ch])
+        elif r < rate * 1.5 and ch in " .":
+            continue
+        else:
+            out.append(ch)
+    noisy = "".join(out)
+    if max_chars and len(noisy) > max_chars:
+        noisy = noisy[:max_chars].rstrip()
+    return noisy
+
+
+def zipf_weights(n: int, s: float) -> np.ndarray:
+    w = 1.0 / np.arange(1, n + 1) ** s
+    return w / w.sum()
+
+
+def iter_records(count: int, cfg: Optional[SynthConfig] = None, seed: int = 0,
+                 catalog: Optional[List[Product]] = None) -> Iterator[dict]:
+    cfg = cfg or SynthConfig()
+    catalog = catalog if catalog is not None else build_catalog(cfg, seed)
+    rnd = random.Random(seed + 1)
+    picks = np.random.default_rng(seed + 1).choice(len(catalog), size=count, p=zipf_weights(len(catalog), cfg.zipf))
+    for i in picks:
+        p = catalog[i]
+        yield {
+            "labelRaw": ocr_noise(p.label, rnd, cfg.noise, cfg.max_label_chars),
+            "brand": p.brand,
+            "finalTypeId": p.type_id,
+            "finalCategoryId": p.category_id,
+        }
+
+
+def catalog_records(catalog: List[Product], cfg: Optional[SynthConfig] = None, seed: int = 0) -> List[dict]:
+    """One noisy record per product, in catalog order: covers every type regardless of popularity."""
+    cfg = cfg or SynthConfig()
+    rnd = random.Random(seed + 2)
+    return [{"labelRaw": ocr_noise(p.label, rnd, cfg.noise, cfg.max_label_chars), "brand": p.brand,
+             "finalTypeId": p.type_id, "finalCategoryId": p.category_id} for p in catalog]
+
+
+def generate_records(count: int, cfg: Optional[SynthConfig] = None, seed: int = 0,
+                     catalog: Optional[List[Product]] = None) -> List[dict]:
+    return list(iter_records(count, cfg, seed, catalog))
+
+
+def write_records(path: str, count: int, cfg: Optional[SynthConfig] = None, seed: int = 0) -> Path:
+    """NDJSON in the /feedback schema, directly usable with POST /train/stream?path=..."""
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open("w", encoding="utf-8") as f:
+        for record in iter_records(count, cfg, seed):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return out
+
+
+def load_records(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+POINTER = "CHECKPOINT"
+
+
+def write_checkpoint(model_dir: Path, wal_seq: int, save: Callable[[Path], None], keep: int = 2,
+                     extra: Optional[dict] = None) -> Path:
+    """Write a complete checkpoint directory, then switch the CHECKPOINT pointer to it.
+
+    save(dir) writes the artifacts into a private temporary directory, which is renamed into
+    place (atomic on one filesystem) before the pointer file is atomically replaced, so readers
+    and crash recovery only ever see a fully written checkpoint.
+    """
+    root = Path(model_dir) / "checkpoints"
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / f".tmp-{uuid.uuid4().hex}"
+    tmp.mkdir()
+    try:
+        save(tmp)
+        meta = {**(extra or {}), "walSeq": wal_seq, "createdAt": datetime.now(timezone.utc).isoformat()}
+        (tmp / "checkpoint.json").write_text(json.dumps(meta))
+        final = root / f"ckpt-{wal_seq:012d}-{uuid.uuid4().hex[:6]}"
+        os.rename(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    pointer_tmp = Path(model_dir) / f".{POINTER}.tmp"
+    pointer_tmp.write_text(final.name)
+    pointer_tmp.replace(Path(model_dir) / POINTER)
+    _prune(root, keep, final.name)
+    return final
+
+
+def _prune(root: Path, keep: int, current: str):
+    done = sorted((p for p in root.iterdir() if p.name.startswith("ckpt-")), key=lambda p: p.name)
+    for old in done[:-keep] if keep > 0 else done:
+        if old.name != current:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def latest_checkpoint(model_dir: Path) -> Optional[tuple[Path, int]]:
+    """(directory, walSeq) of the checkpoint the pointer refers to, or None."""
+    pointer = Path(model_dir) / POINTER
+    if not pointer.exists():
+        return None
+    path = Path(model_dir) / "checkpoints" / pointer.read_text().strip()
+    meta_path = path / "checkpoint.json"
+    if not meta_path.exists():
+        return None
+    return path, int(json.loads(meta_path.read_text())["walSeq"])
+
+
+def checkpoint_meta(path: Path) -> dict:
+    return json.loads((Path(path) / "checkpoint.json").read_text())
+
+
+class Checkpointer:
+    """Background thread that checkpoints the model every N updates or T seconds.
+
+    It also fsyncs the feedback log on every tick, which bounds the window of records that are
+    written but not yet durable when traffic stops.
+    """
+
+    def __init__(self, checkpoint: Callable[[], None], pending: Callable[[], int], sync: Callable[[], None],
+                 every_updates: int = 500, every_seconds: float = 60.0, tick: float = 0.2):
+        self._checkpoint = checkpoint
+        self._pending = pending
+        self._sync = sync
+        self.every_updates = every_updates
+        self.every_seconds = every_seconds
+        self.tick = tick
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last = time.monotonic()
+        self.errors = 0
+        # While held (e.g. during a streaming bulk load) only the log is synced; the caller checkpoints at the end
+        self._held = 0
+        self._thread = threading.Thread(target=self._run, name="ml-checkpointer", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        if self._pending() >= self.every_updates:
+            self._wake.set()
+
+    def hold(self):
+        self._held += 1
+
+    def release(self):
+        self._held = max(0, self._held - 1)
+
+    def _due(self) -> bool:
+        if self._held:
+            return False
+        pending = self._pending()
+        return pending >= self.every_updates or (pending > 0 and time.monotonic() - self._last >= self.every_seconds)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.tick)
+            self._wake.clear()
+            try:
+                self._sync()
+                if self._due():
+                    self._checkpoint()
+                    self._last = time.monotonic()
+            except Exception:
+                # Keep the thread alive; the log still holds every update for the next attempt
+                self.errors += 1
+
+    def stop(self, final: bool = True):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=30)
+        self._sync()
+        if final and self._pending() > 0:
+            self._checkpoint()
@@ -0,0 +1,396 @@
+import copy
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# Unit sgd steps a weighted row may take, and the target probability that ends them early
+_SGD_MAX_STEPS = 32
+_SGD_CONFIDENT = 0.99
+
+
+class WeightBlock:
+    """One column block of weights: a dense (n_features x width) base, possibly shared with
+    published snapshots or memory-mapped read-only, plus an overlay of the rows rewritten since.
+
+    `keys` (sorted feature ids) and `rows` (len(keys) x width) replace the base rows they name.
+    Readers never see a block change: a writer that does not own a block builds a new one.
+    """
+
+    __slots__ = ("base", "keys", "rows")
+
+    def __init__(self, base: np.ndarray, keys: Optional[np.ndarray] = None, rows: Optional[np.ndarray] = None):
+        self.base = base
+        self.keys = np.empty(0, dtype=np.int64) if keys is None else keys
+        self.rows = np.empty((0, base.shape[1]), dtype=np.float32) if rows is None else rows
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.base.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.base.nbytes + self.keys.nbytes + self.rows.nbytes
+
+    def _find(self, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        pos = np.searchsorted(self.keys, cols)
+        pos[pos == len(self.keys)] = 0
+        return pos, self.keys[pos] == cols
+
+    def gather(self, cols: np.ndarray, local=None) -> np.ndarray:
+        """Rows `cols` (x columns `local`, default all) as a new dense array, overlay applied."""
+        out = self.base[cols] if local is None else self.base[np.ix_(cols, local)]
+        if len(self.keys) and len(cols):
+            pos, hit = self._find(cols)
+            if hit.any():
+                rows = self.rows[pos[hit]]
+                out[hit] = rows if local is None else rows[:, local]
+        return out
+
+    def dense(self) -> np.ndarray:
+        """The whole block; a copy only when the overlay is not empty."""
+        if not len(self.keys):
+            return self.base
+        out = np.array(self.base, dtype=np.float32, order="C")
+        out[self.keys] = self.rows
+        return out
+
+
+def _cells(rows: np.ndarray, local: np.ndarray):
+    # Outer (rows x local) index, as np.ix_ builds it
+    return rows[:, None], local
+
+
+class OnlineLinearClassifier:
+    """Multi-class linear model over sparse features whose label set can grow at any time.
+
+    Weights are stored feature-major in column blocks (n_features x block_size, float32) so that a
+    sparse row only touches its own nnz rows. New labels take the next free column and a new block
+    is appended when the last one is full, so adding a class never copies or retrains what was
+    already learned.
+
+    freeze() returns a read-only copy that shares the blocks; published copies never change.
+    Copy-on-write is per feature row, not per block: after a freeze, writing to a block copies
+    only the rows the update touches into the block's overlay (see WeightBlock), plus the overlay
+    itself, so one correction costs kilobytes instead of a n_features x block_size copy. Once an
+    overlay grows past `overlay_rows` rows it is merged into a private dense copy of the block,
+    which takes writes in place until the next freeze.
+
+    Each example is first scored against every class, O(nnz x classes), into a preallocated buffer.
+    mode="sgd" (log loss, the service default): softmax cross-entropy SGD step on the true class and
+    the `negatives` highest scoring wrong classes, which carry almost all of the gradient:
+    O(nnz x (negatives + 1)) writes; negatives=0 updates every class. Its softmax outputs are
+    usable confidences.
+    mode="pa": multi-class passive-aggressive (PA-I) update, which only moves the true class and
+    the highest scoring wrong class: O(nnz) writes. It stops at a unit margin, so the softmax of
+    its scores stays close to uniform and is not a calibrated confidence.
+
+    Memory: the blocks are dense, n_features x 4 bytes per class of capacity (256 KB at 2^16
+    features, about 1 GB for 4096 classes), per classifier. `nbytes` reports it; lower
+    ML_HASH_FEATURES for very large label sets, and serve from compact.py's pruned CSR weights.
+    """
+
+    def __init__(self, n_features: int, mode: str = "sgd", C: float = 1.0, learning_rate: float = 2.0,
+                 block_size: int = 128, overlay_rows: Optional[int] = None, negatives: int = 16):
+        if mode not in ("pa", "sgd"):
+            raise ValueError(f"unknown mode: {mode}")
+        self.n_features = int(n_features)
+        self.mode = mode
+        self.C = C
+        self.learning_rate = learning_rate
+        self.negatives = max(0, negatives)
+        self.block_size = max(1, block_size)
+        # Overlay rows a shared block may collect before it is merged into a private copy
+        self.overlay_rows = overlay_rows if overlay_rows is not None else max(1024, self.n_features // 16)
+        self.labels: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.blocks: List[WeightBlock] = []
+        self.b = np.zeros(0, dtype=np.float32)
+        self.updates = 0
+        # Per-example class scores, reused across partial_fit rows
+        self._scores = np.empty(0, dtype=np.float32)
+        # Blocks whose overlay (_owned) or dense base (_owned_base) this instance may write in
+        # place, i.e. not shared with a frozen copy
+        self._owned: set = set()
+        self._owned_base: set = set()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.blocks) * self.block_size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(blk.nbytes for blk in self.blocks) + self.b.nbytes
+
+    def add_label(self, label: str) -> int:
+        idx = self.index.get(label)
+        if idx is not None:
+            return idx
+        idx = len(self.labels)
+        if idx == self.capacity:
+            self._owned_base.add(len(self.blocks))
+            self.blocks.append(WeightBlock(np.zeros((self.n_features, self.block_size), dtype=np.float32)))
+            self.b = np.concatenate([self.b, np.zeros(self.block_size, dtype=np.float32)])
+        else:
+            block, col = divmod(idx, self.block_size)
+            if col >= self.blocks[block].shape[1]:
+                # Loaded blocks only hold the saved labels: widen the last one to a full block
+                base = np.zeros((self.n_features, self.block_size), dtype=np.float32)
+                base[:, :self.blocks[block].shape[1]] = self.blocks[block].dense()
+                self.blocks[block] = WeightBlock(base)
+                self._owned_base.add(block)
+        self.labels.append(label)
+        self.index[label] = idx
+        return idx
+
+    def _add(self, block: int, cols: np.ndarray, local, delta: np.ndarray):
+        """blocks[block][cols, local] += delta, copying only what a frozen copy still shares.
+        local is a column, a slice or an array of columns (delta is then len(cols) x len(local))."""
+        at = _cells if isinstance(local, np.ndarray) else lambda rows, local: (rows, local)
+        if block in self._owned_base:
+            self.blocks[block].base[at(cols, local)] += delta
+            return
+        blk = self.blocks[block]
+        if block not in self._owned:
+            blk = self.blocks[block] = WeightBlock(blk.base, blk.keys, blk.rows.copy())
+            self._owned.add(block)
+        pos, hit = blk._find(cols) if len(blk.keys) else (None, np.zeros(len(cols), dtype=bool))
+        if not hit.all():
+            missing = cols[~hit]
+            if len(blk.keys) + len(missing) > self.overlay_rows:
+                # Merge: one private dense copy, written in place from now until the next freeze
+                base = blk.dense() if len(blk.keys) else np.array(blk.base, dtype=np.float32, order="C")
+                self.blocks[block] = WeightBlock(base)
+                self._owned_base.add(block)
+                base[at(cols, local)] += delta
+                return
+            keys = np.concatenate([blk.keys, missing.astype(np.int64)])
+            order = np.argsort(keys, kind="stable")
+            blk.keys = keys[order]
+            blk.rows = np.concatenate([blk.rows, blk.base[missing]])[order]
+            pos, _ = blk._find(cols)
+        blk.rows[at(pos, local)] += delta
+
+    def freeze(self) -> "OnlineLinearClassifier":
+        """Immutable copy for readers; costs O(labels), the weight blocks are shared."""
+        frozen = copy.copy(self)
+        frozen.labels = list(self.labels)
+        frozen.index = dict(self.index)
+        frozen.blocks = list(self.blocks)
+        frozen.b = self.b.copy()
+        frozen._scores = np.empty(0, dtype=np.float32)
+        frozen._owned = set()
+        frozen._owned_base = set()
+        self._owned = set()
+        self._owned_base = set()
+        return frozen
+
+    def weights(self, cols: Optional[np.ndarray] = None, classes: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dense (len(cols) or n_features) x labels weight matrix, or x len(classes) for a subset of
+        class indices (only the blocks holding them are read)."""
+        if classes is not None:
+            out = np.empty((self.n_features if cols is None else len(cols), len(classes)), dtype=np.float32)
+            owner = classes // self.block_size
+            for j in np.unique(owner):
+                mask = owner == j
+                local = classes[mask] % self.block_size
+                blk = self.blocks[j]
+                out[:, mask] = blk.dense()[:, local] if cols is None else blk.gather(cols, local)
+            return out
+        n = len(self.labels)
+        if not self.blocks:
+            return np.zeros((self.n_features if cols is None else len(cols), 0), dtype=np.float32)
+        parts = [blk.dense() if cols is None else blk.gather(cols) for blk in self.blocks[: (n - 1) // self.block_size + 1]]
+        return np.hstack(parts)[:, :n]
+
+    def _row_scores(self, cols: np.ndarray, vals: np.ndarray) -> np.ndarray:
+        n = len(self.labels)
+        if len(self._scores) < n:
+            self._scores = np.empty(self.capacity, dtype=np.float32)
+        scores = self._scores[:n]
+        # Block by block into the buffer: no n_features-wide hstack of every block per example
+        for j, blk in enumerate(self.blocks[: (n - 1) // self.block_size + 1]):
+            lo = j * self.block_size
+            hi = min(n, lo + self.block_size)
+            scores[lo:hi] = vals @ blk.gather(cols)[:, : hi - lo]
+        scores += self.b[:n]
+        return scores
+
+    def partial_fit(self, X: sp.csr_matrix, y: Sequence[str], sample_weight: Optional[Sequence[float]] = None):
+        """One online pass over the rows of X; unseen labels in y are added on the fly."""
+        X = sp.csr_matrix(X, dtype=np.float32)
+        targets = [self.add_label(label) for label in y]
+        if len(self.labels) < 2:
+            # Nothing to separate yet; a single class always scores 1.0
+            return self
+        for row, target in enumerate(targets):
+            lo, hi = X.indptr[row], X.indptr[row + 1]
+            cols, vals = X.indices[lo:hi], X.data[lo:hi]
+            weight = 1.0 if sample_weight is None else float(sample_weight[row])
+            if weight <= 0.0:
+                continue
+            scores = self._row_scores(cols, vals)
+            if self.mode == "pa":
+                self._pa_step(cols, vals, scores, target, weight)
+            else:
+                self._sgd_fit(cols, vals, scores, target, weight)
+            self.updates += 1
+        return self
+
+    def _add_column(self, label_idx: int, cols: np.ndarray, step: np.ndarray):
+        block, col = divmod(label_idx, self.block_size)
+        self._add(block, cols, col, step)
+
+    def _pa_step(self, cols, vals, scores, target, weight):
+        true_score = scores[target]
+        scores[target] = -np.inf
+        rival = int(np.argmax(scores))
+        loss = 1.0 - (true_score - scores[rival])
+        if loss <= 0.0:
+            return
+        # The bias behaves as a constant feature of value 1 on both moved rows
+        tau = min(self.C * weight, loss / (2.0 * (float(vals @ vals) + 1.0)))
+        step = (tau * vals).astype(np.float32)
+        self._add_column(target, cols, step)
+        self._add_column(rival, cols, -step)
+        self.b[target] += tau
+        self.b[rival] -= tau
+
+    def _sgd_fit(self, cols, vals, scores, target, weight):
+        # A weighted row stands for `weight` identical ones. One step scaled by the weight
+        # overshoots (the bias alone swings by lr x weight), so take unit steps, rescoring in
+        # between, and stop as soon as the row is confidently right.
+        for _ in range(min(math.ceil(weight), _SGD_MAX_STEPS)):
+            proba = softmax(scores)
+            if proba[target] >= _SGD_CONFIDENT:
+                return
+            step = min(1.0, weight)
+            weight -= step
+            self._sgd_step(cols, vals, proba, target, step)
+            scores = self._row_scores(cols, vals)
+
+    def _sgd_step(self, cols, vals, proba, target, weight):
+        grad = proba
+        grad[target] -= 1.0
+        grad *= self.learning_rate * weight
+        n = len(self.labels)
+        if 0 < self.negatives < n - 1:
+            # True class plus the wrong classes with the largest probability (= gradient)
+            true_grad, grad[target] = grad[target], -np.inf
+            moved = np.argpartition(-grad, self.negatives - 1)[: self.negatives + 1]
+            moved[-1] = target
+            moved.sort()
+            grad[target] = true_grad
+            step = grad[moved]
+            delta = np.outer(vals, -step).astype(np.float32)
+            owner = moved // self.block_size
+            # moved is sorted: one _add per run of classes in the same block
+            cuts = [0, *(np.flatnonzero(owner[1:] != owner[:-1]) + 1), len(moved)]
+            for lo, hi in zip(cuts[:-1], cuts[1:]):
+                self._add(int(owner[lo]), cols, moved[lo:hi] % self.block_size, delta[:, lo:hi])
+            self.b[moved] -= step.astype(np.float32)
+            return
+        delta = np.outer(vals, -grad).astype(np.float32)
+        for block in range((n - 1) // self.block_size + 1):
+            lo = block * self.block_size
+            hi = min(n, lo + self.block_size)
+            self._add(block, cols, slice(0, hi - lo), delta[:, lo:hi])
+        self.b[:n] -= grad.astype(np.float32)
+
+    def decision_function(self, X: sp.csr_matrix, classes: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores for every class, or only for the given class indices (columns in that order)."""
+        X = sp.csr_matrix(X, dtype=np.float32)
+        # Gather only the weight rows of features present in X instead of touching all of W
+        cols, inverse = np.unique(X.indices, return_inverse=True)
+        compact = sp.csr_matrix((X.data, inverse.ravel(), X.indptr), shape=(X.shape[0], len(cols)))
+        if classes is not None:
+            return np.asarray(compact @ self.weights(cols, classes)) + self.b[classes]
+        return np.asarray(compact @ self.weights(cols)) + self.b[:len(self.labels)]
+
+    def predict_proba(self, X: sp.csr_matrix, classes: Optional[np.ndarray] = None) -> np.ndarray:
+        return softmax(self.decision_function(X, classes))
+
+    def top_k(self, X: sp.csr_matrix, k: int, classes: Optional[np.ndarray] = None) -> List[List[Tuple[str, float]]]:
+        """Best k (label, probability) pairs per row, best first. With classes, only those class
+        indices are scored and the probabilities are normalized among them."""
+        if not self.labels or (classes is not None and not len(classes)):
+            return [[] for _ in range(X.shape[0])]
+        proba = self.predict_proba(X, classes)
+        idxs, top = top_k_indices(proba, k)
+        if classes is not None:
+            idxs = classes[idxs]
+        return [[(self.labels[i], float(p)) for i, p in zip(ri, rp)] for ri, rp in zip(idxs, top)]
+
+    # Persistence: <name>.weights.npy holds the used columns only, as one feature-major
+    # (n_features, labels) array: unused capacity is never written, hashed or copied. load(mmap=True)
+    # maps it read-only and every block is a view into the page cache, shared by all processes that
+    # load the same file; the last block is as wide as the labels it holds until one is added.
+    def save(self, directory: Path, name: str):
+        directory = Path(directory)
+        n = len(self.labels)
+        weights_tmp = directory / f".{name}.weights.tmp.npy"
+        out = np.lib.format.open_memmap(weights_tmp, mode="w+", dtype=np.float32, shape=(self.n_features, n))
+        for j, blk in enumerate(self.blocks[: (n - 1) // self.block_size + 1 if n else 0]):
+            lo = j * self.block_size
+            width = min(self.block_size, n - lo)
+            out[:, lo:lo + width] = blk.base[:, :width]
+            if len(blk.keys):
+                out[blk.keys, lo:lo + width] = blk.rows[:, :width]
+        out.flush()
+        del out
+        bias_tmp = directory / f".{name}.bias.tmp.npy"
+        np.save(bias_tmp, self.b[:n])
+        meta_tmp = directory / f".{name}.tmp.json"
+        meta_tmp.write_text(json.dumps({
+            "mode": self.mode, "C": self.C, "learning_rate": self.learning_rate, "block_size": self.block_size,
+            "negatives": self.negatives,
+            "n_features": self.n_features, "updates": self.updates, "labels": self.labels,
+        }))
+        weights_tmp.replace(directory / f"{name}.weights.npy")
+        bias_tmp.replace(directory / f"{name}.bias.npy")
+        meta_tmp.replace(directory / f"{name}.json")
+
+    @classmethod
+    def load(cls, directory: Path, name: str, mmap: bool = True) -> "OnlineLinearClassifier":
+        directory = Path(directory)
+        meta = json.loads((directory / f"{name}.json").read_text())
+        clf = cls(meta["n_features"], meta["mode"], meta["C"], meta["learning_rate"], meta["block_size"],
+                  negatives=meta.get("negatives", 0))
+        W = np.load(directory / f"{name}.weights.npy", mmap_mode="r" if mmap else None)
+        if W.ndim == 3:
+            # Earlier layout: every block at full capacity, (blocks, n_features, block_size)
+            clf.blocks = [WeightBlock(W[i]) for i in range(W.shape[0])]
+        else:
+            clf.blocks = [WeightBlock(W[:, lo:lo + clf.block_size]) for lo in range(0, W.shape[1], clf.block_size)]
+        clf.labels = list(meta["labels"])
+        clf.index = {label: i for i, label in enumerate(clf.labels)}
+        clf.b = np.zeros(clf.capacity, dtype=np.float32)
+        b = np.load(directory / f"{name}.bias.npy")
+        clf.b[:len(b)] = b
+        # Mapped blocks are not owned: writes go to overlays, the file is never modified
+        clf._owned_base = set() if mmap else set(range(len(clf.blocks)))
+        clf.updates = meta.get("updates", 0)
+        return clf
+
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    z = scores - scores.max(axis=-1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=-1, keepdims=True)
+    return z
+
+
+def top_k_indices(proba: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the k largest entries per row, sorted descending."""
+    k = min(k, proba.shape[1])
+    # Partial selection of the k best columns per row, then sort only those k
+    idxs = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(proba, idxs, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(idxs, order, axis=1), np.take_along_axis(top, order, axis=1)
@@ -0,0 +1,345 @@
+"""Compact inference artifacts: python -m services.ml.compact --model-dir DIR [--version V] ...
+
+The trainer keeps dense float32 weight blocks (n_features x block_size per block) because online
+updates write anywhere in them; most of those rows are zero, since only n-grams seen in training
+get weights. For serving, CompactModel.build() turns a model into compact.npz:
+
+  * weights as one CSR matrix per classifier (feature rows x classes), pruning entries below
+    `prune` x the largest absolute weight of their class (0: only exact zeros are dropped);
+  * float32 values, or int8 with one float32 scale per class;
+  * the IDF vector as float32 instead of the float64 document frequencies;
+  * labels as a UTF-8 blob plus offsets on disk and a fixed-width NumPy string array in memory,
+    instead of JSON lists and per-label Python objects.
+
+CompactModel scores exactly like CompiledModel (same featurization and softmax), so the report
+measures what pruning and quantization cost: bytes before/after, on disk and in memory, and
+top-1/top-k agreement with the dense model on labels from the feedback log. With --publish the
+result becomes a new registry version (dense artifacts plus compact.npz); the service then
+serves from compact.npz until the first update after loading it.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# Add shared module to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from shared.normalize import normalize_label
+from .classifier import OnlineLinearClassifier
+from .features import HashingFeaturizer
+from .inference import CompiledModel, _Buffers, ngram_table
+from .registry import ModelRegistry
+from .wal import read_log
+
+COMPACT_FILE = "compact.npz"
+DTYPES = ("float32", "int8")
+
+
+def _encode_labels(labels: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [label.encode("utf-8") for label in labels]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_labels(blob: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    raw = blob.tobytes()
+    labels = [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+    return np.asarray(labels, dtype=str) if labels else np.zeros(0, dtype="<U1")
+
+
+class SparseWeights:
+    """Feature-major CSR weights of one classifier: the classes and values of row c are
+    indices/data[indptr[c]:indptr[c + 1]]; int8 values are multiplied by scale[class]."""
+
+    def __init__(self, labels: np.ndarray, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray,
+                 scale: Optional[np.ndarray], bias: np.ndarray):
+        self.labels = labels
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.scale = scale
+        self.bias = bias
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.labels, self.indptr, self.indices, self.data, self.bias) + ((self.scale,) if self.scale is not None else ())
+        return sum(a.nbytes for a in arrays)
+
+    @classmethod
+    def from_classifier(cls, clf: OnlineLinearClassifier, dtype: str = "float32", prune: float = 0.0) -> "SparseWeights":
+        if dtype not in DTYPES:
+            raise ValueError(f"unknown dtype: {dtype}")
+        n = len(clf.labels)
+        used = (n - 1) // clf.block_size + 1 if n else 0
+        parts = [sp.csr_matrix(blk.dense()[:, : min(clf.block_size, n - j * clf.block_size)])
+                 for j, blk in enumerate(clf.blocks[:used])]
+        W = sp.hstack(parts, format="csr", dtype=np.float32) if parts else sp.csr_matrix((clf.n_features, 0), dtype=np.float32)
+        peak = np.zeros(n, dtype=np.float32)
+        if W.nnz:
+            np.maximum.at(peak, W.indices, np.abs(W.data))
+        if prune > 0 and W.nnz:
+            W.data[np.abs(W.data) <= prune * peak[W.indices]] = 0.0
+            W.eliminate_zeros()
+        scale = None
+        data = W.data.astype(np.float32)
+        if dtype == "int8":
+            scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+            data = np.clip(np.rint(W.data / scale[W.indices]), -127, 127).astype(np.int8)
+        index_dtype = np.int16 if n <= np.iinfo(np.int16).max else np.int32
+        return cls(np.asarray(clf.labels, dtype=str) if n else np.zeros(0, dtype="<U1"),
+                   W.indptr.astype(np.int64 if W.nnz > np.iinfo(np.int32).max else np.int32),
+                   W.indices.astype(index_dtype), data, scale, clf.b[:n].astype(np.float32))
+
+    def scores(self, cols: np.ndarray, vals: np.ndarray) -> np.ndarray:
+        """vals @ W[cols] + bias without densifying: gather the nonzeros of the selected rows."""
+        out = self.bias.copy()
+        if not len(cols):
+            return out
+        starts, ends = self.indptr[cols], self.indptr[cols + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if not total:
+            return out
+        # Positions of every nonzero of the selected rows, and the query value each is multiplied by
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        classes = self.indices[offsets]
+        weights = self.data[offsets].astype(np.float32, copy=False)
+        weights *= np.repeat(vals, lengths)
+        if self.scale is not None:
+            weights *= self.scale[classes]
+        out += np.bincount(classes, weights=weights, minlength=len(self.labels)).astype(np.float32)
+        return out
+
+    def arrays(self, prefix: str) -> dict:
+        blob, offsets = _encode_labels(self.labels.tolist())
+        out = {f"{prefix}_labels": blob, f"{prefix}_offsets": offsets, f"{prefix}_indptr": self.indptr,
+               f"{prefix}_indices": self.indices, f"{prefix}_data": self.data, f"{prefix}_bias": self.bias}
+        if self.scale is not None:
+            out[f"{prefix}_scale"] = self.scale
+        return out
+
+    @classmethod
+    def from_arrays(cls, z, prefix: str) -> "SparseWeights":
+        scale = z[f"{prefix}_scale"] if f"{prefix}_scale" in z.files else None
+        return cls(_decode_labels(z[f"{prefix}_labels"], z[f"{prefix}_offsets"]), z[f"{prefix}_indptr"],
+                   z[f"{prefix}_indices"], z[f"{prefix}_data"], scale, z[f"{prefix}_bias"])
+
+
+class CompactModel(CompiledModel):
+    """Drop-in replacement for CompiledModel over SparseWeights; inference only."""
+
+    # Scores any batch size itself; the service needs no dense fallback for large batches
+    sparse = True
+
+    def __init__(self, n_features: int, ngram_range: Tuple[int, int], brand_tokens: bool,
+                 idf: Optional[np.ndarray], type_w: SparseWeights, cat_w: SparseWeights, dtype: str = "float32"):
+        self.n_features = int(n_features)
+        self.min_n, self.max_n = ngram_range
+        self.brand_tokens = brand_tokens
+        self.idf = idf
+        self.table = ngram_table(self.n_features)
+        self.weights = (type_w, cat_w)
+        self.dtype = dtype
+        self._buffers = _Buffers()
+        self._plans: dict = {}
+
+    @classmethod
+    def build(cls, featurizer: HashingFeaturizer, type_clf: OnlineLinearClassifier, cat_clf: OnlineLinearClassifier,
+              dtype: str = "float32", prune: float = 0.0) -> "CompactModel":
+        idf = featurizer.idf().astype(np.float32) if featurizer.online_idf and featurizer.n_docs else None
+        return cls(featurizer.n_features, featurizer.ngram_range, featurizer.brand_tokens, idf,
+                   SparseWeights.from_classifier(type_clf, dtype, prune),
+                   SparseWeights.from_classifier(cat_clf, dtype, prune), dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(w.nbytes for w in self.weights) + (self.idf.nbytes if self.idf is not None else 0)
+
+    def _plan(self, key: tuple, classes: np.ndarray):
+        return None
+
+    def _top_k(self, which: int, cols: np.ndarray, vals: np.ndarray, k: int,
+               classes: Optional[np.ndarray] = None, plan=None) -> List[Tuple[str, float]]:
+        w = self.weights[which]
+        if not len(w) or (classes is not None and not len(classes)):
+            return []
+        scores = w.scores(cols, vals)
+        if classes is not None:
+            scores = scores[classes]
+        n = len(scores)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        peak = scores[top[0]]
+        denom = np.exp(scores - peak).sum()
+        ids = top if classes is None else classes[top]
+        return [(str(w.labels[c]), float(np.exp(scores[i] - peak) / denom)) for i, c in zip(top, ids)]
+
+    def save(self, directory: Path):
+        tmp = Path(directory) / f".{COMPACT_FILE}.tmp.npz"
+        arrays = {**self.weights[0].arrays("type"), **self.weights[1].arrays("cat")}
+        if self.idf is not None:
+            arrays["idf"] = self.idf
+        np.savez(tmp, n_features=np.int64(self.n_features), ngram_range=np.asarray((self.min_n, self.max_n), dtype=np.int64),
+                 brand_tokens=np.bool_(self.brand_tokens), dtype=np.asarray(self.dtype), **arrays)
+        tmp.replace(Path(directory) / COMPACT_FILE)
+
+    @classmethod
+    def load(cls, directory: Path) -> "CompactModel":
+        with np.load(Path(directory) / COMPACT_FILE) as z:
+            return cls(int(z["n_features"]), tuple(int(x) for x in z["ngram_range"]), bool(z["brand_tokens"]),
+                       z["idf"] if "idf" in z.files else None, SparseWeights.from_arrays(z, "type"),
+                       SparseWeights.from_arrays(z, "cat"), str(z["dtype"]))
+
+
+def _dense_bytes(featurizer: HashingFeaturizer, *classifiers: OnlineLinearClassifier) -> int:
+    total = featurizer.df.nbytes
+    for clf in classifiers:
+        n = len(clf.labels)
+        used = (n - 1) // clf.block_size + 1 if n else 0
+        total += sum(blk.nbytes for blk in clf.blocks[:used]) + clf.b.nbytes
+        total += sum(sys.getsizeof(label) for label in clf.labels) + sys.getsizeof(clf.index)
+    return total
+
+
+def _dir_bytes(path: Path, names: Sequence[str]) -> int:
+    return sum((Path(path) / name).stat().st_size for name in names if (Path(path) / name).exists())
+
+
+def agreement(dense: CompiledModel, compact: CompactModel, texts: Sequence[Tuple[str, Optional[str]]], k: int) -> dict:
+    """How often the compact model gives the dense model's answer on the same inputs."""
+    if not texts:
+        return {"count": 0}
+    first = lambda pairs: pairs[0][0] if pairs else None
+    type_top1 = cat_top1 = 0
+    overlap = max_diff = dense_s = compact_s = 0.0
+    for text, brand in texts:
+        t0 = time.perf_counter()
+        dt, dc = dense.predict(text, brand, k)
+        t1 = time.perf_counter()
+        ct, cc = compact.predict(text, brand, k)
+        compact_s += time.perf_counter() - t1
+        dense_s += t1 - t0
+        type_top1 += first(dt) == first(ct)
+        cat_top1 += first(dc) == first(cc)
+        overlap += len({label for label, _ in dt} & {label for label, _ in ct}) / max(1, len(dt))
+        if dt and ct and first(dt) == first(ct):
+            max_diff = max(max_diff, abs(dt[0][1] - ct[0][1]))
+    n = len(texts)
+    return {
+        "count": n,
+        "typeTop1": round(type_top1 / n, 4),
+        "categoryTop1": round(cat_top1 / n, 4),
+        f"typeTop{k}Overlap": round(overlap / n, 4),
+        "maxTop1ConfDiff": round(max_diff, 6),
+        "denseMsPerLabel": round(dense_s * 1000 / n, 4),
+        "compactMsPerLabel": round(compact_s * 1000 / n, 4),
+    }
+
+
+def report(featurizer: HashingFeaturizer, type_clf: OnlineLinearClassifier, cat_clf: OnlineLinearClassifier,
+           compact: CompactModel, texts: Sequence[Tuple[str, Optional[str]]], k: int = 3) -> dict:
+    """Sizes before/after in memory and on disk, plus prediction agreement on texts."""
+    with tempfile.TemporaryDirectory() as tmp:
+        featurizer.save(Path(tmp) / "features.npz")
+        type_clf.save(tmp, "type_model")
+        cat_clf.save(tmp, "cat_model")
+        dense_disk = _dir_bytes(tmp, os.listdir(tmp))
+        compact.save(tmp)
+        compact_disk = _dir_bytes(tmp, [COMPACT_FILE])
+    dense_mem = _dense_bytes(featurizer, type_clf, cat_clf)
+    return {
+        "dtype": compact.dtype,
+        "types": len(type_clf), "categories": len(cat_clf),
+        "nnz": {"type": compact.weights[0].nnz, "category": compact.weights[1].nnz},
+        "memoryBytes": {"dense": dense_mem, "compact": compact.nbytes, "ratio": round(compact.nbytes / dense_mem, 4)},
+        "diskBytes": {"dense": dense_disk, "compact": compact_disk, "ratio": round(compact_disk / dense_disk, 4)},
+        "agreement": agreement(CompiledModel(featurizer, type_clf, cat_clf), compact, texts, k),
+    }
+
+
+def sample_texts(log_path: Path, wal_seq: Optional[int] = None, limit: int = 5000) -> List[Tuple[str, Optional[str]]]:
+    """Distinct (label, brand) pairs from the feedback log, in the form the service scores them."""
+    seen = {}
+    for record in read_log(log_path):
+        if wal_seq is not None and record["seq"] > wal_seq:
+            break
+        if record.get("labelRaw"):
+            label = normalize_label(record["labelRaw"])
+            brand = normalize_label(record["brand"]) if record.get("brand") else None
+            seen.setdefault((f"{label} {brand}" if brand else label, brand), None)
+            if len(seen) >= limit:
+                break
+    return list(seen)
+
+
+def main(argv=None) -> int:
+    env = os.environ
+    ap = argparse.ArgumentParser(prog="python -m services.ml.compact")
+    ap.add_argument("--model-dir", default=env.get("MODEL_DIR", "/app/models"))
+    ap.add_argument("--version", help="registry version to compact (default: the active one)")
+    ap.add_argument("--dtype", default="float32", choices=DTYPES)
+    ap.add_argument("--prune", type=float, default=0.01,
+                    help="drop weights below this fraction of their class's largest absolute weight")
+    ap.add_argument("--sample", type=int, default=5000, help="feedback labels used to measure agreement")
+    ap.add_argument("--top-k", type=int, default=int(env.get("TOP_K", "3")))
+    ap.add_argument("--publish", action="store_true", help="publish the compacted model as a new registry version")
+    ap.add_argument("--report", help="also write the JSON report to this file")
+    args = ap.parse_args(argv)
+
+    model_dir = Path(args.model_dir)
+    registry = ModelRegistry(model_dir / "registry")
+    version = args.version or registry.active()
+    if version is None:
+        print("compact: no --version given and no active registry version", file=sys.stderr)
+        return 1
+    try:
+        manifest = registry.verify(version)
+    except Exception as e:
+        print(f"compact: {e}", file=sys.stderr)
+        return 1
+    path = registry.path(version)
+    featurizer = HashingFeaturizer.load(path / "features.npz")
+    type_clf = OnlineLinearClassifier.load(path, "type_model")
+    cat_clf = OnlineLinearClassifier.load(path, "cat_model")
+    started = time.perf_counter()
+    compact = CompactModel.build(featurizer, type_clf, cat_clf, args.dtype, args.prune)
+    build_seconds = time.perf_counter() - started
+    texts = sample_texts(model_dir / "feedback.jsonl", manifest["walSeq"], args.sample)
+    result = {"version": version, "prune": args.prune, "buildSeconds": round(build_seconds, 3),
+              **report(featurizer, type_clf, cat_clf, compact, texts, args.top_k), "published": None}
+    if args.publish:
+        def save(target: Path):
+            for name in manifest["files"]:
+                if name != COMPACT_FILE:
+                    shutil.copy2(path / name, target / name)
+            compact.save(target)
+
+        metrics = {**manifest.get("metrics", {}), "compact": {k: result[k] for k in ("dtype", "memoryBytes", "diskBytes", "agreement")}}
+        result["published"] = registry.publish(save, source="compact", wal_seq=manifest["walSeq"], metrics=metrics,
+                                               extra={"baseVersion": version})
+    text = json.dumps(result, indent=2)
+    if args.report:
+        Path(args.report).write_text(text, encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
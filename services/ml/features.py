@@ -0,0 +1,135 @@
+import copy
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class HashingFeaturizer:
+    """Char n-gram feature hashing with optional brand tokens and an online IDF estimate.
+
+    The feature space has a fixed width (n_features), so any label, including n-grams never
+    seen before, maps into it without refitting and memory stays constant. partial_fit only
+    updates document frequencies, which transform turns into smoothed IDF weights.
+
+    sklearn is imported on the first hashing call, not with this module: loading, saving and the
+    compiled inference path do not need it, and importing it takes most of a second.
+    """
+
+    def __init__(self, n_features: int = 2 ** 16, ngram_range: Tuple[int, int] = (3, 5),
+                 brand_tokens: bool = True, online_idf: bool = True):
+        self.n_features = int(n_features)
+        self.ngram_range = tuple(ngram_range)
+        self.brand_tokens = brand_tokens
+        self.online_idf = online_idf
+        self.df = np.zeros(self.n_features, dtype=np.float64)
+        self.n_docs = 0
+        self._idf: Optional[np.ndarray] = None
+        self._hashers = None
+
+    def _build(self):
+        from sklearn.feature_extraction import FeatureHasher
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        chars = HashingVectorizer(
+            analyzer="char", ngram_range=self.ngram_range, n_features=self.n_features,
+            alternate_sign=False, norm=None,
+        )
+        brands = FeatureHasher(n_features=self.n_features, input_type="string", alternate_sign=False)
+        self._hashers = (chars, brands)
+        return self._hashers
+
+    def _raw(self, texts: Sequence[str], brands: Optional[Sequence[Optional[str]]] = None) -> sp.csr_matrix:
+        chars, brand_hasher = self._hashers or self._build()
+        X = chars.transform(texts)
+        if self.brand_tokens and brands is not None and any(brands):
+            tokens = [["brand=" + t for t in (b or "").lower().split()] for b in brands]
+            X = X + brand_hasher.transform(tokens)
+        return sp.csr_matrix(X, dtype=np.float64)
+
+    def idf(self) -> np.ndarray:
+        if self._idf is None:
+            self._idf = np.log((1.0 + self.n_docs) / (1.0 + self.df)) + 1.0
+        return self._idf
+
+    def partial_fit(self, texts: Sequence[str], brands: Optional[Sequence[Optional[str]]] = None,
+                    sample_weight: Optional[Sequence[float]] = None):
+        """Update document frequencies; sample_weight counts a row as that many documents."""
+        if self.online_idf and len(texts):
+            X = self._raw(texts, brands)
+            # Rows are canonical CSR (one entry per column), so indices count documents per feature
+            if sample_weight is None:
+                self.df += np.bincount(X.indices, minlength=self.n_features)
+                self.n_docs += len(texts)
+            else:
+                weights = np.asarray(sample_weight, dtype=np.float64)
+                self.df += np.bincount(X.indices, weights=np.repeat(weights, np.diff(X.indptr)), minlength=self.n_features)
+                self.n_docs += float(weights.sum())
+            self._idf = None
+        return self
+
+    def transform(self, texts: Sequence[str], brands: Optional[Sequence[Optional[str]]] = None) -> sp.csr_matrix:
+        return self.transform_raw(self._raw(texts, brands), copy=False)
+
+    # Batch (offline) use: hash once, possibly in parallel, then fit/transform the raw counts
+    def raw(self, texts: Sequence[str], brands: Optional[Sequence[Optional[str]]] = None,
+            n_jobs: int = 1, chunk_size: int = 20000) -> sp.csr_matrix:
+        """Unweighted hashed counts; with n_jobs != 1 chunks are hashed on joblib workers."""
+        if n_jobs == 1 or len(texts) <= chunk_size:
+            return self._raw(texts, brands)
+        from joblib import Parallel, delayed
+
+        starts = range(0, len(texts), chunk_size)
+        parts = Parallel(n_jobs=n_jobs)(
+            delayed(self._raw)(texts[i:i + chunk_size], None if brands is None else brands[i:i + chunk_size])
+            for i in starts)
+        return sp.vstack(parts, format="csr")
+
+    def fit_raw(self, X: sp.csr_matrix, sample_weight: Optional[Sequence[float]] = None):
+        """partial_fit on rows already returned by raw()."""
+        if self.online_idf and X.shape[0]:
+            weights = None if sample_weight is None else np.repeat(np.asarray(sample_weight, dtype=np.float64), np.diff(X.indptr))
+            self.df += np.bincount(X.indices, weights=weights, minlength=self.n_features)
+            self.n_docs += X.shape[0] if sample_weight is None else float(np.sum(sample_weight))
+            self._idf = None
+        return self
+
+    def transform_raw(self, X: sp.csr_matrix, copy: bool = True) -> sp.csr_matrix:
+        X = X.copy() if copy else X
+        if self.online_idf and self.n_docs:
+            X.data *= self.idf()[X.indices]
+        from sklearn.preprocessing import normalize
+
+        return normalize(X, norm="l2", copy=False)
+
+    def partial_fit_transform(self, texts: Sequence[str], brands: Optional[Sequence[Optional[str]]] = None,
+                              sample_weight: Optional[Sequence[float]] = None):
+        return self.partial_fit(texts, brands, sample_weight).transform(texts, brands)
+
+    def freeze(self) -> "HashingFeaturizer":
+        """Copy for readers that later partial_fit calls on this instance do not affect."""
+        frozen = copy.copy(self)
+        frozen.df = self.df.copy()
+        return frozen
+
+    # Persistence: a single .npz with the config and the document-frequency vector
+    def save(self, path: Path):
+        tmp = Path(path).with_suffix(".tmp.npz")
+        np.savez(
+            tmp, df=self.df, n_docs=np.int64(self.n_docs), n_features=np.int64(self.n_features),
+            ngram_range=np.asarray(self.ngram_range, dtype=np.int64),
+            flags=np.asarray([self.brand_tokens, self.online_idf], dtype=bool),
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "HashingFeaturizer":
+        with np.load(path) as z:
+            brand_tokens, online_idf = (bool(x) for x in z["flags"])
+            f = cls(int(z["n_features"]), tuple(int(x) for x in z["ngram_range"]), brand_tokens, online_idf)
+            f.df = z["df"].astype(np.float64)
+            f._idf = None
+            f.n_docs = int(z["n_docs"])
+        return f
+
@@ -0,0 +1,82 @@
+import copy
+import json
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CategoryTypeMap:
+    """Which type classes (indices into the type classifier) have been confirmed under which
+    category, for hierarchical prediction: score the category first, then only its types.
+
+    Types confirmed without a category ("orphans") are candidates under every category, so the
+    hierarchical mode never hides a type the flat classifier could return.
+
+    freeze() is O(categories): children are tuples replaced on write, never mutated, and a frozen
+    copy memoizes the index arrays it hands out.
+    """
+
+    def __init__(self):
+        self.children: Dict[str, Tuple[int, ...]] = {}
+        self.orphans: Tuple[int, ...] = ()
+        self._assigned: set = set()
+        self._arrays: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.children)
+
+    def add(self, category: Optional[str], type_idx: int):
+        if category:
+            members = self.children.get(category, ())
+            if type_idx not in members:
+                self.children[category] = members + (type_idx,)
+            if type_idx not in self._assigned:
+                self._assigned.add(type_idx)
+                if type_idx in self.orphans:
+                    self.orphans = tuple(t for t in self.orphans if t != type_idx)
+        elif type_idx not in self._assigned and type_idx not in self.orphans:
+            self.orphans = self.orphans + (type_idx,)
+
+    def freeze(self) -> "CategoryTypeMap":
+        frozen = copy.copy(self)
+        frozen.children = dict(self.children)
+        frozen._assigned = set()  # only writers need it
+        frozen._arrays = {}
+        return frozen
+
+    def candidates(self, categories: Sequence[str]) -> np.ndarray:
+        """Sorted type indices confirmed under any of categories, plus the orphans."""
+        key = tuple(categories)
+        arr = self._arrays.get(key)
+        if arr is None:
+            members = set(self.orphans)
+            for category in categories:
+                members.update(self.children.get(category, ()))
+            arr = np.fromiter(sorted(members), dtype=np.int64, count=len(members))
+            if len(self._arrays) < 4096:
+                self._arrays[key] = arr
+        return arr
+
+    def save(self, path: Path):
+        data = {"children": {c: list(t) for c, t in self.children.items()}, "orphans": list(self.orphans)}
+        Path(path).write_text(json.dumps(data), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "CategoryTypeMap":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        hierarchy = cls()
+        hierarchy.children = {c: tuple(t) for c, t in data["children"].items()}
+        hierarchy.orphans = tuple(data.get("orphans", ()))
+        hierarchy._assigned = {t for members in hierarchy.children.values() for t in members}
+        return hierarchy
+
+    @classmethod
+    def from_records(cls, records, type_index: Dict[str, int]) -> "CategoryTypeMap":
+        """Rebuild from feedback records, for artifacts saved before the map existed."""
+        hierarchy = cls()
+        for record in records:
+            idx = type_index.get(record["finalTypeId"])
+            if idx is not None:
+                hierarchy.add(record.get("finalCategoryId"), idx)
+        return hierarchy
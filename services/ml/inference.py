@@ -0,0 +1,178 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .classifier import OnlineLinearClassifier
+from .features import HashingFeaturizer
+
+_WHITE_SPACES = re.compile(r"\s\s+")
+# Hierarchical block plans kept per compiled model (least recently used evicted first)
+PLAN_CACHE_SIZE = 4096
+
+
+def hash_index(token: str, n_features: int) -> int:
+    """Column of token in the hashed space, exactly as sklearn's FeatureHasher computes it."""
+    from sklearn.utils import murmurhash3_32
+
+    h = murmurhash3_32(token, seed=0)
+    if h == -2147483648:
+        return (2147483647 - (n_features - 1)) % n_features
+    return abs(h) % n_features
+
+
+class NgramTable:
+    """Bounded memo of n-gram -> hashed column; OCR labels repeat, so most lookups skip murmurhash.
+
+    Shared by every scoring thread: hits are a plain dict read, misses insert under a lock and,
+    when full, evict the oldest entries one at a time instead of emptying the table.
+    """
+
+    def __init__(self, n_features: int, max_size: int = 500_000):
+        self.n_features = n_features
+        self.max_size = max(1, max_size)
+        self._cols: dict = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cols)
+
+    def col(self, gram: str) -> int:
+        c = self._cols.get(gram)
+        if c is None:
+            c = hash_index(gram, self.n_features)
+            with self._lock:
+                while len(self._cols) >= self.max_size:
+                    # Insertion order: the first key is the oldest
+                    del self._cols[next(iter(self._cols))]
+                self._cols[gram] = c
+        return c
+
+
+_TABLES: dict = {}
+
+
+def ngram_table(n_features: int) -> NgramTable:
+    # Hashing only depends on the width of the space, so snapshots share one table
+    table = _TABLES.get(n_features)
+    if table is None:
+        table = _TABLES.setdefault(n_features, NgramTable(n_features))
+    return table
+
+
+class _Buffers(threading.local):
+    def __init__(self):
+        self.scores: dict = {}
+
+    def get(self, key, size: int) -> np.ndarray:
+        buf = self.scores.get(key)
+        if buf is None or buf.shape[0] < size:
+            buf = self.scores[key] = np.empty(max(size, 64), dtype=np.float32)
+        return buf[:size]
+
+
+class CompiledModel:
+    """Inference-only view of a snapshot: hashed n-gram lookup, a precomputed IDF vector and the
+    float32 weight blocks of both classifiers (shared WeightBlocks, not copied). Scoring one label is a few
+    NumPy calls on small dense arrays with per-thread preallocated buffers, without sklearn input
+    validation or sparse matrix construction, and gives the same top-k as the generic path."""
+
+    # Dense blocks: large batches are cheaper as one sparse matrix product on the snapshot
+    sparse = False
+
+    def __init__(self, featurizer: HashingFeaturizer, type_clf: OnlineLinearClassifier, cat_clf: OnlineLinearClassifier):
+        self.n_features = featurizer.n_features
+        self.min_n, self.max_n = featurizer.ngram_range
+        self.brand_tokens = featurizer.brand_tokens
+        self.idf = featurizer.idf() if featurizer.online_idf and featurizer.n_docs else None
+        self.table = ngram_table(self.n_features)
+        self.classifiers = (self._export(type_clf), self._export(cat_clf))
+        self._buffers = _Buffers()
+        # Block plans for candidate type sets in hierarchical mode, keyed by the top categories (LRU)
+        self._plans: "OrderedDict[tuple, list]" = OrderedDict()
+        self._plans_lock = threading.Lock()
+
+    @staticmethod
+    def _export(clf: OnlineLinearClassifier):
+        n = len(clf.labels)
+        used = (n - 1) // clf.block_size + 1 if n else 0
+        return list(clf.labels), list(clf.blocks[:used]), clf.b[:n].copy(), clf.block_size
+
+    def featurize(self, text: str, brand: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        counts: dict = {}
+        col = self.table.col
+        doc = _WHITE_SPACES.sub(" ", text.lower())
+        for n in range(self.min_n, min(self.max_n + 1, len(doc) + 1)):
+            for i in range(len(doc) - n + 1):
+                c = col(doc[i:i + n])
+                counts[c] = counts.get(c, 0.0) + 1.0
+        if self.brand_tokens and brand:
+            for token in brand.lower().split():
+                c = col("brand=" + token)
+                counts[c] = counts.get(c, 0.0) + 1.0
+        cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        vals = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.idf is not None and len(cols):
+            vals *= self.idf[cols]
+        norm = np.sqrt(vals @ vals)
+        if norm > 0:
+            vals /= norm
+        return cols, vals.astype(np.float32)
+
+    def _plan(self, key: tuple, classes: np.ndarray):
+        """Per block holding a candidate class: (block, flat column offsets, positions in classes)."""
+        with self._plans_lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+        block_size = self.classifiers[0][3]
+        owner = classes // block_size
+        plan = [(int(j), classes[owner == j] % block_size, np.flatnonzero(owner == j)) for j in np.unique(owner)]
+        with self._plans_lock:
+            self._plans[key] = plan
+            while len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+    def _top_k(self, which: int, cols: np.ndarray, vals: np.ndarray, k: int,
+               classes: Optional[np.ndarray] = None, plan=None) -> List[Tuple[str, float]]:
+        labels, blocks, bias, block_size = self.classifiers[which]
+        n = len(labels) if classes is None else len(classes)
+        if n == 0:
+            return []
+        scores = self._buffers.get(which, n)
+        if classes is None:
+            for j, blk in enumerate(blocks):
+                lo = j * block_size
+                hi = min(n, lo + block_size)
+                scores[lo:hi] = vals @ blk.gather(cols)[:, : hi - lo] if len(cols) else 0.0
+            scores += bias
+        else:
+            # Masked rows: read only the weights of candidate classes, block by block
+            for j, local, pos in plan:
+                scores[pos] = vals @ blocks[j].gather(cols, local) if len(cols) else 0.0
+            scores += bias[classes]
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        # Softmax normalizer over all scored classes, probabilities only for the k returned
+        peak = scores[top[0]]
+        denom = np.exp(scores - peak).sum()
+        ids = top if classes is None else classes[top]
+        return [(labels[c], float(np.exp(scores[i] - peak) / denom)) for i, c in zip(top, ids)]
+
+    def predict(self, text: str, brand: Optional[str], k: int, hierarchy=None, top_categories: int = 2):
+        """Top-k types and categories. With a hierarchy (CategoryTypeMap), the category is scored
+        first and only the types confirmed under the best top_categories categories are scored."""
+        cols, vals = self.featurize(text, brand)
+        cat_pairs = self._top_k(1, cols, vals, max(k, top_categories))
+        if hierarchy is None:
+            return self._top_k(0, cols, vals, k), cat_pairs[:k]
+        key = tuple(c for c, _ in cat_pairs[:top_categories])
+        classes = hierarchy.candidates(key)
+        if not len(classes):
+            return self._top_k(0, cols, vals, k), cat_pairs[:k]
+        return self._top_k(0, cols, vals, k, classes, self._plan(key, classes)), cat_pairs[:k]
@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .inference import ngram_table
+
+
+class NgramEncoder:
+    """Dense char-trigram embedding: hashed counts of padded trigrams and words, l2-normalized.
+    Cheap, dependency-free and robust to the OCR noise of receipt labels."""
+
+    name = "ngram"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.table = ngram_table(dim)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        col = self.table.col
+        for row, text in enumerate(texts):
+            doc = f" {text.lower()} "
+            vec = out[row]
+            for i in range(len(doc) - 2):
+                vec[col(doc[i:i + 3])] += 1.0
+            for word in doc.split():
+                vec[col("w=" + word)] += 1.0
+            norm = np.sqrt(vec @ vec)
+            if norm > 0:
+                vec /= norm
+        return out
+
+
+class SentenceEncoder:
+    """sentence-transformers model, imported lazily so the dependency stays optional."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def make_encoder(spec: str, dim: int = 256):
+    """"ngram" (default) or a sentence-transformers model name; falls back to n-grams when the
+    package is not installed."""
+    if spec and spec != "ngram":
+        try:
+            return SentenceEncoder(spec)
+        except ImportError:
+            pass
+    return NgramEncoder(dim)
+
+
+class NeighborIndex:
+    """Incremental nearest-neighbour index over confirmed labels.
+
+    Each distinct (normalized) text is one row holding a unit vector and the type/category votes
+    it received. Rows live in a preallocated float32 matrix; at most `capacity` texts are kept and
+    the least recently confirmed one is replaced when full. Small indexes are searched exactly;
+    above `exact_below` rows, random-hyperplane LSH tables (`tables` x `bits`) select the
+    candidates that are then ranked by exact cosine similarity.
+
+    `seq` is the feedback log position of the last record inserted, so replaying the log after
+    loading a saved index does not count votes twice.
+    """
+
+    def __init__(self, encoder, capacity: int = 50000, tables: int = 12, bits: int = 10,
+                 exact_below: int = 4096, seed: int = 0):
+        self.encoder = encoder
+        self.dim = encoder.dim
+        self.capacity = max(1, capacity)
+        self.exact_below = exact_below
+        self.tables, self.bits = tables, bits
+        planes = np.random.default_rng(seed).standard_normal((tables * bits, self.dim)).astype(np.float32)
+        self._planes = planes
+        self._powers = (1 << np.arange(bits)).astype(np.int64)
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(tables)]
+        self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._codes = np.zeros((0, tables), dtype=np.int64)
+        self.texts: List[str] = []
+        self.types: List[Dict[str, float]] = []
+        self.cats: List[Dict[str, float]] = []
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self.seq = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _hash(self, vecs: np.ndarray) -> np.ndarray:
+        signs = (vecs @ self._planes.T > 0).reshape(len(vecs), self.tables, self.bits)
+        return signs @ self._powers
+
+    def _grow(self):
+        size = min(self.capacity, max(64, 2 * len(self.vectors)))
+        vectors = np.zeros((size, self.dim), dtype=np.float32)
+        vectors[:len(self.vectors)] = self.vectors
+        codes = np.zeros((size, self.tables), dtype=np.int64)
+        codes[:len(self._codes)] = self._codes
+        self.vectors, self._codes = vectors, codes
+
+    def _unlink(self, row: int):
+        for t, code in enumerate(self._codes[row]):
+            bucket = self._buckets[t].get(int(code))
+            if bucket is not None:
+                bucket.discard(row)
+                if not bucket:
+                    del self._buckets[t][int(code)]
+
+    def insert(self, text: str, type_id: str, cat_id: Optional[str], seq: int = 0, weight: float = 1.0,
+               vector: Optional[np.ndarray] = None):
+        with self._lock:
+            row = self._rows.get(text)
+            if row is None:
+                if vector is None:
+                    vector = self.encoder.encode([text])[0]
+                if len(self._rows) >= self.capacity:
+                    _, row = self._rows.popitem(last=False)
+                    self._unlink(row)
+                    self.types[row], self.cats[row], self.texts[row] = {}, {}, text
+                else:
+                    row = len(self.texts)
+                    if row >= len(self.vectors):
+                        self._grow()
+                    self.texts.append(text)
+                    self.types.append({})
+                    self.cats.append({})
+                self.vectors[row] = vector
+                self._codes[row] = self._hash(vector[None, :])[0]
+                for t, code in enumerate(self._codes[row]):
+                    self._buckets[t].setdefault(int(code), set()).add(row)
+                self._rows[text] = row
+            else:
+                self._rows.move_to_end(text)
+            self.types[row][type_id] = self.types[row].get(type_id, 0.0) + weight
+            if cat_id:
+                self.cats[row][cat_id] = self.cats[row].get(cat_id, 0.0) + weight
+            self.seq = max(self.seq, seq)
+
+    def search(self, text: str, k: int = 10, type_id: Optional[str] = None,
+               category_id: Optional[str] = None) -> List[Tuple[str, float, Dict[str, float], Dict[str, float]]]:
+        """Up to k nearest confirmed texts as (text, cosine, type votes, category votes), optionally
+        only among texts confirmed with the given type and/or category."""
+        vec = self.encoder.encode([text])[0]
+        with self._lock:
+            n = len(self.texts)
+            if n == 0:
+                return []
+            if n <= self.exact_below:
+                cand = np.arange(n)
+            else:
+                rows: set = set()
+                for t, code in enumerate(self._hash(vec[None, :])[0]):
+                    rows |= self._buckets[t].get(int(code), set())
+                if not rows:
+                    return []
+                cand = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            if type_id is not None or category_id is not None:
+                cand = np.array([r for r in cand if (type_id is None or type_id in self.types[r])
+                                 and (category_id is None or category_id in self.cats[r])], dtype=np.int64)
+                if not len(cand):
+                    return []
+            sims = self.vectors[cand] @ vec
+            k = min(k, len(cand))
+            top = np.argpartition(-sims, k - 1)[:k] if k < len(cand) else np.arange(len(cand))
+            top = top[np.argsort(-sims[top], kind="stable")]
+            return [(self.texts[cand[i]], float(sims[i]), dict(self.types[cand[i]]), dict(self.cats[cand[i]]))
+                    for i in top]
+
+    def vote(self, text: str, k: int = 10, min_sim: float = 0.5):
+        """Similarity-weighted type and category votes of the neighbours above min_sim, each list
+        normalized to sum to 1 and sorted by confidence."""
+        return neighbour_votes(self.search(text, k), min_sim)
+
+    def flush(self, wait: bool = True):
+        """Nothing is buffered: inserts are searchable at once."""
+
+    def close(self):
+        """Nothing to release; the index lives in process memory."""
+
+    def save(self, directory: Path, name: str = "knn"):
+        directory = Path(directory)
+        with self._lock:
+            order = list(self._rows.values())
+            meta = {
+                "encoder": self.encoder.name, "dim": self.dim, "seq": self.seq,
+                "texts": [self.texts[r] for r in order],
+                "types": [self.types[r] for r in order],
+                "cats": [self.cats[r] for r in order],
+            }
+            vectors = self.vectors[order]
+        tmp = directory / f".{name}.vectors.npy.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, vectors)
+        os.replace(tmp, directory / f"{name}.vectors.npy")
+        (directory / f"{name}.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    def load(self, directory: Path, name: str = "knn") -> bool:
+        """Insert the entries saved in directory, if any. Vectors written by another encoder are
+        recomputed."""
+        directory = Path(directory)
+        meta_path = directory / f"{name}.json"
+        if not meta_path.exists():
+            return False
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        texts = meta["texts"]
+        if meta.get("encoder") == self.encoder.name and meta.get("dim") == self.dim:
+            vectors = np.load(directory / f"{name}.vectors.npy")
+        else:
+            vectors = self.encoder.encode(texts) if texts else np.zeros((0, self.dim), dtype=np.float32)
+        with self._lock:
+            for text, types, cats, vector in zip(texts, meta["types"], meta["cats"], vectors):
+                for type_id, count in types.items():
+                    self.insert(text, type_id, None, weight=count, vector=vector)
+                for cat_id, count in cats.items():
+                    row = self._rows[text]
+                    self.cats[row][cat_id] = self.cats[row].get(cat_id, 0.0) + count
+            self.seq = max(self.seq, int(meta.get("seq", 0)))
+        return True
+
+
+def neighbour_votes(neighbours, min_sim: float):
+    """Turn search results (text, similarity, type votes, category votes), best first, into
+    similarity-weighted type and category confidences."""
+    type_scores: Dict[str, float] = {}
+    cat_scores: Dict[str, float] = {}
+    for _, sim, types, cats in neighbours:
+        if sim < min_sim:
+            break
+        for scores, votes in ((type_scores, types), (cat_scores, cats)):
+            total = sum(votes.values())
+            for label, count in votes.items():
+                scores[label] = scores.get(label, 0.0) + sim * count / total
+    return _normalized(type_scores), _normalized(cat_scores)
+
+
+def _normalized(scores: Dict[str, float]) -> List[Tuple[str, float]]:
+    total = sum(scores.values())
+    if total <= 0:
+        return []
+    return sorted(((label, s / total) for label, s in scores.items()), key=lambda p: -p[1])
@@ -0,0 +1,70 @@
+"""Read-only serving of the first model layout (TF-IDF + SGDClassifier joblib files).
+
+That layout predates the feedback log, so what it learned cannot be replayed into the current
+models. After ModelManager.migrate() moves it to MODEL_DIR/legacy/ it keeps answering
+predictions, exactly as the old service did, until the new models have trained on enough
+feedback (ML_LEGACY_UNTIL_UPDATES).
+"""
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Files of the TF-IDF layout; the vectorizer is required, each classifier needs its labels
+FILES = ("vectorizer.joblib", "type_clf.joblib", "cat_clf.joblib", "type_labels.json", "cat_labels.json")
+
+Pairs = List[Tuple[str, float]]
+
+
+class LegacyModel:
+    def __init__(self, vectorizer, type_clf, type_labels: List[str], cat_clf, cat_labels: List[str]):
+        self.vectorizer = vectorizer
+        self.type_clf, self.type_labels = type_clf, type_labels
+        self.cat_clf, self.cat_labels = cat_clf, cat_labels
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["LegacyModel"]:
+        """The legacy model in directory, or None without a vectorizer and a classifier (or if they cannot be unpickled)."""
+        directory = Path(directory)
+        if not (directory / "vectorizer.joblib").exists():
+            return None
+        import joblib
+
+        def part(name: str):
+            clf_path, labels_path = directory / f"{name}_clf.joblib", directory / f"{name}_labels.json"
+            if not (clf_path.exists() and labels_path.exists()):
+                return None, []
+            return joblib.load(clf_path), json.loads(labels_path.read_text())
+
+        try:
+            vectorizer = joblib.load(directory / "vectorizer.joblib")
+            (type_clf, type_labels), (cat_clf, cat_labels) = part("type"), part("cat")
+        except Exception:
+            return None
+        if type_clf is None and cat_clf is None:
+            return None  # a vectorizer alone predicts nothing
+        return cls(vectorizer, type_clf, type_labels, cat_clf, cat_labels)
+
+    def __len__(self) -> int:
+        return len(self.type_labels)
+
+    def top_k(self, texts: Sequence[str], k: int) -> List[Tuple[Pairs, Pairs]]:
+        """(type pairs, category pairs) per text, best first, as the old /predict answered."""
+        X = self.vectorizer.transform(list(texts))
+        return list(zip(self._top_k(self.type_clf, self.type_labels, X, k),
+                        self._top_k(self.cat_clf, self.cat_labels, X, k)))
+
+    @staticmethod
+    def _top_k(clf, labels: List[str], X, k: int) -> List[Pairs]:
+        n = X.shape[0]
+        if clf is None or not labels:
+            return [[] for _ in range(n)]
+        if len(labels) == 1 or not hasattr(clf, "classes_"):
+            # The old service only fitted a classifier from the second class on
+            return [[(labels[0], 1.0)] for _ in range(n)]
+        proba = clf.predict_proba(X)
+        # classes_ are indices into labels
+        names = [labels[int(c)] for c in clf.classes_]
+        order = np.argsort(-proba, axis=1, kind="stable")[:, :k]
+        return [[(names[i], float(proba[row, i])) for i in order[row]] for row in range(n)]
@@ -1,20 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from typing import Iterable, List, Optional
 import os
 import sys
-import json
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-import joblib
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import SGDClassifier
-from sklearn.exceptions import NotFittedError
 import numpy as np
 
 # Add shared module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from shared.redis_logger import RedisLogger, LogSeverity
+from shared.normalize import normalize_label
 
 # Initialize Redis logger
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
@@ -22,6 +26,108 @@ LOG_STREAM_KEY = os.getenv("LOG_STREAM_KEY", "app_logs")
 LOG_LEVEL = LogSeverity(os.getenv("LOG_LEVEL", "INFO").upper())
 logger = RedisLogger("ml", REDIS_URL, LOG_STREAM_KEY, min_log_level=LOG_LEVEL)
 
+from .aggregate import FeedbackAggregator
+from .checkpoint import Checkpointer, checkpoint_meta, latest_checkpoint, write_checkpoint
+from .classifier import OnlineLinearClassifier
+from .compact import COMPACT_FILE, CompactModel
+from .features import HashingFeaturizer
+from .hierarchy import CategoryTypeMap
+from .inference import CompiledModel
+from .knn import NeighborIndex, make_encoder
+from .legacy import LegacyModel
+from .registry import ModelRegistry, RegistryError
+from .shadow import ShadowEvaluator
+from .stream import MiniBatcher, split_lines
+from .trainer import ModelSnapshot, Trainer
+from .wal import FeedbackLog
+
+# Width of the hashed char n-gram space; memory is constant in the number of distinct labels
+HASH_FEATURES = int(os.getenv("ML_HASH_FEATURES", str(2 ** 16)))
+BRAND_TOKENS = os.getenv("ML_BRAND_TOKENS", "true").lower() in ("1", "true", "yes")
+ONLINE_IDF = os.getenv("ML_ONLINE_IDF", "true").lower() in ("1", "true", "yes")
+# "sgd" (log loss: calibrated confidences, O(nnz x (ML_SGD_NEGATIVES + 1)) writes per update) or "pa"
+# (passive-aggressive, O(nnz) writes, but its softmax scores are not usable as confidences)
+CLASSIFIER_MODE = os.getenv("ML_CLASSIFIER_MODE", "sgd")
+PA_C = float(os.getenv("ML_PA_C", "1.0"))
+SGD_LR = float(os.getenv("ML_SGD_LR", "2.0"))
+# Wrong classes moved by each sgd update (highest scoring first); 0 updates every class
+SGD_NEGATIVES = int(os.getenv("ML_SGD_NEGATIVES", "16"))
+# Classes per copy-on-write weight block; a published snapshot shares all blocks the trainer has not touched since
+WEIGHT_BLOCK = int(os.getenv("ML_WEIGHT_BLOCK", "128"))
+# Max records the trainer applies before publishing a new snapshot
+TRAIN_BATCH = int(os.getenv("ML_TRAIN_BATCH", "256"))
+# Feedback log: fsync once this many records are pending or after this many milliseconds
+WAL_FSYNC_EVERY = int(os.getenv("ML_WAL_FSYNC_EVERY", "32"))
+WAL_FSYNC_INTERVAL = int(os.getenv("ML_WAL_FSYNC_INTERVAL_MS", "200")) / 1000.0
+# Background checkpoint every N applied updates or T seconds (whichever comes first)
+CHECKPOINT_EVERY = int(os.getenv("ML_CHECKPOINT_EVERY", "500"))
+CHECKPOINT_SECONDS = float(os.getenv("ML_CHECKPOINT_SECONDS", "60"))
+CHECKPOINT_KEEP = int(os.getenv("ML_CHECKPOINT_KEEP", "2"))
+# Map model weights read-only from checkpoint/registry files instead of reading them into each
+# process: uvicorn workers share one page-cache copy and only blocks they train on become private
+MMAP_MODELS = os.getenv("ML_MMAP_MODELS", "true").lower() in ("1", "true", "yes")
+# Score labels with the exported NumPy scorer (inference.py) instead of the sparse training path;
+# batches larger than COMPILED_MAX_BATCH still go through one sparse matrix product
+COMPILED_INFERENCE = os.getenv("ML_COMPILED_INFERENCE", "true").lower() in ("1", "true", "yes")
+COMPILED_MAX_BATCH = int(os.getenv("ML_COMPILED_MAX_BATCH", "64"))
+# Serve from compact.npz (sparse, pruned/quantized weights; python -m services.ml.compact) when the
+# loaded version or checkpoint has one, until the first update after loading it
+COMPACT_INFERENCE = os.getenv("ML_COMPACT_INFERENCE", "true").lower() in ("1", "true", "yes")
+# Feedback aggregation: identical corrections in a trainer batch become one weighted example; a text
+# confirmed with different type/category pairs within this many seconds is reported as a conflict
+FEEDBACK_WINDOW = float(os.getenv("ML_FEEDBACK_WINDOW_SECONDS", "3600"))
+# Streaming bulk training (/train/stream): examples per mini-batch, shuffle buffer size, and the
+# directory that server-side training files must live in (default MODEL_DIR)
+STREAM_BATCH = int(os.getenv("ML_STREAM_BATCH", "1024"))
+STREAM_SHUFFLE = int(os.getenv("ML_STREAM_SHUFFLE", "8192"))
+TRAIN_DATA_DIR = os.getenv("ML_TRAIN_DATA_DIR") or None
+# Publish a snapshot at most this often during a stream: each publish makes the next batch copy the
+# weight blocks it touches (copy-on-write), which dominates bulk loads if done per batch
+STREAM_PUBLISH_SECONDS = float(os.getenv("ML_STREAM_PUBLISH_SECONDS", "2"))
+# Hierarchical mode: score the category first, then only the types confirmed under the best
+# ML_HIER_TOP_CATEGORIES categories (cost follows the category fan-out, not the number of types)
+HIERARCHICAL = os.getenv("ML_HIERARCHICAL", "false").lower() in ("1", "true", "yes")
+HIER_TOP_CATEGORIES = int(os.getenv("ML_HIER_TOP_CATEGORIES", "2"))
+# Prediction cache entries (normalized label/brand -> candidates for the serving snapshot); 0 disables it
+PREDICT_CACHE_SIZE = int(os.getenv("ML_PREDICT_CACHE_SIZE", "50000"))
+# Nearest-neighbour votes over confirmed labels (knn.py): "fallback" replaces the classifier's
+# candidates when it has fewer than two classes or its top confidence is below ML_KNN_MIN_CONF,
+# "blend" mixes both with weight ML_KNN_WEIGHT on the neighbours, "off" disables the index
+KNN_MODE = os.getenv("ML_KNN_MODE", "fallback").lower()
+# "ngram" or a sentence-transformers model name (used when the package is installed)
+KNN_ENCODER = os.getenv("ML_KNN_ENCODER", "ngram")
+KNN_DIM = int(os.getenv("ML_KNN_DIM", "256"))
+KNN_CAPACITY = int(os.getenv("ML_KNN_CAPACITY", "50000"))
+KNN_K = int(os.getenv("ML_KNN_K", "10"))
+KNN_MIN_SIM = float(os.getenv("ML_KNN_MIN_SIM", "0.5"))
+KNN_MIN_CONF = float(os.getenv("ML_KNN_MIN_CONF", "0.35"))
+KNN_WEIGHT = float(os.getenv("ML_KNN_WEIGHT", "0.3"))
+# "memory" (NeighborIndex in this process) or "qdrant" (vector_store.QdrantIndex)
+KNN_BACKEND = os.getenv("ML_KNN_BACKEND", "memory").lower()
+# Qdrant location: ":memory:" (local, in-process), a server URL (e.g. http://qdrant:6333), or a local path
+QDRANT_URL = os.getenv("ML_QDRANT_URL", ":memory:")
+QDRANT_PATH = os.getenv("ML_QDRANT_PATH") or None
+QDRANT_COLLECTION = os.getenv("ML_QDRANT_COLLECTION", "wib_labels")
+QDRANT_BATCH = int(os.getenv("ML_QDRANT_BATCH", "256"))
+# Shadow evaluation: fraction of prediction requests (0 disables) also scored, in the background,
+# by the comma-separated registry versions; their answers are compared with the served ones and
+# with the feedback that follows (GET /shadow)
+SHADOW_SAMPLE = float(os.getenv("ML_SHADOW_SAMPLE", "0"))
+SHADOW_VERSIONS = [v for v in os.getenv("ML_SHADOW_VERSIONS", "").split(",") if v.strip()]
+SHADOW_QUEUE = int(os.getenv("ML_SHADOW_QUEUE", "1000"))
+SHADOW_PENDING = int(os.getenv("ML_SHADOW_PENDING", "100000"))
+# Labels scored on a freshly loaded registry version before it starts serving
+WARMUP_LABELS = ["LATTE PS 1L", "PANE", "BANANE KG"]
+# Artifacts of earlier model layouts (TF-IDF + SGDClassifier, flat .npz files); their presence
+# without a checkpoint triggers ModelManager.migrate()
+LEGACY_ARTIFACTS = (
+    "vectorizer.joblib", "type_clf.joblib", "cat_clf.joblib", "type_labels.json", "cat_labels.json",
+    "features.npz", "type_model.npz", "cat_model.npz",
+)
+# The migrated TF-IDF model (it has no feedback log to rebuild from) keeps serving predictions
+# until the new type classifier has trained on this many examples
+LEGACY_UNTIL_UPDATES = int(os.getenv("ML_LEGACY_UNTIL_UPDATES", "500"))
+
 
 class PredictRequest(BaseModel):
     labelRaw: str
@@ -39,6 +145,14 @@ class PredictResponse(BaseModel):
     categoryCandidates: List[Candidate] = []
 
 
+class PredictBatchRequest(BaseModel):
+    items: List[PredictRequest] = []
+
+
+class PredictBatchResponse(BaseModel):
+    results: List[PredictResponse] = []
+
+
 class FeedbackRequest(BaseModel):
     labelRaw: str
     brand: Optional[str] = None
@@ -46,150 +160,642 @@ class FeedbackRequest(BaseModel):
     finalCategoryId: Optional[str] = None
 
 
+class SimilarRequest(BaseModel):
+    labelRaw: str
+    brand: Optional[str] = None
+    k: int = 10
+    typeId: Optional[str] = None
+    categoryId: Optional[str] = None
+
+
+class ShadowRequest(BaseModel):
+    versions: List[str]
+    sampleRate: Optional[float] = None
+
+
 class TrainRequest(BaseModel):
     # Optional batch train placeholder
     examples: List[FeedbackRequest] = []
 
 
+class PredictionCache:
+    """Bounded LRU of prediction results keyed by the normalized (label, brand).
+
+    Entries belong to one snapshot version: the first lookup with a newer version drops
+    everything, so feedback published after a prediction is never hidden by the cache, and
+    lookups from readers still holding an older snapshot just miss.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.version = 0
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _sync_version(self, version: int) -> bool:
+        if version > self.version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self.version = version
+        return version == self.version
+
+    def get_many(self, keys: List[tuple], version: int) -> List[Optional[tuple]]:
+        if self.capacity <= 0:
+            # Disabled, but still counted: predictions run on several threadpool workers
+            with self._lock:
+                self.misses += len(keys)
+            return [None] * len(keys)
+        out: List[Optional[tuple]] = []
+        with self._lock:
+            current = self._sync_version(version)
+            for key in keys:
+                value = self._data.get(key) if current else None
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                out.append(value)
+        return out
+
+    def put_many(self, keys: List[tuple], values: List[tuple], version: int):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            if not self._sync_version(version):
+                return
+            for key, value in zip(keys, values):
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data), "capacity": self.capacity, "modelVersion": self.version,
+            "hits": self.hits, "misses": self.misses, "hitRate": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions, "invalidations": self.invalidations,
+        }
+
+
 class ModelManager:
-    def __init__(self, model_dir: str, top_k: int = 3):
+    """Single-writer model owner with lock-free reads (read-copy-update).
+
+    Only the trainer thread touches the working featurizer/classifiers. After each batch it
+    publishes a new immutable ModelSnapshot by swapping one reference; predictions read that
+    reference once and never wait on training or see a half-applied update.
+
+    start() loads the model, replays the log, starts the trainer and warms the scoring path up,
+    once. The constructor calls it unless start=False; the service starts it in the background
+    instead, and public methods wait for it, so a caller that needs the model just waits.
+    """
+
+    def __init__(self, model_dir: str, top_k: int = 3, start: bool = True):
         self.model_dir = Path(model_dir)
         self.model_dir.mkdir(parents=True, exist_ok=True)
-
-        self.vectorizer: TfidfVectorizer = TfidfVectorizer(
-            analyzer="char", ngram_range=(3, 5)
-        )
-        # Two independent classifiers for type and category
-        self.type_clf: SGDClassifier = SGDClassifier(loss="log_loss")
-        self.cat_clf: SGDClassifier = SGDClassifier(loss="log_loss")
-        self.type_labels: List[str] = []
-        self.cat_labels: List[str] = []
         self.top_k = top_k
 
-        self._fitted_vectorizer = False
-        self._fitted_type = False
-        self._fitted_cat = False
+        # Working model, owned by the trainer thread
+        self.featurizer = self._new_featurizer()
+        # Two independent classifiers for type and category; both grow as new ids arrive
+        self.type_clf = self._new_classifier()
+        self.cat_clf = self._new_classifier()
+
+        self.hierarchy = CategoryTypeMap()
+        self.aggregator = FeedbackAggregator(window=FEEDBACK_WINDOW)
+        # TF-IDF model of the first layout, serving until the new models have trained (see migrate())
+        self.legacy: Optional[LegacyModel] = None
+        # Confirmed labels with their votes; shared by all snapshots, guarded by its own lock.
+        # Created by start(): the Qdrant backend imports its client and connects
+        self._knn = None
+
+        # checkpoint_seq: last log record contained in the checkpoint on disk
+        self.checkpoint_seq = 0
+        # applied_seq: last log record the working model contains; every record up to it is applied
+        self.applied_seq = 0
+        self._checkpoint_version = 0
+        self._checkpoint_lock = threading.Lock()
+        self.replayed = 0
+        self.log = FeedbackLog(self.feedback_path, fsync_every=WAL_FSYNC_EVERY, fsync_interval=WAL_FSYNC_INTERVAL)
+        self.registry = ModelRegistry(self.model_dir / "registry")
+        self._snapshot: Optional[ModelSnapshot] = None
+        self.cache = PredictionCache(PREDICT_CACHE_SIZE)
+        # Last log record applied by a bulk load (it may not be published yet)
+        self._stream_seq = 0
+        self._stream_published = time.monotonic()
+        # State of the last activation requested through activate()/rollback()
+        self.activation: dict = {}
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-loader")
+        self.shadow = ShadowEvaluator(self._shadow_scorer, SHADOW_SAMPLE, [v.strip() for v in SHADOW_VERSIONS],
+                                      k=top_k, max_queue=SHADOW_QUEUE, max_pending=SHADOW_PENDING)
+        self.trainer: Optional[Trainer] = None
+        self.checkpointer: Optional[Checkpointer] = None
+        self._started: Optional[Future] = None
+        self._ready = False
+        self._start_lock = threading.Lock()
+        # Startup progress for GET /ready: state, timings and the error if loading failed
+        self.startup: dict = {"state": "idle"}
+        if start:
+            self.start().result()
+
+    def start(self, background: bool = False) -> Future:
+        """Load, replay and warm up (once). The Future resolves when predictions are served from a
+        warm snapshot; with background=True the work runs on its own thread and this returns at once."""
+        with self._start_lock:
+            if self._started is None:
+                self._started = Future()
+                if background:
+                    threading.Thread(target=self._start, name="ml-startup", daemon=True).start()
+                else:
+                    self._start()
+        return self._started
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    # Readers outside the manager wait for startup instead of seeing a missing model
+    @property
+    def snapshot(self) -> ModelSnapshot:
+        if not self._ready:
+            self.wait_ready()
+        return self._snapshot
+
+    @property
+    def knn(self):
+        if not self._ready:
+            self.wait_ready()
+        return self._knn
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        self.start(background=True).result(timeout)
+
+    def _start(self):
+        started = time.perf_counter()
+        self.startup = {"state": "loading"}
+        try:
+            self._knn = self._new_index()
+            self._load()
+            self.trainer = Trainer(self._apply_batch, max_batch=TRAIN_BATCH)
+            self.checkpointer = Checkpointer(
+                self.checkpoint, lambda: self._snapshot.wal_seq - self.checkpoint_seq, self.log.sync,
+                every_updates=CHECKPOINT_EVERY, every_seconds=CHECKPOINT_SECONDS, tick=WAL_FSYNC_INTERVAL,
+            )
+            load_seconds = time.perf_counter() - started
+            self.startup["state"] = "warming"
+            self._warm_up(self._snapshot)
+            self.startup = {"state": "ready", "loadSeconds": round(load_seconds, 3),
+                            "warmupSeconds": round(time.perf_counter() - started - load_seconds, 3),
+                            "replayed": self.replayed, "legacy": self.legacy is not None}
+            self._ready = True
+            self._started.set_result(None)
+        except Exception as e:
+            self.startup = {"state": "failed", "error": str(e)}
+            self._started.set_exception(e)
+
+    def _warm_up(self, snap: ModelSnapshot):
+        # First calls pay for imports (sklearn hashing), n-gram table fills and buffer allocation
+        items = [(normalize_label(label), None) for label in WARMUP_LABELS]
+        snap.featurizer.transform([label for label, _ in items])
+        if snap.type_clf.labels or snap.cat_clf.labels or self.legacy is not None:
+            self._score(snap, items)
 
-        self._load()
-        # simple memory of seen texts per class (fallback when single class)
-        self.type_memory: dict[str, list[str]] = {}
-        self.cat_memory: dict[str, list[str]] = {}
+    @property
+    def type_labels(self) -> List[str]:
+        return self.snapshot.type_clf.labels
 
-    def _paths(self):
+    @property
+    def cat_labels(self) -> List[str]:
+        return self.snapshot.cat_clf.labels
+
+    @staticmethod
+    def _new_featurizer() -> HashingFeaturizer:
+        return HashingFeaturizer(n_features=HASH_FEATURES, brand_tokens=BRAND_TOKENS, online_idf=ONLINE_IDF)
+
+    def _new_classifier(self) -> OnlineLinearClassifier:
+        return OnlineLinearClassifier(self.featurizer.n_features, mode=CLASSIFIER_MODE, C=PA_C,
+                                      learning_rate=SGD_LR, block_size=WEIGHT_BLOCK, negatives=SGD_NEGATIVES)
+
+    @staticmethod
+    def _new_index():
+        encoder = make_encoder(KNN_ENCODER, KNN_DIM)
+        if KNN_BACKEND == "qdrant":
+            from .vector_store import QdrantIndex
+
+            return QdrantIndex(encoder, location=QDRANT_URL, path=QDRANT_PATH, collection=QDRANT_COLLECTION,
+                               batch_size=QDRANT_BATCH)
+        return NeighborIndex(encoder, capacity=KNN_CAPACITY)
+
+    @property
+    def feedback_path(self) -> Path:
+        return self.model_dir / "feedback.jsonl"
+
+    @staticmethod
+    def _load_artifacts(path: Path):
         return (
-            self.model_dir / "vectorizer.joblib",
-            self.model_dir / "type_clf.joblib",
-            self.model_dir / "cat_clf.joblib",
-            self.model_dir / "type_labels.json",
-            self.model_dir / "cat_labels.json",
+            HashingFeaturizer.load(path / "features.npz"),
+            OnlineLinearClassifier.load(path, "type_model", mmap=MMAP_MODELS),
+            OnlineLinearClassifier.load(path, "cat_model", mmap=MMAP_MODELS),
         )
 
+    @staticmethod
+    def _load_compact(path: Path) -> Optional[CompactModel]:
+        return CompactModel.load(path) if COMPACT_INFERENCE and (path / COMPACT_FILE).exists() else None
+
+    def _load_hierarchy(self, path: Path, type_clf: OnlineLinearClassifier, wal_seq: int) -> CategoryTypeMap:
+        if (path / "hierarchy.json").exists():
+            return CategoryTypeMap.load(path / "hierarchy.json")
+        records = (r for r in self.log.read() if r["seq"] <= wal_seq)
+        return CategoryTypeMap.from_records(records, type_clf.index)
+
     def _load(self):
-        v_path, t_path, c_path, tl_path, cl_path = self._paths()
+        """Load the last checkpoint (or, without one, the active registry version), then replay
+        the feedback log tail written after it."""
+        ckpt = latest_checkpoint(self.model_dir)
+        active = self.registry.active()
+        if ckpt is None and active is None and any((self.model_dir / name).exists() for name in LEGACY_ARTIFACTS):
+            self.migrate()
+        wal_seq = 0
+        model_version = None
+        compact = None
         try:
-            if v_path.exists():
-                self.vectorizer = joblib.load(v_path)
-                self._fitted_vectorizer = True
-            if t_path.exists() and tl_path.exists():
-                self.type_clf = joblib.load(t_path)
-                self.type_labels = json.loads(tl_path.read_text())
-                self._fitted_type = True
-            if c_path.exists() and cl_path.exists():
-                self.cat_clf = joblib.load(c_path)
-                self.cat_labels = json.loads(cl_path.read_text())
-                self._fitted_cat = True
+            if ckpt is not None:
+                path, wal_seq = ckpt
+                self.featurizer, self.type_clf, self.cat_clf = self._load_artifacts(path)
+                compact = self._load_compact(path)
+                self.hierarchy = self._load_hierarchy(path, self.type_clf, wal_seq)
+                self._knn.load(path)
+                model_version = checkpoint_meta(path).get("modelVersion")
+                self.checkpoint_seq = wal_seq
+            elif active is not None:
+                wal_seq = self.registry.verify(active)["walSeq"]
+                self.featurizer, self.type_clf, self.cat_clf = self._load_artifacts(self.registry.path(active))
+                compact = self._load_compact(self.registry.path(active))
+                self.hierarchy = self._load_hierarchy(self.registry.path(active), self.type_clf, wal_seq)
+                self._knn.load(self.registry.path(active))
+                model_version = active
         except Exception:
-            # if any load error occurs, start fresh
-            self._fitted_vectorizer = False
-            self._fitted_type = False
-            self._fitted_cat = False
-
-    def _save(self):
-        v_path, t_path, c_path, tl_path, cl_path = self._paths()
-        if self._fitted_vectorizer:
-            joblib.dump(self.vectorizer, v_path)
-        if self._fitted_type:
-            joblib.dump(self.type_clf, t_path)
-            tl_path.write_text(json.dumps(self.type_labels))
-        if self._fitted_cat:
-            joblib.dump(self.cat_clf, c_path)
-            cl_path.write_text(json.dumps(self.cat_labels))
-
-    def _ensure_vectorizer(self, texts: List[str]):
-        if not self._fitted_vectorizer:
-            X = self.vectorizer.fit_transform(texts)
-            self._fitted_vectorizer = True
-            return X
-        return self.vectorizer.transform(texts)
-
-    def feedback(self, label_raw: str, brand: Optional[str], final_type_id: str, final_cat_id: Optional[str]):
-        # Create or update class lists
-        if final_type_id not in self.type_labels:
-            self.type_labels.append(final_type_id)
-        if final_cat_id:
-            if final_cat_id not in self.cat_labels:
-                self.cat_labels.append(final_cat_id)
-
-        text = self._combine(label_raw, brand)
-        X = self._ensure_vectorizer([text])
-
-        # Train type classifier
-        # store memory
-        self.type_memory.setdefault(final_type_id, []).append(text)
-        y_type = np.array([self.type_labels.index(final_type_id)])
-        # train only if we have at least 2 classes
-        if len(self.type_labels) >= 2:
-            if not self._fitted_type:
-                self.type_clf.partial_fit(X, y_type, classes=np.arange(len(self.type_labels)))
-                self._fitted_type = True
-            else:
-                self.type_clf.partial_fit(X, y_type, classes=np.arange(len(self.type_labels)))
-
-        # Train category if provided
-        if final_cat_id:
-            self.cat_memory.setdefault(final_cat_id, []).append(text)
-            if len(self.cat_labels) >= 2:
-                y_cat = np.array([self.cat_labels.index(final_cat_id)])
-                if not self._fitted_cat:
-                    self.cat_clf.partial_fit(X, y_cat, classes=np.arange(len(self.cat_labels)))
-                    self._fitted_cat = True
-                else:
-                    self.cat_clf.partial_fit(X, y_cat, classes=np.arange(len(self.cat_labels)))
+            # if any load error occurs, start fresh and rebuild from the whole log
+            self.featurizer = self._new_featurizer()
+            self.type_clf = self._new_classifier()
+            self.cat_clf = self._new_classifier()
+            self.hierarchy = CategoryTypeMap()
+            self._knn = self._new_index()
+            wal_seq, model_version, compact = 0, None, None
+        if KNN_MODE != "off" and self._knn.seq < wal_seq:
+            # The index was not saved with these artifacts (or lives in a fresh in-memory store)
+            for record in self.log.read(after_seq=self._knn.seq):
+                if record["seq"] > wal_seq:
+                    break
+                self._knn.insert(self._neighbour_key(record["labelRaw"], record.get("brand")),
+                                record["finalTypeId"], record.get("finalCategoryId"), seq=record["seq"])
+        wal_seq, self.replayed = self._replay(wal_seq)
+        self.applied_seq = wal_seq
+        self._knn.flush()
+        self._publish(wal_seq, model_version, compact if self.replayed == 0 else None)
+        if ckpt is not None and self.replayed == 0:
+            self._checkpoint_version = self._snapshot.version
+        if self._snapshot.type_clf.updates < LEGACY_UNTIL_UPDATES:
+            self.legacy = LegacyModel.load(self.model_dir / "legacy")
 
-        self._save()
+    def migrate(self):
+        """Move artifacts of earlier model layouts aside; recovery then rebuilds the models by
+        replaying the whole feedback log. The first (TF-IDF) layout predates the log: nothing can
+        rebuild it, so it keeps serving from legacy/ until the new models have trained."""
+        legacy_dir = self.model_dir / "legacy"
+        legacy_dir.mkdir(exist_ok=True)
+        for name in LEGACY_ARTIFACTS:
+            path = self.model_dir / name
+            if path.exists():
+                path.replace(legacy_dir / name)
 
-    def predict(self, label_raw: str, brand: Optional[str]):
-        text = self._combine(label_raw, brand)
-        if not self._fitted_vectorizer:
-            return [], []
-        X = self.vectorizer.transform([text])
-        type_candidates: List[Candidate] = []
-        cat_candidates: List[Candidate] = []
-
-        if self._fitted_type and len(self.type_labels) > 0:
-            try:
-                proba = self.type_clf.predict_proba(X)[0]
-                idxs = np.argsort(proba)[::-1][: self.top_k]
-                for i in idxs:
-                    type_candidates.append(Candidate(id=self.type_labels[i], name="", conf=float(proba[i])))
-            except Exception:
-                pass
-        elif len(self.type_labels) == 1:
-            # Fallback: only one known class
-            type_candidates.append(Candidate(id=self.type_labels[0], name="", conf=1.0))
+    def _publish(self, wal_seq: int, model_version: Optional[str] = None, compiled: Optional[CompiledModel] = None):
+        """Publish the working model; `compiled` (a loaded CompactModel) serves only if it holds exactly this state."""
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        if model_version is None and self._snapshot is not None:
+            model_version = self._snapshot.model_version
+        featurizer, type_clf, cat_clf = self.featurizer.freeze(), self.type_clf.freeze(), self.cat_clf.freeze()
+        if compiled is None and COMPILED_INFERENCE:
+            compiled = CompiledModel(featurizer, type_clf, cat_clf)
+        self._snapshot = ModelSnapshot(
+            version=version, wal_seq=wal_seq, featurizer=featurizer, type_clf=type_clf, cat_clf=cat_clf,
+            model_version=model_version, hierarchy=self.hierarchy.freeze(), compiled=compiled,
+        )
 
-        if self._fitted_cat and len(self.cat_labels) > 0:
+    def _saver(self, snap: ModelSnapshot):
+        def save(path: Path):
+            snap.featurizer.save(path / "features.npz")
+            snap.type_clf.save(path, "type_model")
+            snap.cat_clf.save(path, "cat_model")
+            snap.hierarchy.save(path / "hierarchy.json")
+            if isinstance(snap.compiled, CompactModel):
+                snap.compiled.save(path)
+            # May run ahead of snap.wal_seq; its own seq keeps the replay from voting twice
+            self._knn.save(path)
+        return save
+
+    def checkpoint(self):
+        """Persist the current snapshot; it is immutable, so no coordination with the trainer is needed."""
+        self.wait_ready()
+        with self._checkpoint_lock:
+            snap = self._snapshot
+            if snap.version == self._checkpoint_version:
+                return
+            current = latest_checkpoint(self.model_dir)
+            if current is not None and current[1] > snap.wal_seq:
+                # Another worker sharing the directory already checkpointed further: never move the pointer back
+                self.checkpoint_seq = snap.wal_seq
+                self._checkpoint_version = snap.version
+                return
+            write_checkpoint(self.model_dir, snap.wal_seq, self._saver(snap), keep=CHECKPOINT_KEEP,
+                             extra={"modelVersion": snap.model_version})
+            self.checkpoint_seq = snap.wal_seq
+            self._checkpoint_version = snap.version
+
+    def close(self):
+        if self._started is not None:
+            # Never tear down under a load still in progress
             try:
-                proba = self.cat_clf.predict_proba(X)[0]
-                idxs = np.argsort(proba)[::-1][: self.top_k]
-                for i in idxs:
-                    cat_candidates.append(Candidate(id=self.cat_labels[i], name="", conf=float(proba[i])))
+                self._started.result()
             except Exception:
                 pass
-        elif len(self.cat_labels) == 1:
-            cat_candidates.append(Candidate(id=self.cat_labels[0], name="", conf=1.0))
+        if self.ready:
+            self.trainer.stop()
+            self.checkpointer.stop()
+        self.shadow.close()
+        if self._knn is not None:
+            self._knn.close()
+        self.log.close()
+        self._loader.shutdown(wait=False)
+
+    # --- registry -------------------------------------------------------------------------
+
+    def publish_version(self, source: str = "online", metrics: Optional[dict] = None) -> str:
+        """Register the serving snapshot as a new registry version (it does not activate it)."""
+        self.wait_ready()
+        snap = self._snapshot
+        metrics = {"types": len(snap.type_clf), "categories": len(snap.cat_clf),
+                   "updates": snap.type_clf.updates, **(metrics or {})}
+        return self.registry.publish(self._saver(snap), source=source, wal_seq=snap.wal_seq, metrics=metrics,
+                                     extra={"baseVersion": snap.model_version})
+
+    def activate(self, version: str, rollback: bool = False) -> Future:
+        """Load, verify and warm up a registry version in the background, then switch to it.
+
+        The trainer only takes part in the final step: it replaces the working model, replays the
+        feedback logged after the version's walSeq and publishes, so predictions switch atomically.
+        """
+        self.registry.manifest(version)  # unknown versions fail fast
+        self.wait_ready()
+        self.activation = {"version": version, "state": "queued", "rollback": rollback}
+        return self._loader.submit(self._activate, version, rollback)
+
+    def rollback(self) -> Future:
+        previous = self.registry.previous()
+        if previous is None:
+            raise RegistryError("no previous version to roll back to")
+        return self.activate(previous, rollback=True)
+
+    def _activate(self, version: str, rollback: bool):
+        try:
+            self.activation["state"] = "loading"
+            manifest = self.registry.verify(version)
+            featurizer, type_clf, cat_clf = self._load_artifacts(self.registry.path(version))
+            compact = self._load_compact(self.registry.path(version))
+            hierarchy = self._load_hierarchy(self.registry.path(version), type_clf, manifest["walSeq"])
+            self.activation["state"] = "warming"
+            if compact is not None:
+                for label in WARMUP_LABELS:
+                    compact.predict(label, None, self.top_k)
+            else:
+                X = featurizer.transform(WARMUP_LABELS)
+                type_clf.top_k(X, self.top_k)
+                cat_clf.top_k(X, self.top_k)
+
+            def swap():
+                self.featurizer, self.type_clf, self.cat_clf = featurizer, type_clf, cat_clf
+                self.hierarchy = hierarchy
+                wal_seq, replayed = self._replay(manifest["walSeq"])
+                self.applied_seq = wal_seq
+                self._knn.flush()
+                self._publish(wal_seq, version, compact if replayed == 0 else None)
+                self.registry.set_active(version, rollback=rollback)
+
+            self.activation["state"] = "switching"
+            self.trainer.call(swap).result()
+            self.checkpoint()
+            self.activation["state"] = "active"
+            return version
+        except Exception as e:
+            self.activation.update(state="failed", error=str(e))
+            raise
+
+    def _shadow_scorer(self, version: str):
+        """Inference-only copy of a registry version for the shadow worker; never touches the serving state."""
+        manifest = self.registry.verify(version)
+        path = self.registry.path(version)
+        featurizer, type_clf, cat_clf = self._load_artifacts(path)
+        hierarchy = self._load_hierarchy(path, type_clf, manifest["walSeq"]) if HIERARCHICAL else None
+        hierarchy = hierarchy if hierarchy is not None and len(hierarchy) else None
+        compiled = self._load_compact(path) or CompiledModel(featurizer, type_clf, cat_clf)
+
+        def score(label: str, brand: Optional[str]):
+            types, cats = compiled.predict(self._combine(label, brand), brand, self.top_k, hierarchy, HIER_TOP_CATEGORIES)
+            return [t for t, _ in types], [c for c, _ in cats]
+        return score
+
+    def _apply_records(self, records: List[dict], seqs: List[int], track: bool = True):
+        """Fit logged records: identical corrections are coalesced into one example weighted by their count."""
+        examples = self.aggregator.aggregate(records, seqs, track)
+        brands = [ex.brand for ex in examples]
+        weights = np.asarray([ex.weight for ex in examples])
+        X = self.featurizer.partial_fit_transform(
+            [self._combine(ex.labelRaw, ex.brand) for ex in examples], brands, sample_weight=weights)
+        self.type_clf.partial_fit(X, [ex.finalTypeId for ex in examples], sample_weight=weights)
+        rows = [i for i, ex in enumerate(examples) if ex.finalCategoryId]
+        if rows:
+            self.cat_clf.partial_fit(X[rows], [examples[i].finalCategoryId for i in rows], sample_weight=weights[rows])
+        for ex in examples:
+            self.hierarchy.add(ex.finalCategoryId, self.type_clf.index[ex.finalTypeId])
+            new = [seq for seq in ex.seqs if seq > self._knn.seq] if KNN_MODE != "off" else []
+            if new:
+                self._knn.insert(self._neighbour_key(ex.labelRaw, ex.brand), ex.finalTypeId, ex.finalCategoryId,
+                                seq=max(new), weight=float(len(new)))
+        self.applied_seq = max(self.applied_seq, max(seqs))
+
+    def _log_batch(self, records: List[dict]) -> List[int]:
+        """Log records applied together (they share a "batch" id, so a replay groups and aggregates
+        them exactly as they were trained), after applying what other workers logged before them."""
+        seqs = self.log.append_many(records)
+        # Keeps the model, and the walSeq it is checkpointed with, free of gaps under several workers
+        self._apply_logged(r for r in self.log.take_foreign() if r["seq"] > self.applied_seq)
+        return seqs
+
+    def _replay(self, after_seq: int) -> tuple[int, int]:
+        """Apply the log records after after_seq; returns (last seq, count)."""
+        seq, count = self._apply_logged(self.log.read(after_seq=after_seq))
+        return max(seq, after_seq), count
+
+    def _apply_logged(self, records: Iterable[dict]) -> tuple[int, int]:
+        """Apply logged records batch by batch as they were trained; returns (last seq or 0, count)."""
+        seq, count, chunk = 0, 0, []
+        for record in records:
+            if chunk and (record.get("batch") is None or record.get("batch") != chunk[-1].get("batch")):
+                self._apply_records(chunk, [r["seq"] for r in chunk], track=False)
+                count, chunk = count + len(chunk), []
+            chunk.append(record)
+            seq = record["seq"]
+        if chunk:
+            self._apply_records(chunk, [r["seq"] for r in chunk], track=False)
+            count += len(chunk)
+        return seq, count
 
-        return type_candidates, cat_candidates
+    def _apply_batch(self, records: List[dict]):
+        # Runs on the trainer thread only. Log first: a record is recoverable before the model reflects it
+        seqs = self._log_batch(records)
+        self._apply_records(records, seqs)
+        # Buffered neighbour inserts (Qdrant) become searchable with the model, not on a later request
+        self._knn.flush()
+        self._publish(seqs[-1])
+        self.checkpointer.notify()
+
+    def submit(self, records: List[dict]) -> Future:
+        self.wait_ready()
+        if self.shadow.enabled:
+            self.shadow.observe([self._cache_key(r["labelRaw"], r.get("brand")) for r in records], records)
+        return self.trainer.submit(records)
+
+    def train_batch(self, records: List[dict], publish: bool = False) -> Future:
+        """Queue one mini-batch of a bulk load; it is logged and fitted vectorized on the trainer thread.
+        A snapshot is published when `publish` is set or STREAM_PUBLISH_SECONDS have passed."""
+        self.wait_ready()
+        return self.trainer.call(lambda: self._train_vectorized(records, publish))
+
+    def _train_vectorized(self, records: List[dict], publish: bool = True):
+        if records:
+            seqs = self._log_batch(records)
+            self._apply_records(records, seqs)
+            self._stream_seq = seqs[-1]
+        due = publish or time.monotonic() - self._stream_published >= STREAM_PUBLISH_SECONDS
+        if due and self._stream_seq > self._snapshot.wal_seq:
+            self._knn.flush(wait=False)
+            self._publish(self._stream_seq)
+            self._stream_published = time.monotonic()
+
+    def feedback(self, label_raw: str, brand: Optional[str], final_type_id: str, final_cat_id: Optional[str]) -> Future:
+        """Queue one correction; the Future resolves once it is visible to predictions."""
+        return self.submit([{"labelRaw": label_raw, "brand": brand, "finalTypeId": final_type_id, "finalCategoryId": final_cat_id}])
+
+    def predict(self, label_raw: str, brand: Optional[str]):
+        return self.predict_batch([(label_raw, brand)])[0]
+
+    def predict_batch(self, items: List[tuple[str, Optional[str]]]):
+        """Classify many labels at once. Labels are normalized first; cached answers for the
+        serving snapshot are reused and only the misses are scored, in one call."""
+        if not items:
+            return []
+        if not self.ready:
+            self.wait_ready()
+        snap = self._snapshot
+        if not snap.type_clf.labels and not snap.cat_clf.labels and self.legacy is None:
+            return [([], []) for _ in items]
+        keys = [self._cache_key(label_raw, brand) for label_raw, brand in items]
+        results = self.cache.get_many(keys, snap.version)
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            # Spelling variants of one product normalize to one key: score each distinct key once
+            distinct = list(dict.fromkeys(keys[i] for i in misses))
+            scored = dict(zip(distinct, self._score(snap, distinct)))
+            for i in misses:
+                results[i] = scored[keys[i]]
+            self.cache.put_many(distinct, [scored[k] for k in distinct], snap.version)
+        self.shadow.offer(keys, results)
+        return results
+
+    def _score(self, snap: ModelSnapshot, items: List[tuple[str, Optional[str]]]):
+        """One sparse matrix and one matrix product per classifier, or the compiled scorer for small batches."""
+        hierarchy = snap.hierarchy if HIERARCHICAL and len(snap.hierarchy) else None
+        legacy = self.legacy
+        if legacy is not None and snap.type_clf.updates >= LEGACY_UNTIL_UPDATES:
+            # The new models have caught up: drop the TF-IDF model for good
+            self.legacy = legacy = None
+        if legacy is not None:
+            results = [self._candidates(t, c) for t, c in legacy.top_k(
+                [self._combine(label_raw, brand) for label_raw, brand in items], self.top_k)]
+        elif snap.compiled is not None and (len(items) <= COMPILED_MAX_BATCH or snap.compiled.sparse):
+            results = [self._candidates(*snap.compiled.predict(self._combine(label_raw, brand), brand, self.top_k,
+                                                               hierarchy, HIER_TOP_CATEGORIES))
+                       for label_raw, brand in items]
+        else:
+            X = snap.featurizer.transform([self._combine(label_raw, brand) for label_raw, brand in items],
+                                          [brand for _, brand in items])
+            if hierarchy is None:
+                results = list(zip(self._top_k(snap.type_clf, X), self._top_k(snap.cat_clf, X)))
+            else:
+                results = self._top_k_hierarchical(snap, hierarchy, X)
+        if KNN_MODE == "off" or not len(self._knn):
+            return results
+        return [self._with_neighbours(snap, label_raw, brand, t, c) for (label_raw, brand), (t, c) in zip(items, results)]
+
+    @staticmethod
+    def _needs_fallback(candidates: List[Candidate], n_classes: int) -> bool:
+        return n_classes < 2 or not candidates or candidates[0].conf < KNN_MIN_CONF
+
+    def _with_neighbours(self, snap: ModelSnapshot, label_raw: str, brand: Optional[str], type_c, cat_c):
+        n_types, n_cats = len(snap.type_clf.labels), len(snap.cat_clf.labels)
+        # In fallback mode a confident classifier answers alone: skip the neighbour search entirely
+        if KNN_MODE != "blend" and not (self._needs_fallback(type_c, n_types) or self._needs_fallback(cat_c, n_cats)):
+            return type_c, cat_c
+        type_votes, cat_votes = self._knn.vote(self._neighbour_key(label_raw, brand), k=KNN_K, min_sim=KNN_MIN_SIM)
+        return self._merge(type_c, type_votes, n_types), self._merge(cat_c, cat_votes, n_cats)
+
+    def _merge(self, candidates: List[Candidate], votes, n_classes: int) -> List[Candidate]:
+        if not votes:
+            return candidates
+        if KNN_MODE == "blend":
+            scores = {c.id: (1 - KNN_WEIGHT) * c.conf for c in candidates}
+            for label, conf in votes:
+                scores[label] = scores.get(label, 0.0) + KNN_WEIGHT * conf
+            ranked = sorted(scores.items(), key=lambda p: -p[1])
+        elif self._needs_fallback(candidates, n_classes):
+            ranked = votes
+        else:
+            return candidates
+        return [Candidate(id=label, name="", conf=conf) for label, conf in ranked[:self.top_k]]
+
+    def _top_k_hierarchical(self, snap: ModelSnapshot, hierarchy: CategoryTypeMap, X):
+        """Categories for all rows at once, then types per group of rows sharing the same top categories."""
+        cat_rows = snap.cat_clf.top_k(X, max(self.top_k, HIER_TOP_CATEGORIES))
+        groups: dict = {}
+        for row, pairs in enumerate(cat_rows):
+            groups.setdefault(tuple(c for c, _ in pairs[:HIER_TOP_CATEGORIES]), []).append(row)
+        type_rows: List = [None] * X.shape[0]
+        for cats, rows in groups.items():
+            classes = hierarchy.candidates(cats)
+            pairs = snap.type_clf.top_k(X[rows], self.top_k, classes if len(classes) else None)
+            for row, p in zip(rows, pairs):
+                type_rows[row] = p
+        return [self._candidates(t, c[:self.top_k]) for t, c in zip(type_rows, cat_rows)]
+
+    @staticmethod
+    def _candidates(type_pairs, cat_pairs):
+        return ([Candidate(id=label, name="", conf=conf) for label, conf in type_pairs],
+                [Candidate(id=label, name="", conf=conf) for label, conf in cat_pairs])
+
+    def _top_k(self, clf: OnlineLinearClassifier, X) -> List[List[Candidate]]:
+        return [[Candidate(id=label, name="", conf=conf) for label, conf in row] for row in clf.top_k(X, self.top_k)]
+
+    @staticmethod
+    def _cache_key(label_raw: str, brand: Optional[str]) -> tuple:
+        return normalize_label(label_raw), normalize_label(brand) if brand else None
+
+    @staticmethod
+    def _neighbour_key(label_raw: str, brand: Optional[str]) -> str:
+        return normalize_label(f"{label_raw} {brand}" if brand else label_raw)
 
     @staticmethod
     def _combine(label_raw: str, brand: Optional[str]):
@@ -198,16 +804,51 @@ class ModelManager:
 
 MODEL_DIR = os.getenv("MODEL_DIR", "/app/models")
 TOP_K = int(os.getenv("TOP_K", "3"))
-manager = ModelManager(MODEL_DIR, top_k=TOP_K)
+# Importing the app must stay fast: the model loads on its own thread while the server starts
+manager = ModelManager(MODEL_DIR, top_k=TOP_K, start=False)
+manager.start(background=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Loading began at import (no-op here); the server listens and /health answers meanwhile,
+    # /ready flips once the snapshot is warm
+    manager.start(background=True)
+    warn = asyncio.create_task(_warn_legacy())
+    yield
+    warn.cancel()
+    # Final fsync + checkpoint so a clean restart does not need to replay the log
+    manager.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def _ready():
+    """Wait for startup without blocking the event loop; requests arriving early queue here."""
+    if not manager.ready:
+        await asyncio.wrap_future(manager.start(background=True))
+
 
-app = FastAPI()
+async def _warn_legacy():
+    try:
+        await _ready()
+    except Exception:
+        return
+    if manager.legacy is not None:
+        await logger.warning("ML Legacy Model",
+                             f"Serving the migrated TF-IDF model ({len(manager.legacy)} types): it cannot be rebuilt from "
+                             f"the feedback log and serves until the new models have {LEGACY_UNTIL_UPDATES} updates",
+                             {"legacyDir": str(manager.model_dir / "legacy"), "untilUpdates": LEGACY_UNTIL_UPDATES})
 
 
 @app.post("/predict", response_model=PredictResponse)
 async def predict(req: PredictRequest):
+    await _ready()
     try:
         await logger.debug("ML Prediction", f"Predicting for label: {req.labelRaw}", {"label": req.labelRaw})
-        t, c = manager.predict(req.labelRaw, req.brand)
+        # Scoring is CPU work (and a Qdrant round trip with that backend): keep it off the event loop
+        t, c = await run_in_threadpool(manager.predict, req.labelRaw, req.brand)
         await logger.debug("ML Prediction Complete", f"Returned {len(t)} type and {len(c)} category candidates", {
             "label": req.labelRaw,
             "typeCandidates": len(t),
@@ -219,15 +860,28 @@ async def predict(req: PredictRequest):
         raise
 
 
+@app.post("/predict/batch", response_model=PredictBatchResponse)
+async def predict_batch(req: PredictBatchRequest):
+    await _ready()
+    try:
+        await logger.debug("ML Batch Prediction", f"Predicting {len(req.items)} labels", {"itemCount": len(req.items)})
+        results = await run_in_threadpool(manager.predict_batch, [(it.labelRaw, it.brand) for it in req.items])
+        return PredictBatchResponse(results=[PredictResponse(typeCandidates=t, categoryCandidates=c) for t, c in results])
+    except Exception as e:
+        await logger.error("ML Batch Prediction Error", f"Error predicting {len(req.items)} labels", e, {"itemCount": len(req.items)})
+        raise
+
+
 @app.post("/feedback")
 async def feedback(req: FeedbackRequest):
+    await _ready()
     try:
         await logger.info("ML Feedback", f"Received feedback for label: {req.labelRaw}", {
             "label": req.labelRaw,
             "finalTypeId": req.finalTypeId,
             "finalCategoryId": req.finalCategoryId or "null"
         })
-        manager.feedback(req.labelRaw, req.brand, req.finalTypeId, req.finalCategoryId)
+        await asyncio.wrap_future(manager.feedback(req.labelRaw, req.brand, req.finalTypeId, req.finalCategoryId))
         await logger.info("ML Model Updated", "Model updated with feedback, training completed")
         return {"status": "ok"}
     except Exception as e:
@@ -237,11 +891,11 @@ async def feedback(req: FeedbackRequest):
 
 @app.post("/train")
 async def train(req: TrainRequest):
+    await _ready()
     try:
         await logger.info("ML Batch Training", f"Starting batch training with {len(req.examples)} examples", {"exampleCount": len(req.examples)})
-        # Simple batch training from examples
-        for ex in req.examples:
-            manager.feedback(ex.labelRaw, ex.brand, ex.finalTypeId, ex.finalCategoryId)
+        # One submission: the trainer applies the examples in order and publishes once per batch
+        await asyncio.wrap_future(manager.submit([ex.model_dump() for ex in req.examples]))
         await logger.info("ML Batch Training Complete", f"Model updated with {len(req.examples)} examples")
         return {"status": "ok"}
     except Exception as e:
@@ -249,6 +903,182 @@ async def train(req: TrainRequest):
         raise
 
 
+async def _file_chunks(path: Path, size: int = 1 << 20):
+    with path.open("rb") as fh:
+        while True:
+            chunk = await run_in_threadpool(fh.read, size)
+            if not chunk:
+                return
+            yield chunk
+
+
+@app.post("/train/stream")
+async def train_stream(request: Request, path: Optional[str] = None, batchSize: int = STREAM_BATCH,
+                       shuffleBuffer: int = STREAM_SHUFFLE, seed: Optional[int] = None):
+    """Bulk training from NDJSON (one feedback record per line) in the request body, or from a file
+    under ML_TRAIN_DATA_DIR with ?path=. Memory is bounded by the shuffle buffer and two in-flight
+    mini-batches; periodic checkpoints are held back and one checkpoint is written at the end."""
+    await _ready()
+    if path is not None:
+        root = Path(TRAIN_DATA_DIR or manager.model_dir).resolve()
+        source = (root / path).resolve()
+        if not source.is_relative_to(root) or source == manager.feedback_path.resolve():
+            return JSONResponse({"error": f"path must be a training file under {root}"}, status_code=400)
+        if not source.is_file():
+            return JSONResponse({"error": f"not found: {path}"}, status_code=404)
+        chunks = _file_chunks(source)
+    else:
+        chunks = request.stream()
+    batcher = MiniBatcher(batchSize, shuffleBuffer, seed)
+    in_flight: List[Future] = []
+    batches = 0
+
+    async def submit(batch: List[dict]):
+        nonlocal batches
+        in_flight.append(manager.train_batch(batch))
+        batches += 1
+        if len(in_flight) > 1:
+            await asyncio.wrap_future(in_flight.pop(0))
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await logger.info("ML Stream Training", "Streaming training started", {"path": path or "body", "batchSize": batchSize})
+    manager.checkpointer.hold()
+    try:
+        async for line in split_lines(chunks):
+            for batch in batcher.feed(line):
+                await submit(batch)
+        for batch in batcher.finish():
+            await submit(batch)
+        in_flight.append(manager.train_batch([], publish=True))
+        for fut in in_flight:
+            await asyncio.wrap_future(fut)
+        await run_in_threadpool(manager.checkpoint)
+    except Exception as e:
+        await logger.error("ML Stream Training Error", "Streaming training failed", e, {"examples": batcher.parsed})
+        raise
+    finally:
+        manager.checkpointer.release()
+    seconds = loop.time() - started
+    result = {"status": "ok", "examples": batcher.parsed, "skipped": batcher.skipped, "batches": batches,
+              "seconds": round(seconds, 3), "examplesPerSecond": round(batcher.parsed / seconds, 1) if seconds else None}
+    await logger.info("ML Stream Training Complete", f"Trained on {batcher.parsed} streamed examples", result)
+    return result
+
+
+@app.get("/models")
+def list_models():
+    manager.wait_ready()
+    snap = manager.snapshot
+    versions = []
+    for version in manager.registry.versions():
+        try:
+            versions.append(manager.registry.manifest(version))
+        except Exception:
+            continue
+    return {
+        "active": manager.registry.active(),
+        "serving": {"modelVersion": snap.model_version, "snapshot": snap.version, "walSeq": snap.wal_seq},
+        "previous": manager.registry.previous(),
+        "activation": manager.activation,
+        "versions": versions,
+    }
+
+
+@app.post("/models/publish")
+async def publish_model():
+    await _ready()
+    try:
+        version = await run_in_threadpool(manager.publish_version)
+        await logger.info("ML Model Published", f"Published serving model as {version}", {"version": version})
+        return {"version": version}
+    except Exception as e:
+        await logger.error("ML Model Publish Error", "Error publishing the serving model", e)
+        raise
+
+
+async def _switch(start, wait: bool, action: str):
+    await _ready()
+    try:
+        fut = start()
+    except RegistryError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    version = manager.activation.get("version")
+    await logger.info("ML Model Switch", f"{action} to {version} requested", {"version": version, "wait": wait})
+    if not wait:
+        return JSONResponse({"status": "activating", "version": version}, status_code=202)
+    try:
+        await asyncio.wrap_future(fut)
+    except Exception as e:
+        await logger.error("ML Model Switch Error", f"{action} to {version} failed", e, {"version": version})
+        return JSONResponse({"status": "failed", "version": version, "error": str(e)}, status_code=409)
+    return {"status": "active", "version": version}
+
+
+@app.post("/models/{version}/activate")
+async def activate_model(version: str, wait: bool = False):
+    return await _switch(lambda: manager.activate(version), wait, "Activation")
+
+
+@app.post("/models/rollback")
+async def rollback_model(wait: bool = False):
+    return await _switch(manager.rollback, wait, "Rollback")
+
+@app.post("/similar")
+def similar(req: SimilarRequest):
+    """Confirmed labels closest to labelRaw, optionally only those confirmed with typeId/categoryId."""
+    manager.wait_ready()
+    neighbours = manager.knn.search(ModelManager._neighbour_key(req.labelRaw, req.brand), k=req.k,
+                                    type_id=req.typeId, category_id=req.categoryId)
+    return {"neighbours": [{"text": text, "score": score, "types": types, "categories": cats}
+                           for text, score, types, cats in neighbours]}
+
+
+@app.get("/feedback/stats")
+def feedback_stats():
+    """Raw vs coalesced feedback counts and the most recent conflicting corrections."""
+    return manager.aggregator.stats()
+
+
+@app.get("/shadow")
+def shadow_stats():
+    """Agreement of the shadow candidates with the served answers and their accuracy on later feedback."""
+    return manager.shadow.stats()
+
+
+@app.post("/shadow")
+async def configure_shadow(req: ShadowRequest):
+    """Replace the shadow candidates (statistics restart); an empty list stops shadow scoring."""
+    for version in req.versions:
+        try:
+            manager.registry.manifest(version)
+        except RegistryError as e:
+            return JSONResponse({"error": str(e)}, status_code=404)
+    manager.shadow.configure(req.versions, req.sampleRate)
+    await logger.info("ML Shadow Configured", f"Shadow evaluation of {len(req.versions)} versions",
+                      {"versions": ",".join(req.versions), "sampleRate": manager.shadow.sample_rate})
+    return manager.shadow.stats()
+
+
+@app.get("/cache")
+def cache_stats():
+    return manager.cache.stats()
+
+
 @app.get("/health")
 def health():
+    # Liveness only: answers while the model is still loading
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once the model is loaded, the log replayed and a warm-up prediction done."""
+    manager.start(background=True)
+    startup = dict(manager.startup)
+    status = startup.pop("state")
+    if not manager.ready:
+        return JSONResponse({"status": status, **startup}, status_code=503)
+    snap = manager.snapshot
+    return {"status": status, **startup, "snapshot": snap.version, "walSeq": snap.wal_seq,
+            "modelVersion": snap.model_version, "trainerQueue": manager.trainer.pending()}
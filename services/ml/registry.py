@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Optional
+
+class RegistryError(Exception):
+    pass
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """Versioned model directories under MODEL_DIR/registry.
+
+    registry/
+      v0001/  features.npz type_model.* cat_model.* manifest.json
+      ACTIVE        name of the version serving traffic (replaced atomically)
+      history.json  previously active versions, oldest first, used by rollback
+
+    The manifest carries creation time, source, the feedback log position (walSeq) the version
+    was trained up to, free-form metrics and a sha256 per artifact that is verified on load.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path(self, version: str) -> Path:
+        if not version or "/" in version or "\\" in version or version.startswith("."):
+            raise RegistryError(f"invalid version: {version!r}")
+        return self.root / version
+
+    def versions(self) -> List[str]:
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir() and (p / "manifest.json").exists())
+
+    def manifest(self, version: str) -> dict:
+        path = self.path(version) / "manifest.json"
+        if not path.exists():
+            raise RegistryError(f"unknown version: {version}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def publish(self, save: Callable[[Path], None], source: str, wal_seq: int,
+                metrics: Optional[dict] = None, extra: Optional[dict] = None) -> str:
+        """Write a new version: artifacts go to a temporary directory that is renamed into place
+        once the manifest is complete, so a listed version is always whole."""
+        tmp = self.root / f".tmp-{uuid.uuid4().hex}"
+        tmp.mkdir()
+        try:
+            save(tmp)
+            files = {name: {"sha256": sha256_file(tmp / name), "bytes": (tmp / name).stat().st_size}
+                     for name in sorted(os.listdir(tmp))}
+            manifest = {
+                "createdAt": datetime.now(timezone.utc).isoformat(),
+                "source": source,
+                "walSeq": wal_seq,
+                "metrics": metrics or {},
+                "files": files,
+                **(extra or {}),
+            }
+            with self._lock:
+                existing = [int(v[1:]) for v in self.versions() if v[1:].isdigit()]
+                number = max(existing, default=0) + 1
+                while True:
+                    version = f"v{number:04d}"
+                    manifest["version"] = version
+                    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+                    try:
+                        os.rename(tmp, self.root / version)
+                        return version
+                    except OSError:
+                        # Taken by another process publishing concurrently
+                        number += 1
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def verify(self, version: str) -> dict:
+        manifest = self.manifest(version)
+        for name, info in manifest["files"].items():
+            path = self.path(version) / name
+            if not path.exists() or sha256_file(path) != info["sha256"]:
+                raise RegistryError(f"checksum mismatch for {version}/{name}")
+        return manifest
+
+    def active(self) -> Optional[str]:
+        pointer = self.root / "ACTIVE"
+        if not pointer.exists():
+            return None
+        return pointer.read_text().strip() or None
+
+    def history(self) -> List[str]:
+        path = self.root / "history.json"
+        return json.loads(path.read_text()) if path.exists() else []
+
+    def previous(self) -> Optional[str]:
+        history = self.history()
+        return history[-1] if history else None
+
+    def set_active(self, version: str, rollback: bool = False):
+        """Atomically point ACTIVE at version. A normal switch pushes the old version onto the
+        history; a rollback pops it instead, so repeated rollbacks walk further back."""
+        with self._lock:
+            current = self.active()
+            history = self.history()
+            if rollback:
+                if history and history[-1] == version:
+                    history.pop()
+            elif current and current != version:
+                history.append(current)
+            self._write_atomic("history.json", json.dumps(history))
+            self._write_atomic("ACTIVE", version)
+
+    def _write_atomic(self, name: str, content: str):
+        tmp = self.root / f".{name}.tmp"
+        tmp.write_text(content)
+        tmp.replace(self.root / name)
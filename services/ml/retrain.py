@@ -0,0 +1,219 @@
+"""Offline retraining from the feedback log: python -m services.ml.retrain --model-dir DIR ...
+
+Rebuilds the featurizer and the type/category models from every record in MODEL_DIR/feedback.jsonl
+without touching the serving process:
+
+  1. coalesce identical corrections into weighted examples (aggregate.py), so that repeated
+     confirmations neither cost training time nor leak between the training and held-out sets;
+  2. hash all labels once, in parallel chunks (joblib), split off a held-out set of distinct
+     examples and fit IDF on the training part;
+  3. train one candidate per hyperparameter combination (C x epochs) in parallel worker
+     processes and score each on the held-out set (accuracy, top-k accuracy, macro P/R/F1, timing);
+  4. retrain the best combination on all examples and publish it to the registry as a new,
+     inactive version whose manifest carries the metrics. Activate it with
+     POST /models/{version}/activate once the numbers look right.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+
+from .aggregate import FeedbackAggregator
+from .classifier import OnlineLinearClassifier
+from .features import HashingFeaturizer
+from .hierarchy import CategoryTypeMap
+from .registry import ModelRegistry
+from .wal import read_log
+
+
+def _combine(label_raw: str, brand: Optional[str]) -> str:
+    # Same text the service featurizes (ModelManager._combine)
+    return f"{label_raw} {brand}".strip() if brand else label_raw
+
+
+def _fit(X, y: Sequence[str], w: np.ndarray, n_features: int, mode: str, C: float, epochs: int, block_size: int,
+         seed: int) -> OnlineLinearClassifier:
+    clf = OnlineLinearClassifier(n_features, mode=mode, C=C, block_size=block_size)
+    y = np.asarray(y, dtype=object)
+    # Register labels in first-seen order so the layout does not depend on the shuffle
+    for label in dict.fromkeys(y):
+        clf.add_label(label)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(X.shape[0])
+        clf.partial_fit(X[order], y[order], sample_weight=w[order])
+    return clf
+
+
+def evaluate(clf: OnlineLinearClassifier, X, y: Sequence[str], k: int, w: Optional[np.ndarray] = None) -> dict:
+    """Held-out metrics; w weights each distinct example by the number of records behind it."""
+    if not len(y):
+        return {"count": 0}
+    started = time.perf_counter()
+    rows = clf.top_k(X, k)
+    seconds = time.perf_counter() - started
+    predicted = [r[0][0] if r else "" for r in rows]
+    precision, recall, f1, _ = precision_recall_fscore_support(y, predicted, average="macro", zero_division=0,
+                                                               sample_weight=w)
+    in_top = [t in {label for label, _ in r} for t, r in zip(y, rows)]
+    return {
+        "count": len(y),
+        "accuracy": round(float(accuracy_score(y, predicted, sample_weight=w)), 4),
+        f"top{k}Accuracy": round(float(np.average(in_top, weights=w)), 4),
+        "precision": round(float(precision), 4),
+        "recall": round(float(recall), 4),
+        "f1": round(float(f1), 4),
+        "predictMsPerLabel": round(seconds * 1000 / len(y), 4),
+    }
+
+
+def _candidate(params: dict, X_train, y_type, y_cat, w_train, cat_rows, X_test, t_type, t_cat, w_test, test_cat_rows,
+               n_features: int, block_size: int, k: int, seed: int) -> dict:
+    fit = dict(n_features=n_features, mode=params["mode"], C=params["C"], epochs=params["epochs"],
+               block_size=block_size, seed=seed)
+    started = time.perf_counter()
+    type_clf = _fit(X_train, y_type, w_train, **fit)
+    cat_clf = _fit(X_train[cat_rows], y_cat, w_train[cat_rows], **fit)
+    train_seconds = time.perf_counter() - started
+    return {
+        "params": params,
+        "trainSeconds": round(train_seconds, 3),
+        "type": evaluate(type_clf, X_test, t_type, k, w_test),
+        "category": evaluate(cat_clf, X_test[test_cat_rows], t_cat, k, w_test[test_cat_rows]),
+    }
+
+
+def _score(result: dict) -> tuple:
+    return result["type"].get("f1", 0.0), result["category"].get("f1", 0.0), -result["trainSeconds"]
+
+
+def retrain(model_dir: Path, holdout: float = 0.2, C_grid: Sequence[float] = (0.1, 1.0, 10.0),
+            epochs_grid: Sequence[int] = (1, 3), mode: str = "sgd", n_jobs: int = -1,
+            n_features: int = 2 ** 16, brand_tokens: bool = True, online_idf: bool = True,
+            block_size: int = 128, top_k: int = 3, seed: int = 0, publish: bool = True) -> dict:
+    model_dir = Path(model_dir)
+    timings = {}
+    started = time.perf_counter()
+    records = [r for r in read_log(model_dir / "feedback.jsonl") if r.get("labelRaw") and r.get("finalTypeId")]
+    if len({r["finalTypeId"] for r in records}) < 2:
+        raise ValueError("need feedback for at least two types to retrain")
+    wal_seq = max(r["seq"] for r in records)
+    examples = FeedbackAggregator().aggregate(records, [r["seq"] for r in records], track=False)
+    brands = [ex.brand for ex in examples]
+    texts = [_combine(ex.labelRaw, ex.brand) for ex in examples]
+    types = np.asarray([ex.finalTypeId for ex in examples], dtype=object)
+    cats = np.asarray([ex.finalCategoryId or "" for ex in examples], dtype=object)
+    weights = np.asarray([ex.weight for ex in examples])
+    timings["readSeconds"] = round(time.perf_counter() - started, 3)
+
+    t0 = time.perf_counter()
+    featurizer = HashingFeaturizer(n_features=n_features, brand_tokens=brand_tokens, online_idf=online_idf)
+    raw = featurizer.raw(texts, brands, n_jobs=n_jobs)
+    timings["vectorizeSeconds"] = round(time.perf_counter() - t0, 3)
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(examples))
+    n_test = int(round(len(examples) * holdout)) if len(examples) > 4 else 0
+    test, train = np.sort(order[:n_test]), np.sort(order[n_test:])
+    split_featurizer = HashingFeaturizer(n_features=n_features, brand_tokens=brand_tokens, online_idf=online_idf)
+    split_featurizer.fit_raw(raw[train], weights[train])
+    X_train, X_test = split_featurizer.transform_raw(raw[train]), split_featurizer.transform_raw(raw[test])
+    cat_rows = np.flatnonzero(cats[train] != "")
+    test_cat_rows = np.flatnonzero(cats[test] != "")
+
+    grid = [{"mode": mode, "C": float(c), "epochs": int(e)} for c, e in itertools.product(C_grid, epochs_grid)]
+    t0 = time.perf_counter()
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_candidate)(params, X_train, types[train], cats[train][cat_rows], weights[train], cat_rows,
+                            X_test, types[test], cats[test][test_cat_rows], weights[test], test_cat_rows,
+                            n_features, block_size, top_k, seed)
+        for params in grid)
+    timings["searchSeconds"] = round(time.perf_counter() - t0, 3)
+    best = max(results, key=_score) if n_test else results[0]
+
+    # Final model: best parameters, every record, IDF over every record
+    t0 = time.perf_counter()
+    featurizer.fit_raw(raw, weights)
+    X = featurizer.transform_raw(raw)
+    params = best["params"]
+    fit = dict(n_features=n_features, mode=params["mode"], C=params["C"], epochs=params["epochs"],
+               block_size=block_size, seed=seed)
+    all_cat_rows = np.flatnonzero(cats != "")
+    type_clf = _fit(X, types, weights, **fit)
+    cat_clf = _fit(X[all_cat_rows], cats[all_cat_rows], weights[all_cat_rows], **fit)
+    hierarchy = CategoryTypeMap.from_records(records, type_clf.index)
+    timings["finalTrainSeconds"] = round(time.perf_counter() - t0, 3)
+
+    report = {
+        "records": len(records), "examples": len(examples), "train": int(len(train)), "holdout": int(n_test),
+        "walSeq": wal_seq,
+        "types": len(type_clf), "categories": len(cat_clf), "params": params,
+        "heldOut": {"type": best["type"], "category": best["category"]},
+        "search": results, "timings": timings, "version": None,
+    }
+    if publish:
+        def save(path: Path):
+            featurizer.save(path / "features.npz")
+            type_clf.save(path, "type_model")
+            cat_clf.save(path, "cat_model")
+            hierarchy.save(path / "hierarchy.json")
+
+        registry = ModelRegistry(model_dir / "registry")
+        t0 = time.perf_counter()
+        metrics = {"types": len(type_clf), "categories": len(cat_clf), "updates": type_clf.updates,
+                   "records": len(records), "examples": len(examples), "heldOut": report["heldOut"], "params": params}
+        report["version"] = registry.publish(save, source="retrain", wal_seq=wal_seq, metrics=metrics,
+                                             extra={"baseVersion": registry.active()})
+        timings["publishSeconds"] = round(time.perf_counter() - t0, 3)
+    timings["totalSeconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def _floats(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v]
+
+
+def main(argv=None) -> int:
+    env = os.environ
+    ap = argparse.ArgumentParser(prog="python -m services.ml.retrain")
+    ap.add_argument("--model-dir", default=env.get("MODEL_DIR", "/app/models"))
+    ap.add_argument("--holdout", type=float, default=0.2, help="fraction of distinct examples held out for evaluation")
+    ap.add_argument("--C", default="0.1,1,10", help="comma-separated PA aggressiveness values to try")
+    ap.add_argument("--epochs", default="1,3", help="comma-separated epoch counts to try")
+    ap.add_argument("--mode", default=env.get("ML_CLASSIFIER_MODE", "sgd"), choices=("pa", "sgd"))
+    ap.add_argument("--jobs", type=int, default=-1, help="joblib workers (-1: all cores)")
+    ap.add_argument("--n-features", type=int, default=int(env.get("ML_HASH_FEATURES", str(2 ** 16))))
+    ap.add_argument("--block-size", type=int, default=int(env.get("ML_WEIGHT_BLOCK", "128")))
+    ap.add_argument("--top-k", type=int, default=int(env.get("TOP_K", "3")))
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--dry-run", action="store_true", help="evaluate only, do not publish a version")
+    ap.add_argument("--report", help="also write the JSON report to this file")
+    args = ap.parse_args(argv)
+
+    flag = lambda name: env.get(name, "true").lower() in ("1", "true", "yes")
+    try:
+        report = retrain(Path(args.model_dir), holdout=args.holdout, C_grid=_floats(args.C),
+                         epochs_grid=[int(e) for e in _floats(args.epochs)], mode=args.mode, n_jobs=args.jobs,
+                         n_features=args.n_features, brand_tokens=flag("ML_BRAND_TOKENS"),
+                         online_idf=flag("ML_ONLINE_IDF"), block_size=args.block_size, top_k=args.top_k,
+                         seed=args.seed, publish=not args.dry_run)
+    except ValueError as e:
+        print(f"retrain: {e}", file=sys.stderr)
+        return 1
+    text = json.dumps(report, indent=2)
+    if args.report:
+        Path(args.report).write_text(text, encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# A scorer maps (label, brand) to the ranked type ids and category ids of one model
+Scorer = Callable[[str, Optional[str]], Tuple[List[str], List[str]]]
+
+SERVING = "serving"
+
+
+class _ModelStats:
+    def __init__(self):
+        self.scored = 0
+        self.type_agree = 0
+        self.cat_agree = 0
+        self.seconds = 0.0
+        self.matched = 0
+        self.type_hits = 0
+        self.type_top_k = 0
+        self.cat_labelled = 0
+        self.cat_hits = 0
+        self.error: Optional[str] = None
+
+    def as_dict(self, k: int, candidate: bool = True) -> dict:
+        ratio = lambda n, d: round(n / d, 4) if d else None
+        out = {"scored": self.scored}
+        if candidate:
+            # Agreement with the served answer and scoring cost; meaningless for the serving model itself
+            out.update(typeAgreement=ratio(self.type_agree, self.scored),
+                       categoryAgreement=ratio(self.cat_agree, self.scored),
+                       msPerLabel=ratio(self.seconds * 1000, self.scored))
+        out.update({
+            "feedback": {
+                "matched": self.matched,
+                "typeAccuracy": ratio(self.type_hits, self.matched),
+                f"typeTop{k}Accuracy": ratio(self.type_top_k, self.matched),
+                "categoryAccuracy": ratio(self.cat_hits, self.cat_labelled),
+            },
+        })
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class ShadowEvaluator:
+    """Scores a sample of live traffic with candidate registry versions, off the request path.
+
+    offer() is called by predictions with the answers already served: with probability
+    `sample_rate` it copies them to a bounded queue (dropping them when the queue is full) and
+    returns, so the request pays for one random draw and a put_nowait. observe() queues feedback
+    the same way. One daemon worker loads the candidates (through `load(version) -> Scorer`),
+    scores each sampled label with every candidate, records agreement with the served answer and
+    keeps the answers by normalized (label, brand) key, at most `max_pending` of them; feedback
+    for a pending key settles it, counting top-1/top-k accuracy for the serving model and every
+    candidate.
+    """
+
+    def __init__(self, load: Callable[[str], Scorer], sample_rate: float = 0.0, versions: Sequence[str] = (),
+                 k: int = 3, max_queue: int = 1000, max_pending: int = 100_000):
+        self._load = load
+        self.sample_rate = sample_rate
+        self.k = k
+        self.max_pending = max_pending
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._scorers: Dict[str, Optional[Scorer]] = {}
+        self._stats: Dict[str, _ModelStats] = {SERVING: _ModelStats()}
+        self._pending: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self.sampled = 0
+        self.dropped = 0
+        self.configure(versions, sample_rate)
+
+    @property
+    def versions(self) -> List[str]:
+        return list(self._scorers)
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and bool(self._scorers)
+
+    def configure(self, versions: Sequence[str], sample_rate: Optional[float] = None):
+        """Replace the candidate set (statistics reset) and optionally the sampling rate."""
+        with self._lock:
+            if sample_rate is not None:
+                self.sample_rate = min(1.0, max(0.0, sample_rate))
+            self._scorers = {v: None for v in dict.fromkeys(versions)}
+            self._stats = {SERVING: _ModelStats(), **{v: _ModelStats() for v in self._scorers}}
+            self._pending.clear()
+        if self._scorers and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ml-shadow", daemon=True)
+            self._thread.start()
+        if self._thread is not None:
+            # Load the candidates on the worker, not on the caller's thread
+            self._put(("load", None, None))
+
+    def offer(self, keys: List[tuple], served: List[tuple]):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        if self._put(("predict", keys, served)):
+            self.sampled += len(keys)
+
+    def observe(self, keys: List[tuple], records: List[dict]):
+        if self.enabled:
+            self._put(("feedback", keys, records))
+
+    def _put(self, item) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def drain(self, timeout: float = 10.0):
+        """Wait until everything queued so far has been processed (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                kind, keys, payload = item
+                with self._lock:
+                    if kind == "load":
+                        self._load_missing()
+                    elif kind == "predict":
+                        self._score(keys, payload)
+                    else:
+                        self._settle(keys, payload)
+            except Exception:
+                # The shadow path must never take the service down; a failed item is just not counted
+                pass
+            finally:
+                self._queue.task_done()
+
+    def _load_missing(self):
+        for version, scorer in self._scorers.items():
+            if scorer is None and not self._stats[version].error:
+                try:
+                    self._scorers[version] = self._load(version)
+                except Exception as e:
+                    self._stats[version].error = str(e)
+
+    def _score(self, keys: List[tuple], served: List[tuple]):
+        self._load_missing()
+        for key, (types, cats) in zip(keys, served):
+            live = ([c.id for c in types], [c.id for c in cats])
+            answers = {SERVING: live}
+            self._stats[SERVING].scored += 1
+            for version, scorer in self._scorers.items():
+                if scorer is None:
+                    continue
+                started = time.perf_counter()
+                answer = scorer(*key)
+                stats = self._stats[version]
+                stats.seconds += time.perf_counter() - started
+                stats.scored += 1
+                stats.type_agree += answer[0][:1] == live[0][:1]
+                stats.cat_agree += answer[1][:1] == live[1][:1]
+                answers[version] = answer
+            self._pending.pop(key, None)
+            self._pending[key] = answers
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+
+    def _settle(self, keys: List[tuple], records: List[dict]):
+        for key, record in zip(keys, records):
+            answers = self._pending.pop(key, None)
+            if answers is None:
+                continue
+            type_id, cat_id = record["finalTypeId"], record.get("finalCategoryId")
+            for name, (types, cats) in answers.items():
+                stats = self._stats.get(name)
+                if stats is None:
+                    continue
+                stats.matched += 1
+                stats.type_hits += types[:1] == [type_id]
+                stats.type_top_k += type_id in types[:self.k]
+                if cat_id:
+                    stats.cat_labelled += 1
+                    stats.cat_hits += cats[:1] == [cat_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sampleRate": self.sample_rate,
+                "versions": self.versions,
+                "sampled": self.sampled,
+                "dropped": self.dropped,
+                "queued": self._queue.qsize(),
+                "pending": len(self._pending),
+                "models": {name: s.as_dict(self.k, name != SERVING) for name, s in self._stats.items()},
+            }
@@ -0,0 +1,97 @@
+import json
+import random
+from typing import AsyncIterable, AsyncIterator, Iterator, List, Optional
+
+
+class ShuffleBuffer:
+    """Bounded shuffle for streams: holds up to `size` items and, once full, emits a uniformly
+    chosen one for every item added. Memory is O(size) whatever the stream length."""
+
+    def __init__(self, size: int, seed: Optional[int] = None):
+        self.size = max(0, size)
+        self._items: list = []
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def push(self, item):
+        if self.size <= 1:
+            return item
+        if len(self._items) < self.size:
+            self._items.append(item)
+            return None
+        i = self._rng.randrange(len(self._items))
+        out, self._items[i] = self._items[i], item
+        return out
+
+    def drain(self) -> Iterator:
+        self._rng.shuffle(self._items)
+        items, self._items = self._items, []
+        yield from items
+
+
+class MiniBatcher:
+    """Incremental NDJSON → shuffled mini-batches of feedback records.
+
+    feed(line) parses one line and returns the batches that became complete; finish() returns the
+    rest. Lines that are blank, not JSON or missing labelRaw/finalTypeId are counted in `skipped`.
+    """
+
+    def __init__(self, batch_size: int = 1024, shuffle_buffer: int = 8192, seed: Optional[int] = None):
+        self.batch_size = max(1, batch_size)
+        self.shuffle = ShuffleBuffer(shuffle_buffer, seed)
+        self._batch: List[dict] = []
+        self.parsed = 0
+        self.skipped = 0
+
+    def _record(self, line) -> Optional[dict]:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if not line.strip():
+            return None
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict) or not data.get("labelRaw") or not data.get("finalTypeId"):
+                raise ValueError
+        except ValueError:
+            self.skipped += 1
+            return None
+        self.parsed += 1
+        return {"labelRaw": str(data["labelRaw"]), "brand": data.get("brand") or None,
+                "finalTypeId": str(data["finalTypeId"]), "finalCategoryId": data.get("finalCategoryId") or None}
+
+    def _add(self, record: dict) -> List[List[dict]]:
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            batch, self._batch = self._batch, []
+            return [batch]
+        return []
+
+    def feed(self, line) -> List[List[dict]]:
+        record = self._record(line)
+        if record is None:
+            return []
+        record = self.shuffle.push(record)
+        return self._add(record) if record is not None else []
+
+    def finish(self) -> List[List[dict]]:
+        batches = []
+        for record in self.shuffle.drain():
+            batches.extend(self._add(record))
+        if self._batch:
+            batches.append(self._batch)
+            self._batch = []
+        return batches
+
+
+async def split_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Lines of a byte stream delivered in arbitrary chunks, without holding more than one line."""
+    tail = b""
+    async for chunk in chunks:
+        tail += chunk
+        *lines, tail = tail.split(b"\n")
+        for line in lines:
+            yield line
+    if tail:
+        yield tail
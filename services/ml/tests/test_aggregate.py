@@ -0,0 +1,76 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from importlib import reload
+
+from services.ml.aggregate import FeedbackAggregator
+from services.ml.features import HashingFeaturizer
+
+
+def _rec(label, type_id, cat_id="c-dairy", brand=None):
+    return {"labelRaw": label, "brand": brand, "finalTypeId": type_id, "finalCategoryId": cat_id}
+
+
+def test_identical_corrections_become_weighted_examples():
+    agg = FeedbackAggregator()
+    records = [_rec("LATTE PS 1L", "t-milk"), _rec("latte  ps 1l", "t-milk"), _rec("Latte PS 1L ", "t-milk"),
+               _rec("BANANE", "t-fruit", "c-fresh"), _rec("LATTE PS 1L", "t-milk", brand="Granarolo")]
+    examples = agg.aggregate(records, [1, 2, 3, 4, 5])
+    assert [(e.labelRaw, e.brand, e.weight, e.seqs) for e in examples] == [
+        ("latte ps 1l", None, 3.0, [1, 2, 3]), ("banane", None, 1.0, [4]), ("latte ps 1l", "granarolo", 1.0, [5])]
+    stats = agg.stats()
+    assert stats["records"] == 5 and stats["examples"] == 3 and stats["coalesced"] == 2
+    assert stats["conflicts"] == 0
+
+
+def test_conflicts_are_detected_within_the_window(monkeypatch):
+    agg = FeedbackAggregator(window=60)
+    agg.aggregate([_rec("PANE", "t-bread", "c-bakery"), _rec("PANE", "t-bread", "c-bakery")], [1, 2])
+    agg.aggregate([_rec("pane", "t-flour", "c-bakery")], [3])
+    stats = agg.stats()
+    assert stats["conflicts"] == 1
+    conflict = stats["recentConflicts"][0]
+    assert conflict["labelRaw"] == "pane"
+    assert [(l["finalTypeId"], l["count"]) for l in conflict["labels"]] == [("t-bread", 2.0), ("t-flour", 1.0)]
+
+    # Outside the window the earlier label no longer conflicts
+    import services.ml.aggregate as aggmod
+    now = aggmod.time.monotonic()
+    monkeypatch.setattr(aggmod.time, "monotonic", lambda: now + 120)
+    agg.aggregate([_rec("PANE", "t-bread", "c-bakery")], [4])
+    assert agg.stats()["conflicts"] == 1
+    # Replays are not tracked
+    agg.aggregate([_rec("PANE", "t-other")], [5], track=False)
+    assert agg.stats()["conflicts"] == 1
+
+
+def test_weighted_document_frequency_matches_repeats():
+    a, b = HashingFeaturizer(n_features=1024), HashingFeaturizer(n_features=1024)
+    a.partial_fit(["latte", "latte", "latte", "pane"])
+    b.partial_fit(["latte", "pane"], sample_weight=[3, 1])
+    assert a.n_docs == b.n_docs
+    np.testing.assert_allclose(a.df, b.df)
+
+
+def test_training_work_scales_with_unique_examples(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    client = TestClient(mlmod.app)
+    examples = [{"labelRaw": "LATTE PS 1L", "finalTypeId": "t-milk", "finalCategoryId": "c-dairy"}] * 50
+    examples += [{"labelRaw": "BANANE KG", "finalTypeId": "t-fruit", "finalCategoryId": "c-fresh"}] * 50
+    assert client.post("/train", json={"examples": examples}).status_code == 200
+    assert mlmod.manager.type_clf.updates == 2
+    assert client.post("/predict", json={"labelRaw": "LATTE PS 1L"}).json()["typeCandidates"][0]["id"] == "t-milk"
+
+    client.post("/feedback", json={"labelRaw": "latte ps 1l", "finalTypeId": "t-yogurt", "finalCategoryId": "c-dairy"})
+    stats = client.get("/feedback/stats").json()
+    assert stats["records"] == 101 and stats["examples"] == 3
+    assert stats["conflicts"] == 1 and stats["recentConflicts"][0]["labelRaw"] == "latte ps 1l"
+
+    # A restart replays the batch as it was trained
+    expected = mlmod.manager.predict("BANANE", None)
+    mlmod.manager.log.sync()
+    restarted = mlmod.ModelManager(str(tmp_path))
+    got = restarted.predict("BANANE", None)
+    assert [(c.id, round(c.conf, 5)) for c in got[0]] == [(c.id, round(c.conf, 5)) for c in expected[0]]
+    restarted.close()
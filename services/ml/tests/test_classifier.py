@@ -0,0 +1,102 @@
+import numpy as np
+
+import services.ml.main as mlmod
+from services.ml.classifier import OnlineLinearClassifier, top_k_indices
+from services.ml.features import HashingFeaturizer
+
+
+def _data(n_types: int):
+    rnd = np.random.default_rng(0)
+    words = ["".join(rnd.choice(list("ABCDEFGHILMNOPRSTUVZ"), 6)) for _ in range(n_types)]
+    return [(f"{w} {s}", f"t-{i}") for i, w in enumerate(words) for s in ("1L", "500G", "KG")]
+
+
+def test_classes_can_be_added_after_training_started():
+    f = HashingFeaturizer(n_features=2 ** 14)
+    for mode in ("pa", "sgd"):
+        clf = OnlineLinearClassifier(f.n_features, mode=mode, block_size=4)
+        rows = _data(40)
+        # Classes arrive one at a time, well past the initial capacity
+        for _ in range(3):
+            for text, label in rows:
+                clf.partial_fit(f.transform([text]), [label])
+        assert len(clf) == 40 and clf.capacity == 40 and len(clf.blocks) == 10
+        assert clf.index["t-7"] == clf.labels.index("t-7")
+        texts, labels = zip(*rows)
+        top = clf.top_k(f.transform(list(texts)), 3)
+        accuracy = np.mean([row[0][0] == label for row, label in zip(top, labels)])
+        assert accuracy > 0.9, (mode, accuracy)
+        assert all(row[0][1] >= row[-1][1] for row in top)
+
+
+def test_default_model_confidences_clear_the_knn_threshold():
+    # Scores are served as confidences (auto-accept, kNN fallback): with the service defaults a
+    # well separated catalog must be predicted confidently, not near-uniformly
+    f = HashingFeaturizer(n_features=2 ** 14)
+    clf = OnlineLinearClassifier(f.n_features, mode=mlmod.CLASSIFIER_MODE, C=mlmod.PA_C,
+                                 learning_rate=mlmod.SGD_LR, negatives=mlmod.SGD_NEGATIVES)
+    texts, labels = zip(*_data(100))
+    X = f.transform(list(texts))
+    for _ in range(2):
+        clf.partial_fit(X, labels)
+    top = clf.top_k(X, 1)
+    assert np.mean([row[0][0] == label for row, label in zip(top, labels)]) > 0.9
+    assert np.median([row[0][1] for row in top]) > mlmod.KNN_MIN_CONF
+    # The update moved the true class and the top-scoring negatives, not all 100 classes
+    assert clf.negatives < len(clf) - 1
+
+
+def test_single_class_and_roundtrip(tmp_path):
+    f = HashingFeaturizer(n_features=2 ** 10)
+    clf = OnlineLinearClassifier(f.n_features)
+    clf.partial_fit(f.transform(["LATTE"]), ["t-milk"])
+    assert clf.top_k(f.transform(["PANE"]), 3) == [[("t-milk", 1.0)]]
+
+    clf.partial_fit(f.transform(["PANE", "LATTE"]), ["t-bread", "t-milk"], sample_weight=[2.0, 1.0])
+    clf.save(tmp_path, "m")
+    loaded = OnlineLinearClassifier.load(tmp_path, "m")
+    X = f.transform(["PANE", "LATTE"])
+    assert loaded.labels == clf.labels
+    assert np.allclose(loaded.predict_proba(X), clf.predict_proba(X))
+    # Only the used columns are written, not the block capacity
+    assert np.load(tmp_path / "m.weights.npy").shape == (2 ** 10, 2)
+    loaded.add_label("t-new")
+    assert loaded.index["t-new"] == 2
+    loaded.partial_fit(f.transform(["UOVA", "PANE"]), ["t-new", "t-bread"])
+    assert loaded.top_k(f.transform(["UOVA"]), 1)[0][0][0] == "t-new"
+    assert np.load(tmp_path / "m.weights.npy").shape == (2 ** 10, 2)
+
+
+def test_top_k_indices_matches_full_sort():
+    proba = np.random.default_rng(1).random((5, 50))
+    idxs, top = top_k_indices(proba, 4)
+    assert (idxs == np.argsort(-proba, axis=1)[:, :4]).all()
+    assert np.allclose(top, -np.sort(-proba, axis=1)[:, :4])
+
+
+def test_copy_on_write_copies_touched_rows_only(tmp_path):
+    f = HashingFeaturizer(n_features=2 ** 14)
+    clf = OnlineLinearClassifier(f.n_features, block_size=8, overlay_rows=64)
+    rows = _data(20)
+    texts, labels = zip(*rows)
+    X = f.transform(list(texts))
+    clf.partial_fit(X, list(labels))
+    frozen = clf.freeze()
+    before = frozen.predict_proba(X)
+
+    x = f.transform(["LATTE PS 1L"])
+    clf.partial_fit(x, ["t-3"])
+    # Same dense bases as the published copy, only the rows of this label in the overlays
+    assert all(a.base is b.base for a, b in zip(clf.blocks, frozen.blocks))
+    assert {len(blk.keys) for blk in clf.blocks} <= {0, x.nnz}
+    assert np.array_equal(frozen.predict_proba(X), before)
+    assert not np.allclose(clf.predict_proba(x), frozen.predict_proba(x))
+
+    # A growing overlay is merged into a private dense block, which then trains in place
+    for _ in range(3):
+        clf.partial_fit(X[:12], list(labels[:12]))
+    merged = [i for i, blk in enumerate(clf.blocks) if blk.base is not frozen.blocks[i].base]
+    assert merged and all(not len(clf.blocks[i].keys) for i in merged)
+    assert np.array_equal(frozen.predict_proba(X), before)
+    clf.save(tmp_path, "m")
+    assert np.allclose(OnlineLinearClassifier.load(tmp_path, "m").predict_proba(X), clf.predict_proba(X))
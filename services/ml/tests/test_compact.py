@@ -0,0 +1,77 @@
+import json
+from importlib import reload
+
+import numpy as np
+
+from services.ml import compact
+from services.ml.classifier import OnlineLinearClassifier
+from services.ml.compact import COMPACT_FILE, CompactModel
+from services.ml.features import HashingFeaturizer
+from services.ml.inference import CompiledModel
+from services.ml.registry import ModelRegistry
+
+
+def _model():
+    rnd = np.random.default_rng(5)
+    alphabet = list("ABCDEFGILMNOPRSTUVZ ")
+    f = HashingFeaturizer(n_features=2 ** 14)
+    type_clf = OnlineLinearClassifier(f.n_features, block_size=8)
+    cat_clf = OnlineLinearClassifier(f.n_features, block_size=8)
+    rows = [("".join(rnd.choice(alphabet, 12)), rnd.choice(["Coop", None]), f"t-{i % 30}", f"c-{i % 6}")
+            for i in range(300)]
+    texts, brands = [r[0] for r in rows], [r[1] for r in rows]
+    X = f.partial_fit_transform(texts, brands)
+    type_clf.partial_fit(X, [r[2] for r in rows])
+    cat_clf.partial_fit(X, [r[3] for r in rows])
+    return f, type_clf, cat_clf, list(zip(texts, brands))
+
+
+def test_lossless_compaction_matches_dense_scorer(tmp_path):
+    f, type_clf, cat_clf, queries = _model()
+    dense = CompiledModel(f, type_clf, cat_clf)
+    small = CompactModel.build(f, type_clf, cat_clf, "float32", prune=0.0)
+    small.save(tmp_path)
+    loaded = CompactModel.load(tmp_path)
+    for text, brand in queries[:50] + [("", None), ("latte ps 1l", None)]:
+        expected = dense.predict(text, brand, 5)
+        for model in (small, loaded):
+            got = model.predict(text, brand, 5)
+            for e, g in zip(expected, got):
+                assert [label for label, _ in g] == [label for label, _ in e]
+                assert np.allclose([p for _, p in g], [p for _, p in e], atol=1e-5)
+    assert small.weights[0].nnz < f.n_features * len(type_clf)
+
+
+def test_int8_pruned_report():
+    f, type_clf, cat_clf, queries = _model()
+    small = CompactModel.build(f, type_clf, cat_clf, "int8", prune=0.05)
+    assert small.weights[0].data.dtype == np.int8
+    report = compact.report(f, type_clf, cat_clf, small, queries, k=3)
+    assert report["memoryBytes"]["compact"] < report["memoryBytes"]["dense"] / 5
+    assert report["diskBytes"]["compact"] < report["diskBytes"]["dense"] / 5
+    assert report["agreement"]["count"] == len(queries)
+    assert report["agreement"]["typeTop1"] >= 0.9 and report["agreement"]["categoryTop1"] >= 0.9
+
+
+def test_published_compact_version_serves_until_the_next_update(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    manager = mlmod.manager
+    for label, type_id, cat_id in [("LATTE PS 1L", "t-milk", "c-dairy"), ("BANANE KG", "t-fruit", "c-fresh")] * 3:
+        manager.feedback(label, None, type_id, cat_id).result()
+    base = manager.publish_version()
+    ModelRegistry(tmp_path / "registry").set_active(base)
+
+    assert compact.main(["--model-dir", str(tmp_path), "--dtype", "int8", "--publish"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    version = report["published"]
+    assert report["version"] == base and report["agreement"]["typeTop1"] == 1.0
+    assert COMPACT_FILE in manager.registry.manifest(version)["files"]
+
+    manager.activate(version).result(timeout=10)
+    assert isinstance(manager.snapshot.compiled, CompactModel)
+    assert manager.predict("LATTE PS 1L", None)[0][0].id == "t-milk"
+    manager.feedback("PANE", None, "t-bread", "c-bakery").result()
+    assert not isinstance(manager.snapshot.compiled, CompactModel)
+    manager.close()
@@ -0,0 +1,71 @@
+import json
+from importlib import reload
+
+import joblib
+from fastapi.testclient import TestClient
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services.ml.features import HashingFeaturizer
+
+
+def test_hashing_featurizer_covers_unseen_labels(tmp_path):
+    f = HashingFeaturizer(n_features=2 ** 12)
+    f.partial_fit_transform(["LATTE PS 1L"], [None])
+    X = f.transform(["BANANE KG", "LATTE 1L"], ["Chiquita", None])
+    # A vocabulary-based vectorizer fitted on the first label would leave BANANE empty
+    assert X.shape == (2, 2 ** 12)
+    assert all(X[i].nnz > 0 for i in range(2))
+    assert abs(X[0].multiply(X[0]).sum() - 1.0) < 1e-9
+
+    f.save(tmp_path / "features.npz")
+    g = HashingFeaturizer.load(tmp_path / "features.npz")
+    assert g.n_docs == 1 and (g.transform(["LATTE"]) != f.transform(["LATTE"])).nnz == 0
+
+
+def test_legacy_tfidf_artifacts_are_migrated_from_feedback(tmp_path, monkeypatch):
+    joblib.dump(TfidfVectorizer(analyzer="char", ngram_range=(3, 5)).fit(["LATTE 1L"]), tmp_path / "vectorizer.joblib")
+    (tmp_path / "type_labels.json").write_text(json.dumps(["t-milk"]))
+    records = [
+        {"labelRaw": "LATTE PS 1L", "finalTypeId": "t-milk", "finalCategoryId": "c-dairy"},
+        {"labelRaw": "BANANE KG", "finalTypeId": "t-fruit", "finalCategoryId": "c-fresh"},
+    ] * 3
+    (tmp_path / "feedback.jsonl").write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    mlmod.manager.wait_ready()
+
+    assert (tmp_path / "legacy" / "vectorizer.joblib").exists()
+    assert mlmod.manager.replayed == len(records)
+    r = TestClient(mlmod.app).post("/predict", json={"labelRaw": "BANANE"})
+    assert r.json()["typeCandidates"][0]["id"] == "t-fruit"
+
+
+def test_legacy_tfidf_model_serves_until_new_models_have_trained(tmp_path, monkeypatch):
+    from sklearn.linear_model import SGDClassifier
+
+    texts, types = ["LATTE PS 1L", "LATTE INTERO 1L", "BANANE KG", "BANANE BIO"], [0, 0, 1, 1]
+    vectorizer = TfidfVectorizer(analyzer="char", ngram_range=(3, 5)).fit(texts)
+    clf = SGDClassifier(loss="log_loss", random_state=0).fit(vectorizer.transform(texts), types)
+    joblib.dump(vectorizer, tmp_path / "vectorizer.joblib")
+    joblib.dump(clf, tmp_path / "type_clf.joblib")
+    (tmp_path / "type_labels.json").write_text(json.dumps(["t-milk", "t-fruit"]))
+
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    monkeypatch.setattr(mlmod, "LEGACY_UNTIL_UPDATES", 2)
+    manager = mlmod.manager
+    manager.wait_ready()
+    # No feedback log to rebuild from: the old model answers instead of an empty one
+    assert manager.startup["legacy"] and manager.replayed == 0
+    assert manager.predict("BANANE", None)[0][0].id == "t-fruit"
+
+    manager.feedback("PANE INTEGRALE", None, "t-bread", "c-bakery").result(timeout=5)
+    manager.feedback("TONNO RIO MARE", None, "t-fish", "c-pantry").result(timeout=5)
+    assert manager.predict("BANANE", None)[0][0].id == "t-fruit"
+    manager.feedback("PANE BIANCO", None, "t-bread", "c-bakery").result(timeout=5)
+    assert manager.predict("BANANE", None)[0][0].id in ("t-bread", "t-fish")
+    assert manager.legacy is None
+    manager.close()
@@ -1,3 +1,6 @@
+import threading
+from importlib import reload
+
 from fastapi.testclient import TestClient
 from services.ml.main import app
 
@@ -5,3 +8,32 @@ def test_health():
     client = TestClient(app)
     r = client.get("/health")
     assert r.status_code == 200
+
+
+def test_ready_flips_after_background_load(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    mlmod.manager.wait_ready()
+    mlmod.manager.feedback("LATTE PS 1L", None, "t-milk", "c-dairy").result()
+    mlmod.manager.close()
+
+    release = threading.Event()
+    manager = mlmod.ModelManager(str(tmp_path), start=False)
+    load = manager._load
+    monkeypatch.setattr(manager, "_load", lambda: (release.wait(10), load()))
+    monkeypatch.setattr(mlmod, "manager", manager)
+    client = TestClient(mlmod.app)
+
+    assert client.get("/ready").status_code == 503
+    assert client.get("/ready").json()["status"] == "loading"
+    assert client.get("/health").json() == {"status": "ok"}
+    release.set()
+    manager.wait_ready(timeout=10)
+    r = client.get("/ready")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "ready" and body["walSeq"] == 1 and body["replayed"] == 0
+    assert "warmupSeconds" in body and body["trainerQueue"] == 0
+    assert client.post("/predict", json={"labelRaw": "LATTE PS 1L"}).json()["typeCandidates"][0]["id"] == "t-milk"
+    manager.close()
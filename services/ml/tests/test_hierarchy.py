@@ -0,0 +1,65 @@
+from importlib import reload
+
+import numpy as np
+
+from services.ml.hierarchy import CategoryTypeMap
+
+
+def test_category_type_map():
+    h = CategoryTypeMap()
+    h.add(None, 5)
+    h.add("c-dairy", 0)
+    h.add("c-dairy", 1)
+    h.add("c-fresh", 2)
+    frozen = h.freeze()
+    h.add("c-fresh", 5)  # an orphan that later gets a category
+    h.add("c-fresh", 3)
+    assert frozen.candidates(["c-dairy"]).tolist() == [0, 1, 5]
+    assert frozen.candidates(["c-fresh"]).tolist() == [2, 5]
+    assert h.candidates(["c-dairy"]).tolist() == [0, 1]
+    assert h.candidates(["c-fresh", "c-dairy"]).tolist() == [0, 1, 2, 3, 5]
+    assert h.candidates(["unknown"]).tolist() == []
+
+
+def test_hierarchical_predict_scores_only_types_of_top_categories(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    monkeypatch.setenv("ML_HIERARCHICAL", "true")
+    monkeypatch.setenv("ML_HIER_TOP_CATEGORIES", "1")
+    monkeypatch.setenv("ML_KNN_MODE", "off")
+    import services.ml.main as mlmod
+    reload(mlmod)
+    m = mlmod.manager
+
+    catalog = {
+        "dairy": ["latte intero", "yogurt bianco", "burro", "mozzarella"],
+        "fresh": ["banane", "mele golden", "insalata", "pomodori"],
+        "bakery": ["pane integrale", "cornetti", "grissini", "focaccia"],
+    }
+    examples = [{"labelRaw": name, "finalTypeId": f"t-{name}", "finalCategoryId": f"c-{cat}"}
+                for cat, names in catalog.items() for name in names]
+    for _ in range(3):
+        m.submit(examples).result(timeout=10)
+
+    snap = m.snapshot
+    t, c = m.predict("YOGURT BIANCO", None)
+    assert c[0].id == "c-dairy"
+    assert t[0].id == "t-yogurt bianco"
+    dairy = {f"t-{name}" for name in catalog["dairy"]}
+    assert {x.id for x in t} <= dairy
+
+    # The sparse path (large batches) gives the same candidates as the compiled one
+    items = [(name, None) for names in catalog.values() for name in names]
+    compiled = m._score(snap, items)
+    monkeypatch.setattr(mlmod, "COMPILED_MAX_BATCH", 0)
+    sparse = m._score(snap, items)
+    for (ct, cc), (st, sc) in zip(compiled, sparse):
+        assert [x.id for x in ct] == [x.id for x in st]
+        assert [x.id for x in cc] == [x.id for x in sc]
+        np.testing.assert_allclose([x.conf for x in ct], [x.conf for x in st], rtol=1e-4, atol=1e-5)
+
+    # The map is persisted with the model
+    m.checkpoint()
+    m.close()
+    reload(mlmod)
+    assert mlmod.manager.snapshot.hierarchy.candidates(["c-fresh"]).tolist() == snap.hierarchy.candidates(["c-fresh"]).tolist()
+    mlmod.manager.close()
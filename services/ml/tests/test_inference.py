@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.ml.classifier import OnlineLinearClassifier
+from services.ml.features import HashingFeaturizer
+from services.ml.inference import CompiledModel, NgramTable, hash_index
+
+
+def test_compiled_scorer_matches_sparse_path():
+    rnd = np.random.default_rng(3)
+    alphabet = list("ABCDEFGILMNOPRSTUVZ ")
+    f = HashingFeaturizer(n_features=2 ** 14)
+    type_clf = OnlineLinearClassifier(f.n_features, block_size=8)
+    cat_clf = OnlineLinearClassifier(f.n_features, block_size=8)
+    rows = [("".join(rnd.choice(alphabet, 12)), rnd.choice(["Coop", None, "Mulino Bianco"]), f"t-{i % 30}", f"c-{i % 6}")
+            for i in range(300)]
+    texts = [t for t, _, _, _ in rows]
+    brands = [b for _, b, _, _ in rows]
+    f.partial_fit(texts, brands)
+    X = f.transform(texts, brands)
+    type_clf.partial_fit(X, [t for _, _, t, _ in rows])
+    cat_clf.partial_fit(X, [c for _, _, _, c in rows])
+
+    compiled = CompiledModel(f, type_clf, cat_clf)
+    queries = texts[:50] + ["latte  PS 1L", "", "ZZ"]
+    qbrands = brands[:50] + [None, None, "Coop"]
+    Xq = f.transform(queries, qbrands)
+    expected_t = type_clf.top_k(Xq, 5)
+    expected_c = cat_clf.top_k(Xq, 5)
+    for i, (text, brand) in enumerate(zip(queries, qbrands)):
+        cols, vals = compiled.featurize(text, brand)
+        row = Xq[i]
+        assert sorted(cols.tolist()) == sorted(row.indices.tolist())
+        got_t, got_c = compiled.predict(text, brand, 5)
+        assert [label for label, _ in got_t] == [label for label, _ in expected_t[i]]
+        assert [label for label, _ in got_c] == [label for label, _ in expected_c[i]]
+        assert np.allclose([p for _, p in got_t], [p for _, p in expected_t[i]], atol=1e-5)
+
+
+def test_ngram_table_evicts_oldest_entries_under_concurrent_lookups():
+    table = NgramTable(2 ** 12, max_size=64)
+    grams = [f"g{i:03d}" for i in range(500)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        cols = list(pool.map(table.col, grams * 4))
+    assert cols == [hash_index(g, 2 ** 12) for g in grams] * 4
+    # Full table: one new gram drops only the oldest entry, the rest stays cached
+    before = list(table._cols)
+    table.col("new-gram")
+    assert len(table) == 64 and list(table._cols) == before[1:] + ["new-gram"]
@@ -0,0 +1,96 @@
+import random
+from importlib import reload
+
+from fastapi.testclient import TestClient
+
+from services.ml.knn import NeighborIndex, NgramEncoder
+
+
+def _noisy(rng, text):
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice("0O5SIl ") + text[i + 1:]
+
+
+def test_votes_from_nearest_labels():
+    index = NeighborIndex(NgramEncoder(256))
+    for text, type_id, cat_id in [("latte ps 1l", "t-milk", "c-dairy"), ("latte intero 1l", "t-milk", "c-dairy"),
+                                  ("banane kg", "t-fruit", "c-fresh"), ("mele golden", "t-fruit", "c-fresh")]:
+        index.insert(text, type_id, cat_id, seq=1)
+    index.insert("latte ps 1l", "t-milk", "c-dairy", seq=2)
+    assert len(index) == 4 and index.seq == 2
+
+    types, cats = index.vote("latte p5 1l", k=3, min_sim=0.3)
+    assert types[0][0] == "t-milk" and cats[0][0] == "c-dairy"
+    assert abs(sum(conf for _, conf in types) - 1.0) < 1e-6
+    assert index.vote("zzzz qqqq", min_sim=0.9) == ([], [])
+
+
+def test_capacity_evicts_least_recent_and_lsh_recall(tmp_path):
+    rng = random.Random(0)
+    words = ["latte", "pane", "pasta", "riso", "mele", "banane", "yogurt", "burro", "olio", "acqua", "birra", "vino"]
+    labels = [f"{a} {b} {n}" for a in words for b in words for n in ("1l", "500g", "kg")]
+    index = NeighborIndex(NgramEncoder(256), capacity=300, exact_below=0)
+    for i, label in enumerate(labels):
+        index.insert(label, f"t-{label.split()[0]}", None, seq=i + 1)
+    assert len(index) == 300
+    assert labels[0] not in index._rows and labels[-1] in index._rows
+
+    kept = labels[-300:]
+    found = 0
+    for label in kept[:100]:
+        hits = index.search(_noisy(rng, label), k=5)
+        found += bool(hits) and hits[0][0].split()[0] == label.split()[0]
+    assert found >= 80
+
+    index.save(tmp_path)
+    restored = NeighborIndex(NgramEncoder(256), capacity=300)
+    assert restored.load(tmp_path)
+    assert len(restored) == 300 and restored.seq == index.seq
+    assert restored.search(kept[10], k=1)[0][0] == kept[10]
+
+
+def test_predict_falls_back_to_neighbours(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    client = TestClient(mlmod.app)
+
+    # One class only: the classifier cannot discriminate, neighbour votes decide
+    client.post("/feedback", json={"labelRaw": "LATTE PS 1L", "finalTypeId": "t-milk", "finalCategoryId": "c-dairy"})
+    r = client.post("/predict", json={"labelRaw": "LATTE P5 1L"}).json()
+    assert r["typeCandidates"][0]["id"] == "t-milk"
+    assert r["categoryCandidates"][0]["id"] == "c-dairy"
+    r = client.post("/predict", json={"labelRaw": "DETERSIVO PIATTI"}).json()
+    assert r["typeCandidates"][0]["id"] == "t-milk"  # no close neighbour: classifier answer kept
+
+    client.post("/feedback", json={"labelRaw": "BANANE KG", "finalTypeId": "t-fruit", "finalCategoryId": "c-fresh"})
+    assert len(mlmod.manager.knn) == 2
+    mlmod.manager.checkpoint()
+
+    # Restart from the checkpoint: the index is restored and the log tail is not counted twice
+    client.post("/feedback", json={"labelRaw": "BANANE KG", "finalTypeId": "t-fruit", "finalCategoryId": "c-fresh"})
+    mlmod.manager.close()
+    reload(mlmod)
+    row = mlmod.manager.knn._rows["banane kg"]
+    assert mlmod.manager.knn.types[row] == {"t-fruit": 2.0}
+    mlmod.manager.close()
+
+
+def test_confident_classifier_skips_neighbour_search(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    manager = mlmod.manager
+    manager.feedback("LATTE PS 1L", None, "t-milk", "c-dairy").result(timeout=5)
+    manager.feedback("BANANE KG", None, "t-fruit", "c-fresh").result(timeout=5)
+    calls = []
+    vote = manager.knn.vote
+    monkeypatch.setattr(manager.knn, "vote", lambda *a, **kw: calls.append(a) or vote(*a, **kw))
+
+    monkeypatch.setattr(mlmod, "KNN_MIN_CONF", 0.0)
+    manager.predict("LATTE PS 1L", None)
+    assert calls == []
+    monkeypatch.setattr(mlmod, "KNN_MIN_CONF", 1.1)
+    manager.predict("BANANE KG", None)
+    assert len(calls) == 1
+    manager.close()
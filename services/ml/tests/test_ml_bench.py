@@ -0,0 +1,40 @@
+import random
+
+from services.ml.bench import SynthConfig, build_catalog, compare_results, generate_records, ocr_noise, run_benchmark, save_results
+
+
+def test_synthetic_corpus_is_deterministic_zipfian_and_noisy():
+    cfg = SynthConfig(types=300, noise=0.05)
+    catalog = build_catalog(cfg, seed=1)
+    assert len({p.type_id for p in catalog}) == 300 and len(catalog) == 900
+    records = generate_records(2000, cfg, seed=1, catalog=catalog)
+    assert records == generate_records(2000, cfg, seed=1, catalog=catalog)
+    # Popularity is skewed: the most sold product alone outnumbers the tail half of the catalog
+    counts = {}
+    for r in records:
+        counts[r["finalTypeId"]] = counts.get(r["finalTypeId"], 0) + 1
+    assert max(counts.values()) > 50 and len(counts) < 300
+    assert {"labelRaw", "brand", "finalTypeId", "finalCategoryId"} == set(records[0])
+
+    rnd = random.Random(0)
+    noisy = [ocr_noise("LATTE PS SENZA LATTOSIO 1L", rnd, 0.3, max_chars=20) for _ in range(20)]
+    assert all(len(n) <= 20 for n in noisy) and len(set(noisy)) > 1
+
+
+def test_run_benchmark_reports_latency_throughput_size_and_memory(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path / "service"))
+    report = run_benchmark(sizes=(20, 60), records_per_type=3, feedback=10, queries=40, batch=8, http=5)
+    assert [s["types"] for s in report["sizes"]] == [20, 60]
+    for size in report["sizes"]:
+        assert size["classes"]["types"] == size["types"]
+        for section in ("predict", "predictCached", "feedback", "httpPredict", "httpFeedback"):
+            assert size[section]["count"] and size[section]["p50"] <= size[section]["p99"]
+        assert size["updatesPerSecond"]["sequential"] > 0 and size["updatesPerSecond"]["queued"] > 0
+        assert size["bulk"]["examplesPerSecond"] > 0 and size["save"]["checkpointBytes"] > 0
+        assert 0 <= size["top1Accuracy"] <= 1
+    assert report["peakRssMb"] is None or report["peakRssMb"] > 0
+
+    path = save_results(report, str(tmp_path / "results"))
+    assert path.name.startswith("ml-") and path.exists()
+    deltas = compare_results(report, report)
+    assert deltas and all(d["deltaPct"] == 0 for d in deltas)
@@ -0,0 +1,63 @@
+import numpy as np
+
+import services.ml.main as mlmod
+from services.ml.checkpoint import latest_checkpoint
+from services.ml.classifier import OnlineLinearClassifier
+from services.ml.features import HashingFeaturizer
+from services.ml.registry import sha256_file
+from services.ml.wal import FeedbackLog
+
+
+def test_loaded_weights_are_shared_read_only_maps(tmp_path):
+    f = HashingFeaturizer(n_features=2 ** 12)
+    # pa moves two classes per update, so the blocks it leaves untouched are easy to name
+    clf = OnlineLinearClassifier(f.n_features, mode="pa", block_size=4)
+    texts = [f"PRODOTTO {i}" for i in range(12)]
+    clf.partial_fit(f.transform(texts), [f"t-{i}" for i in range(12)])
+    clf.save(tmp_path, "type_model")
+    digest = sha256_file(tmp_path / "type_model.weights.npy")
+
+    # Two "workers" loading the same checkpoint map the same file instead of copying it
+    a = OnlineLinearClassifier.load(tmp_path, "type_model")
+    b = OnlineLinearClassifier.load(tmp_path, "type_model")
+    for loaded in (a, b):
+        assert all(isinstance(blk.base, np.memmap) for blk in loaded.blocks)
+        assert not loaded.blocks[0].base.flags.writeable
+    X = f.transform(texts)
+    assert np.allclose(a.predict_proba(X), clf.predict_proba(X))
+
+    # Training copies only the touched rows into overlays; the mapped file never changes
+    a.partial_fit(f.transform(["PRODOTTO 1"]), ["t-5"])
+    touched = [blk for blk in a.blocks if len(blk.keys)]
+    assert 0 < len(touched) <= 2 and all(isinstance(blk.base, np.memmap) for blk in a.blocks)
+    assert all(len(blk.keys) <= f.transform(["PRODOTTO 1"]).nnz for blk in touched)
+    assert sha256_file(tmp_path / "type_model.weights.npy") == digest
+    assert np.allclose(b.predict_proba(X), clf.predict_proba(X))
+
+
+def test_log_sequence_stays_unique_across_writers(tmp_path):
+    one = FeedbackLog(tmp_path / "feedback.jsonl")
+    two = FeedbackLog(tmp_path / "feedback.jsonl")
+    seqs = [one.append({"n": 1}), two.append({"n": 2}), one.append({"n": 3}), two.append({"n": 4})]
+    one.close()
+    two.close()
+    assert seqs == [1, 2, 3, 4]
+    assert [r["n"] for r in FeedbackLog(tmp_path / "feedback.jsonl").read()] == [1, 2, 3, 4]
+
+
+def test_workers_apply_each_others_feedback_before_their_own(tmp_path):
+    one = mlmod.ModelManager(str(tmp_path))
+    two = mlmod.ModelManager(str(tmp_path))
+    one.feedback("LATTE INTERO 1L", None, "t-latte", "c-1").result(timeout=5)
+    two.feedback("PANE INTEGRALE", None, "t-pane", "c-2").result(timeout=5)
+    one.feedback("BIRRA 33CL", None, "t-birra", "c-3").result(timeout=5)
+    # Worker one's walSeq 3 covers worker two's record 2 too, so a checkpoint at 3 loses nothing
+    assert one.snapshot.wal_seq == 3 and set(one.type_labels) == {"t-latte", "t-pane", "t-birra"}
+    one.checkpoint()
+    two.checkpoint()  # still at walSeq 2: the pointer does not move back
+    assert latest_checkpoint(tmp_path)[1] == 3
+    one.close()
+    two.close()
+    restarted = mlmod.ModelManager(str(tmp_path))
+    assert set(restarted.type_labels) == {"t-latte", "t-pane", "t-birra"}
+    restarted.close()
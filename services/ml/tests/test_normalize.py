@@ -0,0 +1,74 @@
+from importlib import reload
+
+import services.ml.aggregate as aggregate
+import services.ml.compact as compact
+from services.ml.aggregate import FeedbackAggregator
+from shared.normalize import NORMALIZE_CACHE_SIZE, normalize_label
+
+
+def test_ocr_and_spelling_variants_share_one_form():
+    variants = ["LATTE P.S. 1 L", "Latte PS 1l", "LATTE PS 1L", "latte  ps 1 LT", "LATTE PS 1 LITRO"]
+    assert {normalize_label(v) for v in variants} == {"latte ps 1l"}
+    cases = {
+        "5OOG PASTA": "500g pasta",
+        "C0OP BISCOTTI": "coop biscotti",
+        "ACQUA 6 X 1,5 L": "acqua 6x1.5l",
+        "CAFFÈ MACINATO 250 GR": "caffe macinato 250g",
+        "TONNO ALL'OLIO 3X80G": "tonno all olio 3x80g",
+        "YOGURT BIANCO X 2": "yogurt bianco x2",
+        "B50 SPA": "b50 spa",
+        "BISC0TTI FROLLINI": "biscotti frollini",
+        "BIRRA 5 % VOL": "birra 5% vol",
+        "": "",
+    }
+    for text, expected in cases.items():
+        assert normalize_label(text) == expected
+        assert normalize_label(expected) == expected
+
+
+def test_one_normalize_module_and_cache():
+    import services.ml.main as mlmod
+    import services.ocr.main as ocrmod
+    # Every service module goes through shared.*: a second import path would load a second cache
+    assert aggregate.normalize_label is compact.normalize_label is mlmod.normalize_label is normalize_label
+    assert ocrmod.normalize_label is normalize_label
+
+
+def test_memo_cache_is_bounded():
+    normalize_label.cache_clear()
+    for _ in range(3):
+        normalize_label("PANE INTEGRALE 500 G")
+    info = normalize_label.cache_info()
+    assert info.maxsize == NORMALIZE_CACHE_SIZE and info.hits == 2 and info.currsize == 1
+
+
+def test_variants_train_and_cache_as_one_label(tmp_path, monkeypatch):
+    records = [{"labelRaw": label, "brand": "GRANAROLO", "finalTypeId": "t-milk", "finalCategoryId": "c-dairy"}
+               for label in ("LATTE P.S. 1 L", "LATTE PS 1L", "LATTE PS 1 LT")]
+    examples = FeedbackAggregator().aggregate(records, [1, 2, 3], track=False)
+    assert [(e.labelRaw, e.brand, e.weight) for e in examples] == [("latte ps 1l", "granarolo", 3.0)]
+
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    manager = mlmod.manager
+    manager.submit(records + [{**records[0], "labelRaw": "BANANE KG", "finalTypeId": "t-fruit"}]).result()
+    results = manager.predict_batch([(r["labelRaw"], r["brand"]) for r in records])
+    assert results[0] == results[1] == results[2]
+    assert [manager.predict(r["labelRaw"], r["brand"]) for r in records] == results
+    stats = manager.cache.stats()
+    assert stats["size"] == 1 and stats["hits"] == 3
+    manager.close()
+
+
+def test_short_codes_and_percentages_are_kept():
+    cases = {
+        "VITAMINA B5": "vitamina b5",
+        "QUADERNO A5": "quaderno a5",
+        "FILTRI E5": "filtri e5",
+        "BIRRA 5%": "birra 5%",
+        "LATTE P5 1L": "latte p5 1l",
+    }
+    for text, expected in cases.items():
+        assert normalize_label(text) == expected
+        assert normalize_label(expected) == expected
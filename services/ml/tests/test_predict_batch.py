@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+from importlib import reload
+
+
+def test_predict_batch_matches_single_predictions(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    client = TestClient(mlmod.app)
+
+    examples = [
+        ("LATTE PS 1L", "t-milk", "c-dairy"),
+        ("YOGURT BIANCO", "t-milk", "c-dairy"),
+        ("BANANE KG", "t-fruit", "c-fresh"),
+        ("MELE GOLDEN", "t-fruit", "c-fresh"),
+    ]
+    for label, type_id, cat_id in examples * 3:
+        r = client.post("/feedback", json={"labelRaw": label, "finalTypeId": type_id, "finalCategoryId": cat_id})
+        assert r.status_code == 200
+
+    labels = ["LATTE 1L", "BANANE", "YOGURT"]
+    r = client.post("/predict/batch", json={"items": [{"labelRaw": l} for l in labels]})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert len(results) == len(labels)
+    for label, batch in zip(labels, results):
+        single = client.post("/predict", json={"labelRaw": label}).json()
+        assert [c["id"] for c in batch["typeCandidates"]] == [c["id"] for c in single["typeCandidates"]]
+        assert [c["id"] for c in batch["categoryCandidates"]] == [c["id"] for c in single["categoryCandidates"]]
+        confs = [c["conf"] for c in batch["typeCandidates"]]
+        assert confs == sorted(confs, reverse=True)
+
+
+def test_predict_batch_empty_model(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    client = TestClient(mlmod.app)
+    r = client.post("/predict/batch", json={"items": [{"labelRaw": "milk"}, {"labelRaw": "pane", "brand": "X"}]})
+    assert r.status_code == 200
+    assert r.json() == {"results": [{"typeCandidates": [], "categoryCandidates": []}] * 2}
@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+from importlib import reload
+
+
+def _client(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    return mlmod, TestClient(mlmod.app)
+
+
+def test_cache_hits_on_normalized_label(tmp_path, monkeypatch):
+    mlmod, client = _client(tmp_path, monkeypatch)
+    for label, type_id, cat_id in [("LATTE PS 1L", "t-milk", "c-dairy"), ("BANANE KG", "t-fruit", "c-fresh")] * 2:
+        client.post("/feedback", json={"labelRaw": label, "finalTypeId": type_id, "finalCategoryId": cat_id})
+
+    first = client.post("/predict", json={"labelRaw": "Latte  1L", "brand": "Granarolo"}).json()
+    second = client.post("/predict", json={"labelRaw": " LATTE 1l ", "brand": "GRANAROLO"}).json()
+    assert first == second
+    stats = client.get("/cache").json()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hitRate"] == 0.5
+    assert stats["size"] == 1
+
+
+def test_cache_invalidated_by_new_snapshot(tmp_path, monkeypatch):
+    mlmod, client = _client(tmp_path, monkeypatch)
+    for label, type_id, cat_id in [("LATTE PS 1L", "t-milk", "c-dairy"), ("BANANE KG", "t-fruit", "c-fresh")]:
+        client.post("/feedback", json={"labelRaw": label, "finalTypeId": type_id, "finalCategoryId": cat_id})
+    client.post("/predict", json={"labelRaw": "PANE INTEGRALE"})
+
+    for _ in range(5):
+        client.post("/feedback", json={"labelRaw": "PANE INTEGRALE", "finalTypeId": "t-bread", "finalCategoryId": "c-bakery"})
+    r = client.post("/predict", json={"labelRaw": "PANE INTEGRALE"}).json()
+    assert r["typeCandidates"][0]["id"] == "t-bread"
+    stats = client.get("/cache").json()
+    assert stats["hits"] == 0
+    assert stats["invalidations"] >= 1
+    assert stats["modelVersion"] == mlmod.manager.snapshot.version
+
+
+def test_cache_lru_eviction_and_disable(tmp_path, monkeypatch):
+    mlmod, _ = _client(tmp_path, monkeypatch)
+    cache = mlmod.PredictionCache(2)
+    cache.put_many([("a", None), ("b", None)], [(1,), (2,)], version=1)
+    assert cache.get_many([("a", None)], 1) == [(1,)]
+    cache.put_many([("c", None)], [(3,)], version=1)
+    assert cache.get_many([("b", None), ("a", None)], 1) == [None, (1,)]
+    assert cache.stats()["evictions"] == 1
+    # Readers on an older snapshot neither hit nor fill the cache
+    cache.put_many([("d", None)], [(4,)], version=0)
+    assert cache.get_many([("d", None)], 0) == [None]
+
+    off = mlmod.PredictionCache(0)
+    off.put_many([("a", None)], [(1,)], version=1)
+    assert off.get_many([("a", None)], 1) == [None]
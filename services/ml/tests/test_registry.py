@@ -0,0 +1,64 @@
+from importlib import reload
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.ml.registry import ModelRegistry, RegistryError
+
+
+def _train(client, examples):
+    r = client.post("/train", json={"examples": [
+        {"labelRaw": label, "finalTypeId": type_id, "finalCategoryId": cat_id} for label, type_id, cat_id in examples
+    ]})
+    assert r.status_code == 200
+
+
+def test_publish_activate_and_rollback(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    client = TestClient(mlmod.app)
+
+    _train(client, [("LATTE PS 1L", "t-milk", "c-dairy"), ("BANANE KG", "t-fruit", "c-fresh")] * 3)
+    v1 = client.post("/models/publish").json()["version"]
+    assert client.post(f"/models/{v1}/activate?wait=true").json() == {"status": "active", "version": v1}
+
+    # Later feedback teaches a new class; publish that as v2 and switch
+    _train(client, [("PANE CASERECCIO", "t-bread", "c-bakery")] * 3)
+    v2 = client.post("/models/publish").json()["version"]
+    r = client.post(f"/models/{v2}/activate")
+    assert r.status_code == 202
+    mlmod.manager._loader.submit(lambda: None).result(timeout=10)
+    listing = client.get("/models").json()
+    assert listing["active"] == v2 and listing["previous"] == v1
+    assert listing["serving"]["modelVersion"] == v2
+    assert [m["version"] for m in listing["versions"]] == [v1, v2]
+    assert {"features.npz", "type_model.weights.npy", "type_model.json", "cat_model.bias.npy"} <= set(listing["versions"][0]["files"])
+
+    # Rolling back re-applies the feedback logged after v1, so nothing learned online is lost
+    assert client.post("/models/rollback?wait=true").json() == {"status": "active", "version": v1}
+    assert client.get("/models").json()["active"] == v1
+    assert mlmod.manager.snapshot.model_version == v1
+    top = client.post("/predict", json={"labelRaw": "PANE"}).json()["typeCandidates"]
+    assert "t-bread" in [c["id"] for c in top]
+
+    assert client.post("/models/v9999/activate").status_code == 404
+    assert client.post("/models/rollback").status_code == 404
+
+    # The active version survives a restart through the checkpoint written on activation
+    mlmod.manager.close()
+    reload(mlmod)
+    assert mlmod.manager.snapshot.model_version == v1
+
+
+def test_corrupted_version_is_rejected(tmp_path):
+    registry = ModelRegistry(tmp_path)
+
+    def save(path):
+        (path / "features.npz").write_bytes(b"abc")
+
+    version = registry.publish(save, source="test", wal_seq=0)
+    registry.verify(version)
+    (tmp_path / version / "features.npz").write_bytes(b"abd")
+    with pytest.raises(RegistryError):
+        registry.verify(version)
@@ -0,0 +1,62 @@
+import json
+from importlib import reload
+
+from services.ml import retrain
+from services.ml.registry import ModelRegistry
+
+CATALOG = [("LATTE PS 1L", "t-milk", "c-dairy"), ("LATTE INTERO", "t-milk", "c-dairy"),
+           ("YOGURT BIANCO", "t-yogurt", "c-dairy"), ("BANANE KG", "t-fruit", "c-fresh"),
+           ("MELE GOLDEN", "t-fruit", "c-fresh"), ("PANE INTEGRALE", "t-bread", None)]
+
+
+def _write_log(path, n, variants=10):
+    # n records over len(CATALOG) * variants distinct labels, so every label repeats
+    with open(path / "feedback.jsonl", "w", encoding="utf-8") as fh:
+        for seq in range(1, n + 1):
+            label, type_id, cat_id = CATALOG[seq % len(CATALOG)]
+            label = f"{label} {seq // len(CATALOG) % variants}"
+            fh.write(json.dumps({"labelRaw": label, "brand": None, "finalTypeId": type_id,
+                                 "finalCategoryId": cat_id, "seq": seq}) + "\n")
+
+
+def test_retrain_publishes_an_inactive_candidate(tmp_path, capsys):
+    _write_log(tmp_path, 120)
+    assert retrain.main(["--model-dir", str(tmp_path), "--jobs", "2", "--C", "0.5,2", "--epochs", "1,2",
+                         "--n-features", "4096", "--block-size", "8"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert len(report["search"]) == 4
+    # 120 records coalesce into 60 weighted examples before the split
+    assert report["records"] == 120 and report["examples"] == 60
+    assert report["holdout"] == 12 and report["train"] == 48
+    assert report["heldOut"]["type"]["accuracy"] == 1.0
+    assert {"precision", "recall", "f1", "top3Accuracy", "predictMsPerLabel"} <= report["heldOut"]["type"].keys()
+
+    registry = ModelRegistry(tmp_path / "registry")
+    version = report["version"]
+    assert registry.versions() == [version] and registry.active() is None
+    manifest = registry.verify(version)
+    assert manifest["source"] == "retrain" and manifest["walSeq"] == 120
+    assert manifest["metrics"]["heldOut"]["category"]["count"] > 0
+
+
+def test_retrained_version_activates_in_the_service(tmp_path, monkeypatch):
+    _write_log(tmp_path, 60)
+    version = retrain.retrain(tmp_path, C_grid=[1.0], epochs_grid=[2], n_jobs=1, n_features=4096, block_size=8)["version"]
+
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    mlmod.manager.activate(version).result(timeout=10)
+    t, c = mlmod.manager.predict("YOGURT BIANCO 3", None)
+    assert t[0].id == "t-yogurt" and c[0].id == "c-dairy"
+    assert mlmod.manager.snapshot.model_version == version
+    mlmod.manager.close()
+
+
+def test_retrain_dry_run_and_too_little_data(tmp_path):
+    _write_log(tmp_path, 30)
+    report = retrain.retrain(tmp_path, C_grid=[1.0], epochs_grid=[1], n_jobs=1, n_features=4096, publish=False)
+    assert report["version"] is None
+    assert not (tmp_path / "registry").exists() or ModelRegistry(tmp_path / "registry").versions() == []
+    (tmp_path / "feedback.jsonl").write_text(json.dumps({"labelRaw": "x", "finalTypeId": "t", "seq": 1}) + "\n")
+    assert retrain.main(["--model-dir", str(tmp_path)]) == 1
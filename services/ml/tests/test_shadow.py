@@ -0,0 +1,60 @@
+from fastapi.testclient import TestClient
+from importlib import reload
+
+from services.ml.shadow import ShadowEvaluator
+
+
+def _client(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    return mlmod, TestClient(mlmod.app)
+
+
+def test_shadow_scores_sampled_traffic_against_feedback(tmp_path, monkeypatch):
+    mlmod, client = _client(tmp_path, monkeypatch)
+    for label, type_id, cat_id in [("LATTE PS 1L", "t-milk", "c-dairy"), ("BANANE KG", "t-fruit", "c-fresh")] * 3:
+        client.post("/feedback", json={"labelRaw": label, "finalTypeId": type_id, "finalCategoryId": cat_id})
+    candidate = client.post("/models/publish").json()["version"]
+    assert client.post("/shadow", json={"versions": ["v9999"]}).status_code == 404
+
+    stats = client.post("/shadow", json={"versions": [candidate], "sampleRate": 1.0}).json()
+    assert stats["enabled"] and stats["versions"] == [candidate]
+    # The serving model moves on; the candidate stays frozen at the published state
+    for _ in range(2):
+        client.post("/feedback", json={"labelRaw": "PANE INTEGRALE", "finalTypeId": "t-bread", "finalCategoryId": "c-bakery"})
+
+    results = client.post("/predict/batch", json={"items": [{"labelRaw": "LATTE PS 1L"}, {"labelRaw": "PANE INTEGRALE"}]}).json()
+    served = [r["typeCandidates"][0]["id"] for r in results["results"]]
+    assert served[1] == "t-bread"
+    client.post("/feedback", json={"labelRaw": "latte ps  1l", "finalTypeId": "t-milk", "finalCategoryId": "c-dairy"})
+    client.post("/feedback", json={"labelRaw": "PANE INTEGRALE", "finalTypeId": "t-bread", "finalCategoryId": "c-bakery"})
+    mlmod.manager.shadow.drain()
+
+    stats = client.get("/shadow").json()
+    assert stats["sampled"] == 2 and stats["dropped"] == 0 and stats["pending"] == 0
+    serving, shadow = stats["models"]["serving"], stats["models"][candidate]
+    # The candidate never saw t-bread, so it cannot agree on the second label
+    assert shadow["scored"] == 2 and shadow["typeAgreement"] == (0.5 if served[0] == "t-milk" else 0.0)
+    assert serving["feedback"]["matched"] == 2
+    assert serving["feedback"]["typeAccuracy"] == [served[0] == "t-milk", True].count(True) / 2
+    assert shadow["feedback"]["matched"] == 2 and shadow["feedback"]["typeAccuracy"] == 0.5
+    assert shadow["feedback"]["categoryAccuracy"] == 0.5
+    mlmod.manager.close()
+
+
+def test_shadow_disabled_and_bounded_queue():
+    loads = []
+    shadow = ShadowEvaluator(lambda v: loads.append(v), sample_rate=0.0, versions=())
+    shadow.offer([("x", None)], [([], [])])
+    assert shadow.stats()["sampled"] == 0 and not shadow.enabled and loads == []
+
+    shadow = ShadowEvaluator(lambda v: 1 / 0, sample_rate=1.0, versions=["v0001"], max_queue=1)
+    shadow.drain()
+    shadow.offer([("x", None)], [([], [])])
+    shadow.drain()
+    stats = shadow.stats()
+    # An unloadable candidate is reported, not retried on every item, and never raises on the request path
+    assert "division by zero" in stats["models"]["v0001"]["error"]
+    assert stats["models"]["v0001"]["scored"] == 0
+    shadow.close()
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from importlib import reload
+
+from fastapi.testclient import TestClient
+
+from services.ml.stream import MiniBatcher, ShuffleBuffer, split_lines
+
+CATALOG = [("LATTE PS 1L", "t-milk", "c-dairy"), ("YOGURT BIANCO", "t-yogurt", "c-dairy"),
+           ("BANANE KG", "t-fruit", "c-fresh"), ("PANE INTEGRALE", "t-bread", "c-bakery")]
+
+
+def _ndjson(n):
+    lines = []
+    for i in range(n):
+        label, type_id, cat_id = CATALOG[i % len(CATALOG)]
+        lines.append(json.dumps({"labelRaw": label, "finalTypeId": type_id, "finalCategoryId": cat_id}))
+    return "\n".join(lines) + "\n"
+
+
+def test_minibatcher_shuffles_with_bounded_buffer():
+    batcher = MiniBatcher(batch_size=16, shuffle_buffer=32, seed=1)
+    batches = []
+    for i in range(100):
+        batches += batcher.feed(json.dumps({"labelRaw": f"x{i}", "finalTypeId": "t"}))
+        assert len(batcher.shuffle) <= 32
+    batches += batcher.feed("not json") + batcher.feed('{"labelRaw": "no type"}') + batcher.finish()
+    labels = [r["labelRaw"] for b in batches for r in b]
+    assert sorted(labels) == sorted(f"x{i}" for i in range(100))
+    assert labels != [f"x{i}" for i in range(100)]
+    assert [len(b) for b in batches][:-1] == [16] * (len(batches) - 1)
+    assert batcher.parsed == 100 and batcher.skipped == 2
+
+    buf = ShuffleBuffer(0)
+    assert buf.push(1) == 1 and list(buf.drain()) == []
+
+
+def test_split_lines_joins_lines_across_chunks():
+    async def chunks():
+        for chunk in (b'{"a": 1}\n{"b"', b": 2}\n", b"", b'{"c": 3}'):
+            yield chunk
+
+    async def collect():
+        return [line async for line in split_lines(chunks())]
+
+    assert asyncio.run(collect()) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_train_stream_from_body_and_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    import services.ml.main as mlmod
+    reload(mlmod)
+    client = TestClient(mlmod.app)
+
+    r = client.post("/train/stream?batchSize=50&shuffleBuffer=64&seed=3", content=_ndjson(400) + "garbage\n")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["examples"] == 400 and body["skipped"] == 1 and body["batches"] == 8
+
+    # One checkpoint covering everything, written at the end
+    assert mlmod.manager.checkpoint_seq == mlmod.manager.snapshot.wal_seq == 400
+    assert len(list((tmp_path / "checkpoints").glob("ckpt-*"))) == 1
+    pred = client.post("/predict", json={"labelRaw": "YOGURT BIANCO"}).json()
+    assert pred["typeCandidates"][0]["id"] == "t-yogurt"
+
+    (tmp_path / "history.ndjson").write_text(_ndjson(100))
+    r = client.post("/train/stream", params={"path": "history.ndjson", "batchSize": 64})
+    assert r.status_code == 200 and r.json()["examples"] == 100
+    assert mlmod.manager.snapshot.wal_seq == 500
+
+    assert client.post("/train/stream", params={"path": "../outside.ndjson"}).status_code == 400
+    assert client.post("/train/stream", params={"path": "feedback.jsonl"}).status_code == 400
+    assert client.post("/train/stream", params={"path": "missing.ndjson"}).status_code == 404
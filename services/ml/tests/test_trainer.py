@@ -0,0 +1,43 @@
+import threading
+
+import numpy as np
+
+import services.ml.main as mlmod
+
+
+def test_predictions_read_immutable_snapshots_while_training(tmp_path):
+    manager = mlmod.ModelManager(str(tmp_path))
+    manager.submit([{"labelRaw": f"PRODOTTO {i}", "finalTypeId": f"t-{i % 7}"} for i in range(50)]).result(timeout=10)
+
+    old = manager.snapshot
+    old_labels = list(old.type_clf.labels)
+    old_proba = old.type_clf.predict_proba(old.featurizer.transform(["PRODOTTO 3"]))
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                snap = manager.snapshot
+                t, _ = manager.predict("PRODOTTO 3", None)
+                assert len(snap.type_clf.labels) <= len(manager.snapshot.type_clf.labels)
+                assert all(c.id.startswith("t-") for c in t)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for th in threads:
+        th.start()
+    # New classes keep arriving while readers run
+    futures = [manager.feedback(f"NUOVO {i}", None, f"t-new-{i % 40}", None) for i in range(200)]
+    for fut in futures:
+        fut.result(timeout=10)
+    stop.set()
+    for th in threads:
+        th.join()
+
+    assert not errors
+    assert manager.snapshot.version > old.version and manager.snapshot.wal_seq == 250
+    # The published snapshot never changed underneath its readers
+    assert old.type_clf.labels == old_labels
+    assert np.array_equal(old.type_clf.predict_proba(old.featurizer.transform(["PRODOTTO 3"])), old_proba)
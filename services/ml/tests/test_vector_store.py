@@ -0,0 +1,67 @@
+from importlib import reload
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("qdrant_client")
+
+from services.ml.knn import NgramEncoder
+from services.ml.vector_store import QdrantIndex
+
+
+class CountingEncoder(NgramEncoder):
+    def __init__(self):
+        super().__init__(64)
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        return super().encode(texts)
+
+
+def test_batched_upserts_filtered_search_and_embedding_cache():
+    encoder = CountingEncoder()
+    index = QdrantIndex(encoder, batch_size=2, max_in_flight=1)
+    records = [("latte ps 1l", "t-milk", "c-dairy"), ("latte intero", "t-milk", "c-dairy"),
+               ("yogurt bianco", "t-yogurt", "c-dairy"), ("banane kg", "t-fruit", "c-fresh"),
+               ("latte ps 1l", "t-milk", "c-dairy")]
+    for seq, (text, type_id, cat_id) in enumerate(records, start=1):
+        index.insert(text, type_id, cat_id, seq=seq)
+    index.flush()
+    assert len(index) == 5 and index.seq == 5
+    assert encoder.encoded == 4  # the repeated label reused its cached embedding
+
+    types, cats = index.vote("latte p5 1l", k=3, min_sim=0.3)
+    assert types[0][0] == "t-milk" and cats[0][0] == "c-dairy"
+    hits = index.search("latte", k=5, category_id="c-fresh")
+    assert [h[0] for h in hits] == ["banane kg"]
+    assert all(h[2] == {"t-yogurt": 1.0} for h in index.search("latte", k=5, type_id="t-yogurt"))
+
+    # Replaying a record upserts the same point id instead of adding a vote
+    index.insert("banane kg", "t-fruit", "c-fresh", seq=4)
+    index.flush()
+    assert len(index) == 5
+    index.close()
+
+
+def test_qdrant_backend_serves_predict_and_similar(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_DIR", str(tmp_path))
+    monkeypatch.setenv("ML_KNN_BACKEND", "qdrant")
+    import services.ml.main as mlmod
+    reload(mlmod)
+    client = TestClient(mlmod.app)
+    client.post("/feedback", json={"labelRaw": "LATTE PS 1L", "finalTypeId": "t-milk", "finalCategoryId": "c-dairy"})
+    client.post("/feedback", json={"labelRaw": "BANANE KG", "finalTypeId": "t-fruit", "finalCategoryId": "c-fresh"})
+
+    r = client.post("/similar", json={"labelRaw": "LATTE P5 1L", "k": 1}).json()
+    assert r["neighbours"][0]["text"] == "latte ps 1l"
+    assert r["neighbours"][0]["types"] == {"t-milk": 1.0}
+    r = client.post("/similar", json={"labelRaw": "LATTE P5 1L", "categoryId": "c-fresh"}).json()
+    assert [n["text"] for n in r["neighbours"]] == ["banane kg"]
+
+    # In-memory Qdrant starts empty after a restart: the feedback log backfills it
+    mlmod.manager.checkpoint()
+    mlmod.manager.close()
+    reload(mlmod)
+    assert len(mlmod.manager.knn) == 2
+    mlmod.manager.close()
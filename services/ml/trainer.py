@@ -0,0 +1,98 @@
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+from .classifier import OnlineLinearClassifier
+from .features import HashingFeaturizer
+from .hierarchy import CategoryTypeMap
+from .inference import CompiledModel
+
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """Immutable view of the model that predictions read from; replaced, never modified."""
+
+    version: int
+    wal_seq: int
+    featurizer: HashingFeaturizer
+    type_clf: OnlineLinearClassifier
+    cat_clf: OnlineLinearClassifier
+    # Registry version this state was activated from (None: built purely from the feedback log)
+    model_version: Optional[str] = None
+    # Inference-only export used on the /predict hot path
+    compiled: Optional[CompiledModel] = None
+    # Types confirmed under each category, for hierarchical prediction
+    hierarchy: Optional[CategoryTypeMap] = None
+
+
+class Trainer:
+    """Single writer: one thread consumes the feedback queue and is the only code that mutates
+    the working model. Records queued while a batch is being applied are coalesced into the next
+    batch, so one snapshot is published per batch rather than per record.
+
+    submit() returns a Future that resolves once the records are logged, applied and visible
+    in the published snapshot. call() runs a function on the trainer thread between batches,
+    for operations that replace the working model (e.g. activating a registry version).
+    """
+
+    def __init__(self, apply_batch: Callable[[List[dict]], None], max_batch: int = 256):
+        self._apply_batch = apply_batch
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="ml-trainer", daemon=True)
+        self._thread.start()
+
+    def submit(self, records: List[dict]) -> Future:
+        fut: Future = Future()
+        self._queue.put((records, fut))
+        return fut
+
+    def call(self, fn: Callable[[], Any]) -> Future:
+        fut: Future = Future()
+        self._queue.put((fn, fut))
+        return fut
+
+    def pending(self) -> int:
+        """Submissions and calls queued behind the batch being applied (approximate, for monitoring)."""
+        return self._queue.qsize()
+
+    def _run(self):
+        carry = []
+        while True:
+            item = carry.pop() if carry else self._queue.get()
+            if item is None:
+                return
+            if callable(item[0]):
+                fn, fut = item
+                try:
+                    fut.set_result(fn())
+                except Exception as e:
+                    fut.set_exception(e)
+                continue
+            batch = [item]
+            size = len(item[0])
+            while size < self.max_batch:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None or callable(nxt[0]):
+                    # Keep ordering: a stop or call item runs right after this batch
+                    carry.append(nxt)
+                    break
+                batch.append(nxt)
+                size += len(nxt[0])
+            try:
+                self._apply_batch([r for records, _ in batch for r in records])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for _, fut in batch:
+                fut.set_result(None)
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=30)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import threading
+import warnings
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, FieldCondition, Filter, MatchValue, PayloadSchemaType, PointStruct, VectorParams
+
+from .knn import neighbour_votes
+
+
+class QdrantIndex:
+    """Nearest-neighbour votes backed by a Qdrant collection, for label histories that outgrow
+    process memory.
+
+    Every feedback record is one point whose id is its feedback log seq, so replaying the log
+    upserts the same points again instead of adding votes. Payload: text, typeId, categoryId and
+    weight, with keyword indexes on typeId/categoryId for filtered search.
+
+    Inserts are buffered and embedded in batches; upserts run on a background thread with at most
+    `max_in_flight` batches outstanding, so embedding the next batch overlaps the previous write.
+    Searches never flush: a record becomes searchable once its batch is written (the service
+    flushes after each feedback batch, off the request path).
+    Embeddings are memoized by a hash of the text (`cache_size` entries), since receipt labels
+    repeat constantly. The encoder is injectable (anything with `name`, `dim` and
+    `encode(texts) -> float32 array`).
+    """
+
+    def __init__(self, encoder, client: Optional[QdrantClient] = None, location: str = ":memory:",
+                 path: Optional[str] = None, collection: str = "wib_labels", batch_size: int = 256,
+                 max_in_flight: int = 4, cache_size: int = 100_000):
+        self.encoder = encoder
+        self.dim = encoder.dim
+        self.client = client or (QdrantClient(path=path) if path else QdrantClient(location=location))
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._buffer: List[Tuple[int, str, str, Optional[str], float]] = []
+        self._in_flight: deque = deque()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-qdrant")
+        self._lock = threading.RLock()
+        self._client_lock = threading.Lock()
+        self.seq = 0
+        self.cache_hits = self.cache_misses = 0
+        self._ensure_collection()
+        self._count = self.client.count(self.collection, exact=True).count
+
+    def _ensure_collection(self):
+        if self.client.collection_exists(self.collection):
+            return
+        self.client.create_collection(self.collection, vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE))
+        with warnings.catch_warnings():
+            # Local mode warns that payload indexes are a no-op there; they matter on a server
+            warnings.simplefilter("ignore", UserWarning)
+            for field in ("typeId", "categoryId"):
+                self.client.create_payload_index(self.collection, field, field_schema=PayloadSchemaType.KEYWORD)
+
+    def __len__(self) -> int:
+        return self._count + len(self._buffer)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embeddings for texts, computing only those not in the hash-keyed memo, in one batch."""
+        keys = [hashlib.blake2b(t.encode("utf-8"), digest_size=16).digest() for t in texts]
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._cache.get(key)
+                if vec is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    out[i] = vec
+                    self.cache_hits += 1
+        if missing:
+            self.cache_misses += len(missing)
+            vectors = self.encoder.encode([texts[rows[0]] for rows in missing.values()])
+            with self._lock:
+                for (key, rows), vec in zip(missing.items(), vectors):
+                    out[rows] = vec
+                    self._cache[key] = vec
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out
+
+    def insert(self, text: str, type_id: str, cat_id: Optional[str], seq: int = 0, weight: float = 1.0):
+        with self._lock:
+            self._buffer.append((seq, text, type_id, cat_id, weight))
+            self.seq = max(self.seq, seq)
+            if len(self._buffer) >= self.batch_size:
+                self.flush(wait=False)
+
+    def flush(self, wait: bool = True):
+        """Embed and upsert the buffered records; with wait=True also wait for every pending write."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            if batch:
+                vectors = self.embed([text for _, text, _, _, _ in batch])
+                points = [PointStruct(id=seq, vector=vec.tolist(),
+                                      payload={"text": text, "typeId": type_id, "categoryId": cat_id, "weight": weight})
+                          for (seq, text, type_id, cat_id, weight), vec in zip(batch, vectors)]
+                while len(self._in_flight) >= self.max_in_flight:
+                    self._in_flight.popleft().result()
+                self._in_flight.append(self._writer.submit(self._upsert, points))
+            if wait:
+                while self._in_flight:
+                    self._in_flight.popleft().result()
+
+    def _upsert(self, points: List[PointStruct]):
+        with self._client_lock:
+            self.client.upsert(self.collection, points=points, wait=True)
+        # Ids are log seqs: counting upserts would overcount replays, ask the collection instead
+        self._count = self.client.count(self.collection, exact=False).count
+
+    def search(self, text: str, k: int = 10, type_id: Optional[str] = None,
+               category_id: Optional[str] = None) -> List[Tuple[str, float, Dict[str, float], Dict[str, float]]]:
+        """Top-k written points by cosine similarity, optionally filtered on typeId/categoryId, in the
+        same (text, similarity, type votes, category votes) form as NeighborIndex.search."""
+        vec = self.embed([text])[0].tolist()
+        must = [FieldCondition(key=key, match=MatchValue(value=value))
+                for key, value in (("typeId", type_id), ("categoryId", category_id)) if value is not None]
+        query_filter = Filter(must=must) if must else None
+        with self._client_lock:
+            if hasattr(self.client, "query_points"):
+                hits = self.client.query_points(self.collection, query=vec, limit=k, query_filter=query_filter,
+                                                with_payload=True).points
+            else:  # qdrant-client < 1.10
+                hits = self.client.search(self.collection, query_vector=vec, limit=k, query_filter=query_filter,
+                                          with_payload=True)
+        out = []
+        for hit in hits:
+            p = hit.payload or {}
+            weight = float(p.get("weight", 1.0))
+            out.append((p.get("text", ""), float(hit.score), {p["typeId"]: weight},
+                        {p["categoryId"]: weight} if p.get("categoryId") else {}))
+        return out
+
+    def vote(self, text: str, k: int = 10, min_sim: float = 0.5):
+        return neighbour_votes(self.search(text, k), min_sim)
+
+    def save(self, directory: Path, name: str = "qdrant"):
+        # The points live in Qdrant; only the log position they cover belongs to the checkpoint
+        self.flush(wait=True)
+        (Path(directory) / f"{name}.json").write_text(json.dumps({"collection": self.collection, "seq": self.seq}))
+
+    def load(self, directory: Path, name: str = "qdrant") -> bool:
+        meta_path = Path(directory) / f"{name}.json"
+        if not meta_path.exists() or self._count == 0:
+            # Empty collection (e.g. in-memory mode after a restart): let the log backfill it
+            return False
+        self.seq = max(self.seq, int(json.loads(meta_path.read_text())["seq"]))
+        return True
+
+    def close(self):
+        self.flush(wait=True)
+        self._writer.shutdown(wait=True)
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+
+class FeedbackLog:
+    """Append-only JSON-lines log of feedback records, the durability mechanism of the ML service.
+
+    Every record gets a monotonically increasing "seq". Appends are written and flushed to the OS
+    immediately, but fsync is batched: it happens once fsync_every records are pending or
+    fsync_interval seconds have passed (sync() is also called periodically by the checkpointer),
+    so a crash loses at most that window while each append stays cheap.
+
+    Several uvicorn workers may append to the same file: appends take an exclusive flock and
+    first read whatever other processes wrote since, so sequence numbers stay unique. Those
+    records are kept for take_foreign(), so a worker can apply them before its own and its
+    model (and the walSeq it checkpoints) covers every record up to its last one.
+    """
+
+    def __init__(self, path: Path, fsync_every: int = 32, fsync_interval: float = 0.2):
+        self.path = Path(path)
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self.last_seq = 0
+        for record in self.read():
+            self.last_seq = record["seq"]
+        torn = self._ends_torn()
+        self._fh = self.path.open("ab")
+        if torn:
+            # Terminate a torn last line so the next record starts on its own line
+            self._fh.write(b"\n")
+            self._fh.flush()
+        self._end = self._fh.tell()
+        # Records other processes appended, seen while catching up and not yet taken
+        self._foreign: List[dict] = []
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _ends_torn(self) -> bool:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return False
+        with self.path.open("rb") as fh:
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) != b"\n"
+
+    def _catch_up(self):
+        """Advance last_seq past records appended by other processes since our last write, keeping them."""
+        size = os.fstat(self._fh.fileno()).st_size
+        if size <= self._end:
+            return
+        with self.path.open("rb") as fh:
+            fh.seek(self._end)
+            for line in fh.read(size - self._end).splitlines():
+                try:
+                    record = json.loads(line)
+                    self.last_seq = max(self.last_seq, int(record["seq"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._foreign.append(record)
+        self._end = size
+
+    def append(self, record: dict) -> int:
+        return self.append_many([record])[0]
+
+    def append_many(self, records: List[dict]) -> List[int]:
+        """Append records under one flock, so they get consecutive seqs. Several records are
+        tagged with a shared "batch" id (their first seq) that replay uses to group them."""
+        if not records:
+            return []
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                first = self.last_seq + 1
+                lines = []
+                for seq, record in enumerate(records, start=first):
+                    record = {**record, "batch": first, "seq": seq} if len(records) > 1 else {**record, "seq": seq}
+                    lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+                self._fh.write("".join(lines).encode("utf-8"))
+                self._fh.flush()
+                self._end = self._fh.tell()
+                self.last_seq = first + len(records) - 1
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            self._pending += len(records)
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+            return list(range(first, self.last_seq + 1))
+
+    def take_foreign(self) -> List[dict]:
+        """Records other processes appended before our last append, oldest first; each is returned once."""
+        with self._lock:
+            records, self._foreign = self._foreign, []
+            return records
+
+    def _sync_locked(self):
+        if self._pending:
+            os.fsync(self._fh.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            if not self._fh.closed:
+                self._sync_locked()
+
+    def close(self):
+        with self._lock:
+            if not self._fh.closed:
+                self._sync_locked()
+                self._fh.close()
+
+    def read(self, after_seq: int = 0) -> Iterator[dict]:
+        return read_log(self.path, after_seq)
+
+
+def read_log(path: Path, after_seq: int = 0) -> Iterator[dict]:
+    """Records with seq > after_seq, oldest first, without opening the log for writing. Lines
+    written before sequence numbers existed get their line number; a torn last line from a crash
+    is skipped."""
+    path = Path(path)
+    if not path.exists():
+        return
+    with path.open(encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, start=1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            record.setdefault("seq", lineno)
+            if record["seq"] > after_seq:
+                yield record
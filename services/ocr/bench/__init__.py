@@ -0,0 +1,19 @@
+from .synth import SynthConfig, generate_corpus, load_corpus, receipt_content, render_receipt, write_corpus
+from .run import compare_results, run_benchmark, save_results
+from .kie import check_thresholds, load_cases, run_kie_benchmark, synthetic_cases
+
+__all__ = [
+    "SynthConfig",
+    "generate_corpus",
+    "load_corpus",
+    "receipt_content",
+    "render_receipt",
+    "write_corpus",
+    "compare_results",
+    "run_benchmark",
+    "save_results",
+    "check_thresholds",
+    "load_cases",
+    "run_kie_benchmark",
+    "synthetic_cases",
+]
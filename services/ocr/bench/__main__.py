@@ -0,0 +1,83 @@
+"""CLI: python -m services.ocr.bench {generate,run} ...
+
+  generate --out DIR --count N           write a synthetic corpus (jpg + ground-truth json)
+  run [--corpus DIR | --count N]         benchmark the OCR pipeline and save a JSON report
+      [--workers W] [--compare BASE.json]
+  kie [--synthetic N] [--min-throughput R] benchmark the KIE heuristics (speed + field accuracy);
+      [--min-accuracy A] [--baseline B.json] exits 1 when a threshold is not met
+"""
+import argparse
+import json
+import sys
+
+from .kie import check_thresholds, format_kie_report, load_cases, run_kie_benchmark, synthetic_cases
+from .run import STAGES, compare_results, format_report, run_benchmark, save_results
+from .synth import SynthConfig, generate_corpus, load_corpus, write_corpus
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m services.ocr.bench")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    gen = sub.add_parser("generate", help="write a synthetic receipt corpus")
+    gen.add_argument("--out", default=".data/bench/ocr_corpus")
+    gen.add_argument("--count", type=int, default=50)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--max-items", type=int, default=25)
+
+    run = sub.add_parser("run", help="benchmark preprocess/ocr/kie over a corpus")
+    run.add_argument("--corpus", help="directory written by 'generate' (default: generate in memory)")
+    run.add_argument("--count", type=int, default=20)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--stages", default=",".join(STAGES))
+    run.add_argument("--out", default=".data/bench/results")
+    run.add_argument("--compare", help="previous report to diff against")
+
+    kie = sub.add_parser("kie", help="benchmark parse_text throughput and field accuracy")
+    kie.add_argument("--corpus", help="directory of {text, expected} cases (default: bundled kie_corpus)")
+    kie.add_argument("--synthetic", type=int, default=200, help="synthetic receipts added to the corpus")
+    kie.add_argument("--seed", type=int, default=0)
+    kie.add_argument("--repeat", type=int, default=3)
+    kie.add_argument("--min-throughput", type=float, help="fail below this many receipts/s")
+    kie.add_argument("--min-accuracy", type=float, help="fail below this overall field accuracy (0-1)")
+    kie.add_argument("--baseline", help="previous kie report; fail on accuracy drop or throughput regression")
+    kie.add_argument("--max-regression", type=float, default=10.0, help="allowed throughput drop vs baseline, percent")
+    kie.add_argument("--out", default=".data/bench/results")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "kie":
+        cases = load_cases(args.corpus) + synthetic_cases(args.synthetic, seed=args.seed)
+        report = run_kie_benchmark(cases, repeat=args.repeat)
+        path = save_results(report, args.out, prefix="kie")
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        failures = check_thresholds(report, args.min_throughput, args.min_accuracy, baseline,
+                                    args.max_regression if baseline else None)
+        print(format_kie_report(report))
+        print(f"saved {path}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1 if failures else 0
+
+    if args.cmd == "generate":
+        paths = write_corpus(args.out, args.count, seed=args.seed, cfg=SynthConfig(max_items=args.max_items))
+        print(f"wrote {len(paths)} receipts to {args.out}")
+        return 0
+
+    items = load_corpus(args.corpus) if args.corpus else generate_corpus(args.count, seed=args.seed)
+    report = run_benchmark(items, workers=args.workers, stages=tuple(s for s in args.stages.split(",") if s))
+    path = save_results(report, args.out)
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            comparison = compare_results(json.load(f), report)
+    print(format_report(report, comparison))
+    print(f"saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
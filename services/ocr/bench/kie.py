@@ -0,0 +1,201 @@
+"""Throughput and field-level accuracy benchmark for the heuristic KIE parser (parse_text).
+
+The corpus mixes the anonymized samples in kie_corpus/ with synthetic receipts from synth.py;
+every case is {"name", "text", "expected"} where expected follows the /kie response schema.
+"""
+import json
+import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from .run import git_commit, percentiles
+from .synth import SynthConfig, receipt_content
+
+CORPUS_DIR = Path(__file__).parent / "kie_corpus"
+STORE_FIELDS = ("name", "address", "city", "postalCode", "vatNumber")
+LINE_FIELDS = ("qty", "unitPrice", "lineTotal", "vatRate", "weightKg", "pricePerKg")
+TOTAL_FIELDS = ("subtotal", "tax", "total")
+
+
+def load_cases(corpus_dir: Optional[str] = None) -> list[dict]:
+    cases = []
+    for path in sorted(Path(corpus_dir or CORPUS_DIR).glob("*.json")):
+        cases.append(json.loads(path.read_text(encoding="utf-8")))
+    return cases
+
+
+def synthetic_cases(count: int, seed: int = 0, cfg: Optional[SynthConfig] = None) -> list[dict]:
+    cfg = cfg or SynthConfig()
+    cases = []
+    for i in range(count):
+        _, truth = receipt_content(random.Random(seed + i), cfg)
+        text = "\n".join(truth.pop("text"))
+        cases.append({"name": f"synthetic_{seed + i:05d}", "source": "synth", "text": text, "expected": truth})
+    return cases
+
+
+def _same_text(a, b) -> bool:
+    return (a or "").strip().casefold() == (b or "").strip().casefold()
+
+
+def _same_number(a, b, tol: float = 0.011) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(float(a) - float(b)) <= tol
+
+
+class _Score:
+    def __init__(self):
+        self.fields: dict[str, list[int]] = {}
+
+    def add(self, field: str, ok: bool):
+        cell = self.fields.setdefault(field, [0, 0])
+        cell[0] += int(ok)
+        cell[1] += 1
+
+    def summary(self) -> dict:
+        out = {f: {"correct": c, "total": t, "accuracy": round(c / t, 4)} for f, (c, t) in sorted(self.fields.items())}
+        correct = sum(c for c, _ in self.fields.values())
+        total = sum(t for _, t in self.fields.values())
+        return {"overall": round(correct / total, 4) if total else None, "fields": out}
+
+
+def score_case(parsed: dict, expected: dict, score: _Score) -> dict:
+    """Accumulate field-level matches of one parse into score; returns line match counts."""
+    for f in STORE_FIELDS:
+        if expected.get("store", {}).get(f) is not None:
+            score.add(f"store.{f}", _same_text(parsed["store"].get(f), expected["store"][f]))
+    if expected.get("datetime"):
+        # Compare wall-clock date and minute; the parser attaches the local timezone
+        score.add("datetime", (parsed.get("datetime") or "")[:16] == expected["datetime"][:16])
+    score.add("currency", parsed.get("currency") == expected.get("currency", "EUR"))
+    for f in TOTAL_FIELDS:
+        if f in expected.get("totals", {}):
+            score.add(f"totals.{f}", _same_number(parsed["totals"].get(f), expected["totals"][f]))
+
+    remaining = list(parsed.get("lines", []))
+    matched = 0
+    for exp in expected.get("lines", []):
+        hit = next((p for p in remaining if _same_text(p["labelRaw"], exp["labelRaw"])), None)
+        score.add("lines.labelRaw", hit is not None)
+        if hit is None:
+            continue
+        remaining.remove(hit)
+        matched += 1
+        for f in LINE_FIELDS:
+            if f in exp:
+                score.add(f"lines.{f}", _same_number(hit.get(f), exp[f]))
+    return {"matched": matched, "expected": len(expected.get("lines", [])), "parsed": len(parsed.get("lines", []))}
+
+
+def _timed_parse(text: str, spent: dict[str, float]):
+    """Replay the steps of parse_text, adding the time of each function to spent."""
+    from services.ocr import main as m
+
+    t0 = time.perf_counter()
+    lines = [l for l in (m.clean_line(x) for x in text.splitlines()) if l]
+    t1 = time.perf_counter(); spent["clean_line"] += t1 - t0
+    m.infer_store(lines)
+    t0 = time.perf_counter(); spent["infer_store"] += t0 - t1
+    m.infer_address_city_cap(lines)
+    t1 = time.perf_counter(); spent["infer_address_city_cap"] += t1 - t0
+    m.infer_vat(lines)
+    t0 = time.perf_counter(); spent["infer_vat"] += t0 - t1
+    m.infer_datetime(lines)
+    t1 = time.perf_counter(); spent["infer_datetime"] += t1 - t0
+    m.infer_currency(text)
+    t0 = time.perf_counter(); spent["infer_currency"] += t0 - t1
+    items = m.infer_items(lines)
+    t1 = time.perf_counter(); spent["infer_items"] += t1 - t0
+    m.infer_totals(lines, items)
+    spent["infer_totals"] += time.perf_counter() - t1
+
+
+FUNCTIONS = ("clean_line", "infer_store", "infer_address_city_cap", "infer_vat", "infer_datetime",
+             "infer_currency", "infer_items", "infer_totals")
+
+
+def run_kie_benchmark(cases: list[dict], repeat: int = 3) -> dict:
+    from services.ocr.main import parse_text
+
+    # Accuracy (single pass)
+    score = _Score()
+    matched = expected = parsed_count = 0
+    for case in cases:
+        counts = score_case(parse_text(case["text"]), case["expected"], score)
+        matched += counts["matched"]
+        expected += counts["expected"]
+        parsed_count += counts["parsed"]
+
+    # Throughput of the full parser
+    per_receipt: list[float] = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            t0 = time.perf_counter()
+            parse_text(case["text"])
+            per_receipt.append((time.perf_counter() - t0) * 1000)
+    wall = time.perf_counter() - started
+
+    # Per-function breakdown, replaying the same steps parse_text takes
+    spent = {name: 0.0 for name in FUNCTIONS}
+    for _ in range(repeat):
+        for case in cases:
+            _timed_parse(case["text"], spent)
+    stage_total = sum(spent.values()) or 1.0
+    runs = max(1, repeat * len(cases))
+
+    precision = matched / parsed_count if parsed_count else 0.0
+    recall = matched / expected if expected else 0.0
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"receipts": len(cases), "repeat": repeat},
+        "throughput": {"receiptsPerSecond": round(runs / wall, 1) if wall else None, "parseMs": percentiles(per_receipt)},
+        "functions": {
+            name: {"meanUs": round(s / runs * 1e6, 2), "share": round(s / stage_total, 4)}
+            for name, s in spent.items()
+        },
+        "accuracy": score.summary(),
+        "lines": {
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        },
+    }
+
+
+def check_thresholds(report: dict, min_throughput: Optional[float] = None, min_accuracy: Optional[float] = None,
+                     baseline: Optional[dict] = None, max_regression_pct: Optional[float] = None) -> list[str]:
+    """Return human-readable failures; empty when the report is within all given limits."""
+    failures = []
+    rps = report["throughput"]["receiptsPerSecond"] or 0.0
+    acc = report["accuracy"]["overall"] or 0.0
+    if min_throughput is not None and rps < min_throughput:
+        failures.append(f"throughput {rps} receipts/s < {min_throughput}")
+    if min_accuracy is not None and acc < min_accuracy:
+        failures.append(f"accuracy {acc} < {min_accuracy}")
+    if baseline and max_regression_pct is not None:
+        base_rps = baseline["throughput"]["receiptsPerSecond"] or 0.0
+        base_acc = baseline["accuracy"]["overall"] or 0.0
+        if base_rps and (base_rps - rps) / base_rps * 100 > max_regression_pct:
+            failures.append(f"throughput regressed {base_rps} -> {rps} receipts/s (> {max_regression_pct}%)")
+        if acc < base_acc:
+            failures.append(f"accuracy regressed {base_acc} -> {acc}")
+    return failures
+
+
+def format_kie_report(report: dict) -> str:
+    t = report["throughput"]
+    out = [
+        f"commit {report['commit']}  receipts={report['config']['receipts']}  repeat={report['config']['repeat']}",
+        f"  throughput  {t['receiptsPerSecond']} receipts/s  (p50={t['parseMs']['p50']}ms p99={t['parseMs']['p99']}ms)",
+        f"  accuracy    {report['accuracy']['overall']}  lines P={report['lines']['precision']} R={report['lines']['recall']} F1={report['lines']['f1']}",
+    ]
+    for name, f in sorted(report["functions"].items(), key=lambda kv: -kv[1]["share"]):
+        out.append(f"  {name:<24} {f['meanUs']:>9.1f}us  {f['share'] * 100:5.1f}%")
+    for name, f in report["accuracy"]["fields"].items():
+        out.append(f"  {name:<24} {f['accuracy']:.3f}  ({f['correct']}/{f['total']})")
+    return "\n".join(out)
@@ -0,0 +1,180 @@
+"""OCR pipeline benchmark: preprocess_image -> Tesseract lines -> parse_text_with_lines.
+
+Results are plain JSON (one file per run, tagged with the git commit) so that two runs
+can be compared with compare_results().
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+STAGES = ("preprocess", "ocr", "kie")
+
+
+def percentiles(samples_ms: list[float]) -> dict:
+    if not samples_ms:
+        return {"count": 0}
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "count": int(arr.size),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def peak_rss_mb() -> dict:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"self": None, "children": None}
+    # ru_maxrss is KiB on Linux, bytes on macOS; children covers the tesseract subprocesses
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def _run_one(item: tuple[str, bytes, dict], stages: tuple[str, ...]) -> dict:
+    from services.ocr.main import iter_ocr_lines, parse_text_with_lines
+    from services.ocr.preprocessing import preprocess_image
+
+    name, data, truth = item
+    timings: dict[str, float] = {}
+    t0 = time.perf_counter()
+    img = preprocess_image(data)
+    timings["preprocess"] = (time.perf_counter() - t0) * 1000
+
+    lines = None
+    if "ocr" in stages:
+        t0 = time.perf_counter()
+        # Single strip: same work as ocr_lines() minus the preprocessing already timed above
+        lines = list(iter_ocr_lines(img, strip_px=0))
+        timings["ocr"] = (time.perf_counter() - t0) * 1000
+    if lines is None:
+        # Without Tesseract the KIE stage runs on the ground-truth text
+        lines = [{"text": t, "bbox": {}} for t in truth.get("text", [])]
+
+    if "kie" in stages:
+        t0 = time.perf_counter()
+        parsed = parse_text_with_lines(lines)
+        timings["kie"] = (time.perf_counter() - t0) * 1000
+        expected = {l["labelRaw"] for l in truth.get("lines", [])}
+        found = {l["labelRaw"] for l in parsed["lines"]}
+        timings["_labelRecall"] = len(expected & found) / len(expected) if expected else 1.0
+    return {"name": name, **timings}
+
+
+def _run_chunk(chunk: list[tuple[str, bytes, dict]], stages: tuple[str, ...]) -> list[dict]:
+    return [_run_one(item, stages) for item in chunk]
+
+
+def tesseract_available() -> bool:
+    try:
+        import pytesseract
+
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def run_benchmark(items: list[tuple[str, bytes, dict]], workers: int = 1, stages: tuple[str, ...] = STAGES,
+                  warmup: int = 1) -> dict:
+    """Run the pipeline over a corpus (see synth.load_corpus / generate_corpus) and return the report.
+    Stages that cannot run here (ocr without Tesseract) are listed in config.skipped."""
+    skipped = []
+    if "ocr" in stages and not tesseract_available():
+        stages = tuple(s for s in stages if s != "ocr")
+        skipped.append("ocr")
+        print("warning: Tesseract not found, skipping the ocr stage (kie runs on the ground-truth text)",
+              file=sys.stderr)
+    for item in items[:warmup]:
+        _run_one(item, stages)
+
+    started = time.perf_counter()
+    if workers <= 1:
+        rows = _run_chunk(items, stages)
+    else:
+        chunks = [items[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = [r for part in pool.map(_run_chunk, chunks, [stages] * workers) for r in part]
+    wall = time.perf_counter() - started
+
+    stage_stats = {s: percentiles([r[s] for r in rows if s in r]) for s in stages}
+    stage_stats["total"] = percentiles([sum(r.get(s, 0.0) for s in stages) for r in rows])
+    recalls = [r["_labelRecall"] for r in rows if "_labelRecall" in r]
+    rss = peak_rss_mb()
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {"images": len(items), "workers": workers, "stages": list(stages), "skipped": skipped},
+        "stages": stage_stats,
+        "throughput": {
+            "imagesPerSecond": round(len(items) / wall, 3) if wall else None,
+            "imagesPerSecondPerCore": round(len(items) / wall / max(1, workers), 3) if wall else None,
+            "wallSeconds": round(wall, 3),
+        },
+        "peakRssMb": rss,
+        "labelRecall": round(sum(recalls) / len(recalls), 4) if recalls else None,
+    }
+
+
+def save_results(report: dict, out_dir: str, prefix: str = "ocr") -> Path:
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    stamp = report["timestamp"].replace(":", "").replace("-", "")[:15]
+    path = out / f"{prefix}-{report['commit']}-{stamp}.json"
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return path
+
+
+def compare_results(base: dict, head: dict, metrics: tuple[str, ...] = ("p50", "p95", "p99")) -> list[dict]:
+    """Per-stage deltas between two reports; positive deltaPct means head is slower."""
+    rows = []
+    for stage, stats in head.get("stages", {}).items():
+        before = base.get("stages", {}).get(stage, {})
+        for m in metrics:
+            if m in stats and m in before and before[m]:
+                rows.append({
+                    "stage": stage, "metric": m, "base": before[m], "head": stats[m],
+                    "deltaPct": round((stats[m] - before[m]) / before[m] * 100, 1),
+                })
+    return rows
+
+
+def format_report(report: dict, comparison: Optional[list[dict]] = None) -> str:
+    lines = [f"commit {report['commit']}  images={report['config']['images']}  workers={report['config']['workers']}"]
+    if report["config"].get("skipped"):
+        lines.append(f"  skipped     {', '.join(report['config']['skipped'])} (not comparable with runs that include it)")
+    for stage, s in report["stages"].items():
+        if s.get("count"):
+            lines.append(f"  {stage:<11} p50={s['p50']:>9.2f}ms  p95={s['p95']:>9.2f}ms  p99={s['p99']:>9.2f}ms")
+    t = report["throughput"]
+    lines.append(f"  throughput  {t['imagesPerSecond']} img/s  ({t['imagesPerSecondPerCore']} img/s/core)")
+    lines.append(f"  peak RSS    self={report['peakRssMb']['self']} MB  children={report['peakRssMb']['children']} MB")
+    if report.get("labelRecall") is not None:
+        lines.append(f"  labelRecall {report['labelRecall']}")
+    for row in comparison or []:
+        lines.append(f"  {row['stage']:<11} {row['metric']} {row['base']:.2f} -> {row['head']:.2f} ms ({row['deltaPct']:+.1f}%)")
+    return "\n".join(lines)
@@ -0,0 +1,216 @@
+"""Synthetic Italian receipt generator.
+
+Renders thermal-printer style receipts with PIL and returns them together with the
+ground truth in the same schema produced by /kie (store, datetime, currency, lines, totals).
+"""
+import glob
+import io
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+STORES = [
+    ("SUPERMERCATO ROSSI", "Coop"),
+    ("ESSELUNGA SPA", "Esselunga"),
+    ("CONAD CITY", "Conad"),
+    ("CARREFOUR EXPRESS", "Carrefour"),
+    ("PAM PANORAMA", "Pam"),
+    ("LIDL ITALIA SRL", "Lidl"),
+    ("FARMACIA CENTRALE", None),
+    ("PANIFICIO BIANCHI", None),
+]
+STREETS = ["Via Roma", "Viale Monza", "Corso Buenos Aires", "Piazza Garibaldi", "Via Dante", "Largo Augusto"]
+CITIES = [("20121", "MILANO"), ("00184", "ROMA"), ("10121", "TORINO"), ("40121", "BOLOGNA"), ("50122", "FIRENZE"), ("80133", "NAPOLI")]
+PRODUCTS = [
+    ("LATTE UHT PS 1L", 4), ("PASTA SPAGHETTI 500G", 4), ("PANE CASERECCIO", 4), ("MOZZARELLA FIOR DI LATTE", 4),
+    ("PROSCIUTTO COTTO", 10), ("PARMIGIANO REGGIANO", 4), ("OLIO EVO 1L", 4), ("PASSATA POMODORO", 4),
+    ("ACQUA NATURALE 6X1,5L", 22), ("BIRRA MORETTI 66CL", 22), ("VINO CHIANTI DOCG", 22), ("CAFFE MACINATO 250G", 22),
+    ("BISCOTTI FROLLINI", 10), ("YOGURT BIANCO X2", 4), ("UOVA FRESCHE X6", 10), ("DETERSIVO PIATTI", 22),
+    ("CARTA IGIENICA X4", 22), ("SHAMPOO 250ML", 22), ("TONNO ALL'OLIO 3X80G", 10), ("RISO CARNAROLI 1KG", 4),
+]
+WEIGHED = [("BANANE", 4), ("MELE GOLDEN", 4), ("POMODORI", 4), ("ZUCCHINE", 4), ("ARANCE TAROCCO", 4)]
+
+_FONT_GLOBS = [
+    "/usr/share/fonts/**/*Mono*.ttf",
+    "/usr/share/fonts/**/*Sans*.ttf",
+    "/usr/share/fonts/**/*Serif*.ttf",
+    "/Library/Fonts/*.ttf",
+    "C:/Windows/Fonts/cour*.ttf",
+    "C:/Windows/Fonts/consola*.ttf",
+]
+
+
+@dataclass
+class SynthConfig:
+    min_items: int = 3
+    max_items: int = 25
+    max_skew_deg: float = 4.0
+    max_blur: float = 1.2
+    noise_std: float = 8.0
+    width_px: int = 576  # 80 mm thermal paper at ~180 DPI
+    font_px: int = 22
+    background: bool = True
+
+
+def available_fonts() -> list[str]:
+    found: list[str] = []
+    for pattern in _FONT_GLOBS:
+        found.extend(sorted(glob.glob(pattern, recursive=True)))
+    return found
+
+
+def _load_font(rnd: random.Random, fonts: list[str], size: int):
+    if fonts:
+        try:
+            return ImageFont.truetype(rnd.choice(fonts), size)
+        except Exception:
+            pass
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def _money(v: float) -> str:
+    return f"{v:.2f}".replace(".", ",")
+
+
+def receipt_content(rnd: random.Random, cfg: SynthConfig) -> tuple[list[tuple[str, str]], dict]:
+    """Rows to render as (left, right) text pairs plus the ground truth dict; used by render_receipt and
+    the KIE benchmark, which scores the same receipts as text."""
+    store, chain = rnd.choice(STORES)
+    street = f"{rnd.choice(STREETS)} {rnd.randint(1, 180)}"
+    cap, city = rnd.choice(CITIES)
+    vat = "".join(str(rnd.randint(0, 9)) for _ in range(11))
+    when = datetime(2025, 1, 1, 8, 0) + timedelta(minutes=rnd.randint(0, 300 * 24 * 60))
+
+    rows: list[tuple[str, str]] = [(store, ""), (street, ""), (f"{cap} {city}", ""), (f"P.IVA {vat}", ""), ("", "")]
+    lines: list[dict] = []
+    for _ in range(rnd.randint(cfg.min_items, cfg.max_items)):
+        if rnd.random() < 0.15:
+            label, vat_rate = rnd.choice(WEIGHED)
+            weight = round(rnd.uniform(0.2, 2.5), 3)
+            per_kg = round(rnd.uniform(0.9, 4.5), 2)
+            total = round(weight * per_kg, 2)
+            rows.append((label, f"{_money(total)} {vat_rate}%"))
+            rows.append((f"  {weight:.3f} kg x {_money(per_kg)} EUR/kg".replace(".", ",", 1), ""))
+            lines.append({"labelRaw": label, "qty": weight, "unitPrice": per_kg, "lineTotal": total, "vatRate": vat_rate,
+                          "weightKg": weight, "pricePerKg": per_kg})
+            continue
+        label, vat_rate = rnd.choice(PRODUCTS)
+        unit = round(rnd.uniform(0.49, 12.9), 2)
+        qty = 1 if rnd.random() < 0.8 else rnd.randint(2, 6)
+        total = round(unit * qty, 2)
+        if qty > 1:
+            rows.append((f"{label} {qty} x {_money(unit)}", f"{_money(total)} {vat_rate}%"))
+        else:
+            rows.append((label, f"{_money(total)} {vat_rate}%"))
+        lines.append({"labelRaw": label, "qty": float(qty), "unitPrice": unit, "lineTotal": total, "vatRate": vat_rate})
+
+    subtotal = round(sum(l["lineTotal"] for l in lines), 2)
+    tax = round(sum(l["lineTotal"] * l["vatRate"] / (100 + l["vatRate"]) for l in lines), 2)
+    rows += [
+        ("", ""),
+        ("SUBTOTALE", _money(subtotal)),
+        ("di cui IVA", _money(tax)),
+        ("TOTALE EURO", _money(subtotal)),
+        ("PAGAMENTO CONTANTI", _money(subtotal)),
+        ("", ""),
+        (when.strftime("%d/%m/%Y %H:%M"), f"SCONTRINO N. {rnd.randint(1, 9999)}"),
+    ]
+    truth = {
+        "store": {"name": store, "address": street, "city": city.title(), "chain": chain, "postalCode": cap, "vatNumber": vat},
+        "datetime": when.isoformat(),
+        "currency": "EUR",
+        "lines": lines,
+        "totals": {"subtotal": subtotal, "tax": tax, "total": subtotal},
+        "text": [f"{l} {r}".strip() for l, r in rows if (l or r)],
+    }
+    return rows, truth
+
+
+def render_receipt(seed: int, cfg: Optional[SynthConfig] = None, fonts: Optional[list[str]] = None) -> tuple[Image.Image, dict]:
+    """Render one receipt; the same seed always yields the same image and ground truth."""
+    cfg = cfg or SynthConfig()
+    rnd = random.Random(seed)
+    fonts = available_fonts() if fonts is None else fonts
+    font = _load_font(rnd, fonts, cfg.font_px + rnd.randint(-3, 3))
+    rows, truth = receipt_content(rnd, cfg)
+
+    line_h = int(cfg.font_px * 1.45)
+    margin = 24
+    paper = Image.new("L", (cfg.width_px, margin * 2 + line_h * len(rows)), rnd.randint(235, 255))
+    draw = ImageDraw.Draw(paper)
+    ink = rnd.randint(0, 60)
+    for i, (left, right) in enumerate(rows):
+        y = margin + i * line_h
+        if left:
+            draw.text((margin, y), left, fill=ink, font=font)
+        if right:
+            w = draw.textlength(right, font=font)
+            draw.text((cfg.width_px - margin - w, y), right, fill=ink, font=font)
+
+    img = paper
+    if cfg.background:
+        pad = rnd.randint(30, 120)
+        bg = Image.new("L", (paper.width + 2 * pad, paper.height + 2 * pad), rnd.randint(40, 150))
+        bg.paste(paper, (pad + rnd.randint(-pad // 2, pad // 2), pad + rnd.randint(-pad // 2, pad // 2)))
+        img = bg
+    if cfg.max_skew_deg:
+        img = img.rotate(rnd.uniform(-cfg.max_skew_deg, cfg.max_skew_deg), resample=Image.Resampling.BICUBIC,
+                         expand=True, fillcolor=img.getpixel((0, 0)))
+    if cfg.max_blur:
+        img = img.filter(ImageFilter.GaussianBlur(rnd.uniform(0, cfg.max_blur)))
+    if cfg.noise_std:
+        import numpy as np
+
+        arr = np.asarray(img, dtype=np.float32)
+        arr = arr + np.random.default_rng(seed).normal(0, cfg.noise_std, arr.shape)
+        img = Image.fromarray(np.clip(arr, 0, 255).astype("uint8"))
+    return img.convert("RGB"), truth
+
+
+def encode(img: Image.Image, fmt: str = "JPEG") -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, quality=85)
+    return buf.getvalue()
+
+
+def write_corpus(out_dir: str, count: int, seed: int = 0, cfg: Optional[SynthConfig] = None) -> list[Path]:
+    """Write receipt_XXXX.jpg + receipt_XXXX.json pairs and return the image paths."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    fonts = available_fonts()
+    paths: list[Path] = []
+    for i in range(count):
+        img, truth = render_receipt(seed + i, cfg, fonts)
+        path = out / f"receipt_{i:04d}.jpg"
+        path.write_bytes(encode(img))
+        path.with_suffix(".json").write_text(json.dumps(truth, ensure_ascii=False, indent=2), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def load_corpus(corpus_dir: str) -> list[tuple[str, bytes, dict]]:
+    items = []
+    for path in sorted(Path(corpus_dir).glob("*.jpg")) + sorted(Path(corpus_dir).glob("*.png")):
+        truth_path = path.with_suffix(".json")
+        truth = json.loads(truth_path.read_text(encoding="utf-8")) if truth_path.exists() else {}
+        items.append((path.name, path.read_bytes(), truth))
+    return items
+
+
+def generate_corpus(count: int, seed: int = 0, cfg: Optional[SynthConfig] = None) -> list[tuple[str, bytes, dict]]:
+    """In-memory variant of write_corpus, in the same shape as load_corpus."""
+    fonts = available_fonts()
+    items = []
+    for i in range(count):
+        img, truth = render_receipt(seed + i, cfg, fonts)
+        items.append((f"receipt_{i:04d}.jpg", encode(img), truth))
+    return items
+
@@ -0,0 +1,161 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0, :] = np.sqrt(1.0 / n)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def normalized_thumbnail(img: Image.Image) -> Image.Image:
+    """Grayscale, EXIF-upright, contrast-stretched image cropped to the receipt content,
+    so that framing and exposure differences between two shots matter as little as possible."""
+    img = ImageOps.exif_transpose(img)
+    gray = ImageOps.grayscale(img)
+    gray.thumbnail((256, 256))
+    gray = ImageOps.autocontrast(gray, cutoff=1)
+    edges = gray.filter(ImageFilter.FIND_EDGES).point(lambda p: 255 if p > 48 else 0)
+    bbox = edges.getbbox()
+    if bbox:
+        x1, y1, x2, y2 = bbox
+        if (x2 - x1) * (y2 - y1) >= 0.1 * gray.width * gray.height:
+            gray = gray.crop(bbox)
+    return gray
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for b in bits.ravel():
+        value = (value << 1) | int(b)
+    return value
+
+
+def dhash(thumb: Image.Image) -> int:
+    arr = np.asarray(thumb.resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    return _bits_to_int(arr[:, 1:] > arr[:, :-1])
+
+
+def phash(thumb: Image.Image) -> int:
+    arr = np.asarray(thumb.resize((32, 32), Image.Resampling.LANCZOS), dtype=np.float64)
+    low = (_DCT32 @ arr @ _DCT32.T)[:8, :8]
+    # Median without the DC term, which only reflects overall brightness
+    med = np.median(low.ravel()[1:])
+    return _bits_to_int(low > med)
+
+
+def compute_hashes(image_bytes: bytes) -> Tuple[int, int]:
+    """Return (pHash, dHash) as 64-bit integers for an encoded image."""
+    with Image.open(io.BytesIO(image_bytes)) as raw:
+        thumb = normalized_thumbnail(raw)
+    return phash(thumb), dhash(thumb)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+@dataclass
+class DuplicateMatch:
+    id: str
+    distance: int
+    result: Optional[Any] = None
+
+
+@dataclass
+class _Entry:
+    phash: int
+    dhash: int
+    created: float
+    result: Optional[Any] = None
+    keys: list = field(default_factory=list)
+
+
+class PerceptualIndex:
+    """Bounded, thread-safe multi-index hash over the pHash of recent receipts.
+
+    The 64-bit pHash is split into max_distance + 1 chunks, each with its own exact-match table:
+    by the pigeonhole principle any hash within max_distance bits shares at least one chunk, so a
+    query only verifies the few entries in its own buckets. dHash is checked as a second opinion.
+    """
+
+    def __init__(self, capacity: int = 5000, max_distance: int = 10, max_dhash_distance: int = 16, ttl_seconds: float = 7 * 24 * 3600):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.max_dhash_distance = max_dhash_distance
+        self.ttl_seconds = ttl_seconds
+        chunks = max_distance + 1
+        size = 64 // chunks
+        # (shift, mask) per chunk; the last chunk absorbs the remainder bits
+        self._chunks = []
+        for c in range(chunks):
+            width = size if c < chunks - 1 else 64 - size * (chunks - 1)
+            self._chunks.append((size * c, (1 << width) - 1))
+        self._tables: list[dict[int, set[str]]] = [{} for _ in self._chunks]
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, h: int) -> list:
+        return [(h >> shift) & mask for shift, mask in self._chunks]
+
+    def _remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for table, key in zip(self._tables, entry.keys):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[key]
+
+    def add(self, entry_id: str, hashes: Tuple[int, int], result: Optional[Any] = None):
+        p, d = hashes
+        with self._lock:
+            self._remove(entry_id)
+            keys = self._keys(p)
+            self._entries[entry_id] = _Entry(phash=p, dhash=d, created=time.time(), result=result, keys=keys)
+            for table, key in zip(self._tables, keys):
+                table.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def query(self, hashes: Tuple[int, int]) -> Optional[DuplicateMatch]:
+        p, d = hashes
+        now = time.time()
+        best: Optional[DuplicateMatch] = None
+        with self._lock:
+            seen: set[str] = set()
+            expired: list[str] = []
+            for table, key in zip(self._tables, self._keys(p)):
+                for entry_id in table.get(key, ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    entry = self._entries[entry_id]
+                    if now - entry.created > self.ttl_seconds:
+                        expired.append(entry_id)
+                        continue
+                    dist = hamming(p, entry.phash)
+                    if dist > self.max_distance or hamming(d, entry.dhash) > self.max_dhash_distance:
+                        continue
+                    if best is None or dist < best.distance:
+                        best = DuplicateMatch(id=entry_id, distance=dist, result=entry.result)
+            for entry_id in expired:
+                self._remove(entry_id)
+        return best
@@ -1,20 +1,29 @@
 ﻿import os
 import sys
+import json
 import base64
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, UploadFile, File, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional, Tuple
 
 # Add shared module to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from shared.redis_logger import RedisLogger, LogSeverity
+from shared.normalize import normalize_label
 
 app = FastAPI()
 
 OCR_STUB_ENABLED = os.getenv("OCR_STUB", "false").lower() == "true"
 temp_stub_text = os.getenv("OCR_STUB_TEXT")
 OCR_STUB_TEXT = temp_stub_text if temp_stub_text is not None else "mock-ocr"
+# Target height (px, after preprocessing) of the strips recognized one at a time by /extract/stream
+OCR_STREAM_STRIP_PX = int(os.getenv("OCR_STREAM_STRIP_PX", "400"))
+# Accepted ?dpi= range for PDF rasterization; anything else is rejected with 422 (a 600 DPI A4 page is ~35 MP)
+PDF_DPI_MIN, PDF_DPI_MAX = 72, 600
 
 # Initialize Redis logger
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
@@ -86,6 +95,9 @@ class KieEngine:
             self.detail = "No KIE model configured; using stub"
 
     def infer_image(self, image_bytes: bytes) -> dict:
+        if pdf_input.is_pdf(image_bytes):
+            # One merged parse over all pages of the document
+            return parse_text_with_lines(pdf_lines(image_bytes))
         # Prefer structured parsing with line boxes
         try:
             lines = ocr_lines(image_bytes)
@@ -103,7 +115,12 @@ def health():
     return {"status": "ok"}
 
 @app.post("/extract")
-async def extract(file: UploadFile = File(...)):
+async def extract(
+    file: UploadFile = File(...),
+    dpi: Optional[int] = Query(None, ge=PDF_DPI_MIN, le=PDF_DPI_MAX),
+    receiptId: Optional[str] = None,
+    reuse: bool = False,
+):
     try:
         await logger.info("OCR Request", f"Received OCR extraction request, file: {file.filename}", {"fileSize": file.size})
 
@@ -115,22 +132,81 @@ async def extract(file: UploadFile = File(...)):
             await logger.warning("Empty Image", "Received empty image data")
             return JSONResponse({"text": ""})
 
-        await logger.info("Preprocessing Image", f"Preprocessing image for OCR, size: {len(data)} bytes")
-        text_value = ocr_text(data)
+        extra: dict = {}
+        # Decoding and hashing the image is CPU work: off the event loop, like the OCR itself
+        hashes, match = await run_in_threadpool(dedup_lookup, data)
+        if match is not None:
+            extra["duplicateOf"] = {"id": match.id, "distance": match.distance}
+            await logger.info("Duplicate Receipt", f"Image is a likely duplicate of {match.id}", {"duplicateOf": match.id, "distance": match.distance, "reuse": reuse})
+            if reuse and match.result is not None:
+                return JSONResponse({**match.result, **extra, "reused": True})
+
+        if pdf_input.is_pdf(data):
+            await logger.info("PDF Input", f"Processing PDF document, size: {len(data)} bytes", {"dpi": dpi or pdf_input.PDF_DPI})
+            text_value, pages, page_count = await run_in_threadpool(pdf_text, data, dpi)
+            extra.update(pages=pages, pageCount=page_count, truncated=page_count > len(pages))
+            await logger.info("PDF Pages", f"Processed {len(pages)} pages, {sum(1 for p in pages if p['source'] == 'ocr')} via OCR", {"pageCount": len(pages)})
+            if extra["truncated"]:
+                await logger.warning("PDF Truncated", f"Only the first {len(pages)} of {page_count} pages were read (OCR_PDF_MAX_PAGES)", {"pageCount": page_count})
+        else:
+            await logger.info("Preprocessing Image", f"Preprocessing image for OCR, size: {len(data)} bytes")
+            text_value = await run_in_threadpool(ocr_text, data)
 
         if not text_value.strip():
             await logger.warning("No Text Extracted", "OCR returned empty text")
             if OCR_STUB_TEXT:
-                return JSONResponse({"text": OCR_STUB_TEXT})
-            return JSONResponse({"text": ""})
+                return JSONResponse({"text": OCR_STUB_TEXT, **extra})
+            return JSONResponse({"text": "", **extra})
 
         await logger.info("OCR Complete", f"Text extracted successfully, length: {len(text_value)} chars", {"textLength": len(text_value)})
-        return JSONResponse({"text": text_value})
+        if hashes is not None:
+            DEDUP_INDEX.add(receiptId or hashlib.sha1(data).hexdigest(), hashes, {"text": text_value})
+        return JSONResponse({"text": text_value, **extra})
     except Exception as e:
         await logger.error("OCR Error", f"Error during OCR extraction: {str(e)}", e)
         raise
 
 
+@app.post("/extract/stream")
+async def extract_stream(
+    file: UploadFile = File(...),
+    dpi: Optional[int] = Query(None, ge=PDF_DPI_MIN, le=PDF_DPI_MAX),
+    receiptId: Optional[str] = None,
+    reuse: bool = False,
+):
+    """NDJSON variant of /extract: one event per line as stages complete, ending with the KIE parse.
+    Likely duplicates are flagged first with a duplicate event; with reuse, the stored text is parsed instead."""
+    await logger.info("OCR Stream Request", f"Received streaming OCR request, file: {file.filename}", {"fileSize": file.size})
+    data = await file.read()
+
+    async def _ndjson():
+        if not data:
+            await logger.warning("Empty Image", "Received empty image data")
+            yield json.dumps({"event": "error", "stage": "input", "message": "empty image"}) + "\n"
+            return
+        hashes, match = await run_in_threadpool(dedup_lookup, data)
+        if match is not None:
+            await logger.info("Duplicate Receipt", f"Image is a likely duplicate of {match.id}", {"duplicateOf": match.id, "distance": match.distance, "reuse": reuse})
+            yield json.dumps({"event": "duplicate", "duplicateOf": {"id": match.id, "distance": match.distance}}) + "\n"
+            if reuse and match.result is not None:
+                result = await run_in_threadpool(parse_text, match.result["text"])
+                yield json.dumps({"event": "kie", "result": result, "reused": True}, ensure_ascii=False) + "\n"
+                yield json.dumps({"event": "done", "lineCount": 0, "reused": True}) + "\n"
+                return
+        texts: list[str] = []
+        async for event in iterate_in_threadpool(iter_extract_events(data, dpi)):
+            if event["event"] == "line":
+                texts.append(event["text"])
+            elif event["event"] == "error":
+                await logger.error("OCR Stream Error", f"Error during {event['stage']}: {event['message']}")
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+        if hashes is not None and texts:
+            DEDUP_INDEX.add(receiptId or hashlib.sha1(data).hexdigest(), hashes, {"text": "\n".join(texts)})
+        await logger.info("OCR Stream Complete", f"Streamed {len(texts)} lines", {"lineCount": len(texts)})
+
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+
 class KieRequest(BaseModel):
     text: str
     # Opzionale: immagine codificata base64 per usare un KIE reale se configurato
@@ -146,6 +222,9 @@ class KieStore(BaseModel):
 
 class KieLine(BaseModel):
     labelRaw: str
+    # Canonical form shared with the ML service (services/shared/normalize.py): casefolded, OCR
+    # confusions and units fixed; use it to match labels, keep labelRaw for display
+    labelNormalized: Optional[str] = None
     qty: float
     unitPrice: float
     lineTotal: float
@@ -216,11 +295,37 @@ def kie_status():
 
 import io
 import re
+import time
 from datetime import datetime, timezone
 from dateutil import parser as dateparser
 from PIL import Image, ImageOps, ImageFilter, ImageEnhance
 import pytesseract
 from .preprocessing import preprocess_image
+from . import pdf as pdf_input
+from .dedupe import PerceptualIndex, compute_hashes
+
+# Perceptual-hash index of recently OCR'd images, used to flag (and optionally reuse) re-photographed receipts
+OCR_DEDUP_ENABLED = os.getenv("OCR_DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_INDEX = PerceptualIndex(
+    capacity=int(os.getenv("OCR_DEDUP_CAPACITY", "5000")),
+    max_distance=int(os.getenv("OCR_DEDUP_MAX_DISTANCE", "10")),
+    ttl_seconds=float(os.getenv("OCR_DEDUP_TTL_SECONDS", str(7 * 24 * 3600))),
+)
+
+
+def dedup_lookup(data: bytes):
+    """(hashes, closest earlier match) of an image; (None, None) for PDFs, in stub mode, with dedup disabled or undecodable input."""
+    if not OCR_DEDUP_ENABLED or (OCR_STUB_ENABLED and OCR_STUB_TEXT) or pdf_input.is_pdf(data):
+        return None, None
+    try:
+        hashes = compute_hashes(data)
+    except Exception:
+        return None, None
+    return hashes, DEDUP_INDEX.query(hashes)
+
+
+# OCR of image-only PDF pages runs in threads (Tesseract is a subprocess); rasterization uses pdf_input's process pool
+_PDF_OCR_POOL = ThreadPoolExecutor(max_workers=max(1, pdf_input.PDF_WORKERS), thread_name_prefix="pdf-ocr")
 
 
 def _get_tesseract_params() -> tuple[str, str]:
@@ -282,11 +387,8 @@ def ocr_text(image_bytes: bytes) -> str:
     except Exception:
         return ""
 
-def ocr_lines(image_bytes: bytes) -> list[dict]:
-    from pytesseract import Output
-    img = preprocess_image(image_bytes)
-    lang, tess_cfg = _get_tesseract_params()
-    data = pytesseract.image_to_data(img, output_type=Output.DICT, config=tess_cfg, lang=lang)
+def _group_lines(data: dict, dy: int = 0) -> list[dict]:
+    # Group Tesseract words by (block, par, line); dy shifts boxes of a cropped strip back to page coordinates
     n = len(data['text'])
     groups = {}
     order = []
@@ -315,10 +417,153 @@ def ocr_lines(image_bytes: bytes) -> list[dict]:
         if not text:
             continue
         x1, y1, x2, y2 = g['x1'], g['y1'], g['x2'], g['y2']
-        lines.append({'text': text, 'bbox': {'x': int(x1), 'y': int(y1), 'w': int(x2 - x1), 'h': int(y2 - y1)}})
+        lines.append({'text': text, 'bbox': {'x': int(x1), 'y': int(y1 + dy), 'w': int(x2 - x1), 'h': int(y2 - y1)}})
+    return lines
+
+
+def ocr_lines(image_bytes: bytes) -> list[dict]:
+    from pytesseract import Output
+    img = preprocess_image(image_bytes)
+    lang, tess_cfg = _get_tesseract_params()
+    data = pytesseract.image_to_data(img, output_type=Output.DICT, config=tess_cfg, lang=lang)
+    return _group_lines(data)
+
+
+def _strip_bounds(img: Image.Image, target_px: int) -> list[tuple[int, int]]:
+    """Split a page into horizontal strips of roughly target_px, cutting only on blank rows
+    so that no text line is sliced in half. Falls back to a single strip without numpy."""
+    height = img.height
+    if target_px <= 0 or height <= target_px:
+        return [(0, height)]
+    try:
+        import numpy as np  # type: ignore
+
+        arr = np.asarray(img.convert("L"))
+        ink = (arr < 128).sum(axis=1)
+        blank = ink <= max(1, int(arr.shape[1] * 0.002))
+    except Exception:
+        return [(0, height)]
+    bounds: list[tuple[int, int]] = []
+    start = 0
+    y = start + target_px
+    while y < height:
+        if not blank[y]:
+            y += 1
+            continue
+        # Cut in the middle of the blank run to keep some margin on both strips
+        end = y
+        while end < height and blank[end]:
+            end += 1
+        cut = (y + end) // 2
+        bounds.append((start, cut))
+        start = cut
+        y = start + target_px
+    if start < height:
+        bounds.append((start, height))
+    return bounds
+
+
+def iter_ocr_lines(img: Image.Image, strip_px: Optional[int] = None):
+    """Recognize a preprocessed page strip by strip, yielding line dicts as soon as each strip is done."""
+    from pytesseract import Output
+    lang, tess_cfg = _get_tesseract_params()
+    strip_px = OCR_STREAM_STRIP_PX if strip_px is None else strip_px
+    for top, bottom in _strip_bounds(img, strip_px):
+        strip = img.crop((0, top, img.width, bottom))
+        data = pytesseract.image_to_data(strip, output_type=Output.DICT, config=tess_cfg, lang=lang)
+        for line in _group_lines(data, dy=top):
+            yield line
+
+
+def _ocr_pdf_page(data: bytes, index: int, dpi: Optional[int]) -> list[dict]:
+    png = pdf_input.render_page(data, index, dpi)
+    return [dict(line, page=index + 1) for line in ocr_lines(png)]
+
+
+def iter_pdf_pages(data: bytes, texts: list[str], dpi: Optional[int] = None):
+    """Yield (page_number, source, lines) in page order for the text layers of data (as returned by
+    pdf_input.text_layers). Pages with an embedded text layer are read directly; image-only pages
+    are rasterized and OCR'd in parallel as soon as the document is opened."""
+    pending = {
+        i: _PDF_OCR_POOL.submit(_ocr_pdf_page, data, i, dpi)
+        for i, t in enumerate(texts)
+        if not pdf_input.has_text_layer(t)
+    }
+    for i, t in enumerate(texts):
+        if i in pending:
+            yield i + 1, "ocr", pending[i].result()
+        else:
+            lines = [{"text": clean_line(l), "bbox": None, "page": i + 1} for l in t.splitlines() if clean_line(l)]
+            yield i + 1, "text", lines
+
+
+def pdf_lines(data: bytes, dpi: Optional[int] = None) -> list[dict]:
+    lines: list[dict] = []
+    for _, _, page_lines in iter_pdf_pages(data, pdf_input.text_layers(data)[0], dpi):
+        lines.extend(page_lines)
     return lines
 
 
+def pdf_text(data: bytes, dpi: Optional[int] = None) -> tuple[str, list[dict], int]:
+    """(text, per-page summaries, page count of the document); pages past OCR_PDF_MAX_PAGES are not read."""
+    layers, page_count = pdf_input.text_layers(data)
+    texts: list[str] = []
+    pages: list[dict] = []
+    for page, source, page_lines in iter_pdf_pages(data, layers, dpi):
+        texts.extend(l["text"] for l in page_lines)
+        pages.append({"page": page, "source": source, "lineCount": len(page_lines)})
+    return "\n".join(texts), pages, page_count
+
+
+def iter_extract_events(image_bytes: bytes, dpi: Optional[int] = None):
+    """Run the OCR pipeline as a sequence of NDJSON-ready events:
+    preprocessed -> line (one per recognized row) -> kie -> done.
+    PDF documents emit a page event per page instead of preprocessed."""
+    started = time.perf_counter()
+    if OCR_STUB_ENABLED and OCR_STUB_TEXT:
+        yield {"event": "line", "index": 0, "text": OCR_STUB_TEXT, "bbox": None}
+        yield {"event": "kie", "result": parse_text(OCR_STUB_TEXT)}
+        yield {"event": "done", "lineCount": 1, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        return
+    if pdf_input.is_pdf(image_bytes):
+        lines: list[dict] = []
+        try:
+            layers, page_count = pdf_input.text_layers(image_bytes)
+            for page, source, page_lines in iter_pdf_pages(image_bytes, layers, dpi):
+                yield {"event": "page", "page": page, "source": source, "lineCount": len(page_lines)}
+                for line in page_lines:
+                    yield {"event": "line", "index": len(lines), "page": page, "text": line["text"], "bbox": line["bbox"]}
+                    lines.append(line)
+        except Exception as e:
+            yield {"event": "error", "stage": "pdf", "message": str(e)}
+            return
+        yield {"event": "kie", "result": parse_text_with_lines(lines)}
+        yield {"event": "done", "lineCount": len(lines), "pageCount": page_count, "truncated": page_count > len(layers),
+               "ms": round((time.perf_counter() - started) * 1000, 1)}
+        return
+    try:
+        img = preprocess_image(image_bytes)
+    except Exception as e:
+        yield {"event": "error", "stage": "preprocess", "message": str(e)}
+        return
+    yield {
+        "event": "preprocessed",
+        "width": img.width,
+        "height": img.height,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    lines: list[dict] = []
+    try:
+        for line in iter_ocr_lines(img):
+            yield {"event": "line", "index": len(lines), "text": line["text"], "bbox": line["bbox"]}
+            lines.append(line)
+    except Exception as e:
+        yield {"event": "error", "stage": "ocr", "message": str(e)}
+        return
+    yield {"event": "kie", "result": parse_text_with_lines(lines)}
+    yield {"event": "done", "lineCount": len(lines), "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
 def parse_text(text: str) -> dict:
     lines = [clean_line(l) for l in text.splitlines()]
     lines = [l for l in lines if l]
@@ -338,6 +583,7 @@ def parse_text(text: str) -> dict:
         "lines": [
             {
                 "labelRaw": it["label"],
+                "labelNormalized": normalize_label(it["label"]),
                 "qty": float(it["qty"]),
                 "unitPrice": float(it["unit"]),
                 "lineTotal": float(it["total"]),
@@ -369,7 +615,7 @@ def parse_text_with_lines(lines_with_boxes: list[dict]) -> dict:
     totals = infer_totals(lines, items)
 
     # Map line index -> bbox
-    idx_to_bbox = {idx: lb['bbox'] for idx, lb in enumerate(lines_with_boxes) if (clean_line(lb['text']) or None)}
+    idx_to_bbox = {idx: lb.get('bbox') or {} for idx, lb in enumerate(lines_with_boxes) if (clean_line(lb['text']) or None)}
     # Try find store line index
     try:
         store_idx = lines.index(store_name) if store_name else 0
@@ -388,6 +634,7 @@ def parse_text_with_lines(lines_with_boxes: list[dict]) -> dict:
         "lines": [
             {
                 "labelRaw": it["label"],
+                "labelNormalized": normalize_label(it["label"]),
                 "qty": float(it["qty"]),
                 "unitPrice": float(it["unit"]),
                 "lineTotal": float(it["total"]),
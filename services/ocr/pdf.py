@@ -0,0 +1,81 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# Rasterization resolution for image-only pages (Tesseract works best around 200-300 DPI)
+PDF_DPI = int(os.getenv("OCR_PDF_DPI", "200"))
+# Worker processes used to rasterize pages; <= 1 renders inline in the calling thread
+PDF_WORKERS = int(os.getenv("OCR_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Pages read from a document; later pages are skipped and the response reports truncated: true
+PDF_MAX_PAGES = int(os.getenv("OCR_PDF_MAX_PAGES", "50"))
+# A page whose text layer has fewer characters than this is treated as image-only and OCR'd
+PDF_MIN_TEXT_CHARS = int(os.getenv("OCR_PDF_MIN_TEXT_CHARS", "16"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+# pdfium is not thread-safe: every call into it from this process (text layers, inline renders)
+# holds this lock, while the worker processes of the pool each have their own library instance
+_pdfium_lock = threading.Lock()
+
+
+def is_pdf(data: bytes) -> bool:
+    return data[:1024].lstrip().startswith(b"%PDF")
+
+
+def text_layers(data: bytes) -> tuple[list[str], int]:
+    """Return the embedded text of the first PDF_MAX_PAGES pages (empty string for image-only
+    pages) and the page count of the whole document."""
+    import pypdfium2 as pdfium  # type: ignore
+
+    with _pdfium_lock:
+        doc = pdfium.PdfDocument(data)
+        try:
+            out: list[str] = []
+            for index in range(min(len(doc), PDF_MAX_PAGES)):
+                page = doc[index]
+                textpage = page.get_textpage()
+                out.append(textpage.get_text_range() or "")
+                textpage.close()
+                page.close()
+            return out, len(doc)
+        finally:
+            doc.close()
+
+
+def has_text_layer(text: str) -> bool:
+    return len("".join(text.split())) >= PDF_MIN_TEXT_CHARS
+
+
+def _render_page(data: bytes, index: int, dpi: int) -> bytes:
+    # Runs in a worker process, which opens its own document, or inline under _pdfium_lock
+    import pypdfium2 as pdfium  # type: ignore
+
+    doc = pdfium.PdfDocument(data)
+    try:
+        page = doc[index]
+        img = page.render(scale=dpi / 72.0, grayscale=True).to_pil()
+        page.close()
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+    finally:
+        doc.close()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        import multiprocessing
+
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def render_page(data: bytes, index: int, dpi: Optional[int] = None) -> bytes:
+    """Rasterize one page to PNG bytes, in the shared process pool when enabled."""
+    dpi = dpi or PDF_DPI
+    if PDF_WORKERS <= 1:
+        with _pdfium_lock:
+            return _render_page(data, index, dpi)
+    return _get_pool().submit(_render_page, data, index, dpi).result()
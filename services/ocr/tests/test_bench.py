@@ -0,0 +1,48 @@
+from services.ocr.bench import compare_results, generate_corpus, render_receipt, run_benchmark, save_results
+
+
+def test_synthetic_receipt_is_deterministic_with_ground_truth():
+    img1, truth1 = render_receipt(7)
+    img2, truth2 = render_receipt(7)
+    assert img1.tobytes() == img2.tobytes()
+    assert truth1 == truth2
+    assert truth1["lines"] and truth1["totals"]["total"] == round(sum(l["lineTotal"] for l in truth1["lines"]), 2)
+
+
+def test_run_benchmark_reports_stage_percentiles(tmp_path):
+    items = generate_corpus(2, seed=3)
+    report = run_benchmark(items, stages=("preprocess", "kie"), warmup=0)
+    assert report["config"]["images"] == 2
+    for stage in ("preprocess", "kie", "total"):
+        assert report["stages"][stage]["count"] == 2
+        assert report["stages"][stage]["p50"] <= report["stages"][stage]["p99"]
+    assert report["throughput"]["imagesPerSecondPerCore"] > 0
+
+    path = save_results(report, str(tmp_path))
+    assert path.exists()
+    deltas = compare_results(report, report)
+    assert deltas and all(d["deltaPct"] == 0 for d in deltas)
+
+
+def test_run_benchmark_records_skipped_ocr_stage(monkeypatch, capsys):
+    import services.ocr.bench.run as benchrun
+
+    monkeypatch.setattr(benchrun, "tesseract_available", lambda: False)
+    report = run_benchmark(generate_corpus(1, seed=3), warmup=0)
+    assert report["config"]["stages"] == ["preprocess", "kie"] and report["config"]["skipped"] == ["ocr"]
+    assert "skipping the ocr stage" in capsys.readouterr().err
+    assert "skipped     ocr" in benchrun.format_report(report)
+
+
+def test_kie_benchmark_scores_corpus_and_applies_thresholds():
+    from services.ocr.bench import check_thresholds, load_cases, run_kie_benchmark, synthetic_cases
+
+    cases = load_cases()
+    assert any(c["name"] == "sample_receipt" for c in cases)
+    report = run_kie_benchmark(cases + synthetic_cases(5), repeat=1)
+    assert report["throughput"]["receiptsPerSecond"] > 0
+    assert "infer_items" in report["functions"]
+    assert report["accuracy"]["fields"]["store.name"]["accuracy"] == 1.0
+    assert 0 < report["accuracy"]["overall"] <= 1
+    assert check_thresholds(report, min_accuracy=0.0) == []
+    assert check_thresholds(report, min_throughput=1e12)
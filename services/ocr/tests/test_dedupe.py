@@ -0,0 +1,92 @@
+import io
+import json
+import random
+
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+
+import services.ocr.main as ocrmod
+from services.ocr.dedupe import PerceptualIndex, compute_hashes, hamming
+
+
+def _photo(seed: int, angle: float = 0.0) -> bytes:
+    rnd = random.Random(seed)
+    table = Image.new("RGB", (700, 1000), (90, 80, 70))
+    paper = Image.new("RGB", (400, 900), "white")
+    draw = ImageDraw.Draw(paper)
+    for i in range(30):
+        draw.rectangle((20, 30 + i * 28, 20 + rnd.randint(100, 350), 42 + i * 28), fill="black")
+    table.paste(paper, (150, 50))
+    table = table.rotate(angle, fillcolor=(90, 80, 70))
+    buf = io.BytesIO()
+    table.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+
+def test_phash_tolerates_small_rotation_but_separates_receipts():
+    base = compute_hashes(_photo(1))
+    assert hamming(base[0], compute_hashes(_photo(1, angle=2))[0]) <= 10
+    assert hamming(base[0], compute_hashes(_photo(2))[0]) > 10
+
+
+def test_index_query_and_eviction():
+    index = PerceptualIndex(capacity=2, max_distance=4)
+    index.add("a", (0b1111, 0), {"text": "A"})
+    index.add("b", (0xFFFF << 40, 0), {"text": "B"})
+    match = index.query((0b0111, 0))
+    assert match is not None and match.id == "a" and match.distance == 1
+    assert index.query((0xFFFFFF, 0)) is None
+    index.add("c", (0xF0F0, 0))
+    assert len(index) == 2
+    assert index.query((0b1111, 0)) is None
+
+
+def test_extract_flags_and_reuses_duplicate(monkeypatch):
+    calls = []
+
+    def fake_ocr_text(data):
+        calls.append(len(data))
+        return "LATTE 1,29"
+
+    monkeypatch.setattr(ocrmod, "ocr_text", fake_ocr_text)
+    monkeypatch.setattr(ocrmod, "DEDUP_INDEX", PerceptualIndex())
+    client = TestClient(ocrmod.app)
+
+    r = client.post("/extract?receiptId=r1", files={"file": ("a.jpg", _photo(1), "image/jpeg")})
+    assert r.json() == {"text": "LATTE 1,29"}
+
+    r = client.post("/extract", files={"file": ("b.jpg", _photo(1, angle=2), "image/jpeg")})
+    assert r.json()["duplicateOf"]["id"] == "r1"
+    assert len(calls) == 2
+
+    r = client.post("/extract?reuse=true", files={"file": ("c.jpg", _photo(1, angle=-2), "image/jpeg")})
+    body = r.json()
+    assert body["reused"] is True and body["text"] == "LATTE 1,29"
+    assert len(calls) == 2
+
+
+def test_extract_stream_flags_and_reuses_duplicate(monkeypatch):
+    calls = []
+
+    def fake_image_to_data(img, output_type=None, config=None, lang=None):
+        calls.append(img.size)
+        return {
+            "text": ["LATTE 1,29"], "block_num": [1], "par_num": [1], "line_num": [1],
+            "left": [10], "top": [5], "width": [200], "height": [30],
+        }
+
+    monkeypatch.setattr(ocrmod.pytesseract, "image_to_data", fake_image_to_data)
+    monkeypatch.setattr(ocrmod, "OCR_STUB_ENABLED", False)
+    monkeypatch.setattr(ocrmod, "DEDUP_INDEX", PerceptualIndex())
+    client = TestClient(ocrmod.app)
+
+    r = client.post("/extract/stream?receiptId=r1", files={"file": ("a.jpg", _photo(1), "image/jpeg")})
+    events = [json.loads(l) for l in r.text.splitlines()]
+    assert "duplicate" not in [e["event"] for e in events]
+    ocr_calls = len(calls)
+
+    r = client.post("/extract/stream?reuse=true", files={"file": ("b.jpg", _photo(1, angle=2), "image/jpeg")})
+    events = [json.loads(l) for l in r.text.splitlines()]
+    assert events[0]["event"] == "duplicate" and events[0]["duplicateOf"]["id"] == "r1"
+    assert events[1]["event"] == "kie" and events[1]["reused"]
+    assert len(calls) == ocr_calls
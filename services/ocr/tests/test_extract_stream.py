@@ -0,0 +1,50 @@
+import io
+import json
+
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+
+import services.ocr.main as ocrmod
+
+
+def _two_block_image() -> bytes:
+    img = Image.new("RGB", (800, 1200), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((50, 100, 700, 140), fill="black")
+    draw.rectangle((50, 900, 700, 940), fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_extract_stream_emits_lines_per_strip(monkeypatch):
+    calls = []
+
+    def fake_image_to_data(img, output_type=None, config=None, lang=None):
+        calls.append(img.size)
+        label = "LATTE 1,29" if len(calls) == 1 else "PANE 2,10"
+        return {
+            "text": [label], "block_num": [1], "par_num": [1], "line_num": [1],
+            "left": [10], "top": [5], "width": [200], "height": [30],
+        }
+
+    monkeypatch.setattr(ocrmod.pytesseract, "image_to_data", fake_image_to_data)
+    monkeypatch.setattr(ocrmod, "OCR_STUB_ENABLED", False)
+    monkeypatch.setattr(ocrmod, "OCR_STREAM_STRIP_PX", 300)
+
+    client = TestClient(ocrmod.app)
+    files = {"file": ("r.png", _two_block_image(), "image/png")}
+    r = client.post("/extract/stream", files=files)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+
+    events = [json.loads(l) for l in r.text.splitlines() if l.strip()]
+    kinds = [e["event"] for e in events]
+    assert kinds[0] == "preprocessed"
+    assert kinds[-2:] == ["kie", "done"]
+    lines = [e for e in events if e["event"] == "line"]
+    assert len(calls) >= 2
+    assert [l["text"] for l in lines][:2] == ["LATTE 1,29", "PANE 2,10"]
+    # Second strip boxes are shifted back to page coordinates
+    assert lines[1]["bbox"]["y"] > lines[0]["bbox"]["y"]
+    assert [l["labelRaw"] for l in events[-2]["result"]["lines"]][:2] == ["LATTE", "PANE"]
@@ -0,0 +1,7 @@
+from services.ocr.main import parse_text
+
+
+def test_kie_lines_carry_the_shared_normalized_label():
+    parsed = parse_text("SUPERMERCATO ROSSI\nLATTE P.S. 1 L 1,29\nC0OP BISCOTTI 2,10\nTOTALE 3,39")
+    assert [(l["labelRaw"], l["labelNormalized"]) for l in parsed["lines"]] == [
+        ("LATTE P.S. 1 L", "latte ps 1l"), ("C0OP BISCOTTI", "coop biscotti")]
@@ -0,0 +1,114 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import services.ocr.main as ocrmod
+
+pytest.importorskip("pypdfium2")
+
+
+def _text_pdf(lines: list[str]) -> bytes:
+    # Minimal single-page PDF with a Helvetica text layer
+    content = "BT /F1 12 Tf 14 TL 40 780 Td " + " ".join(f"({l}) Tj T*" for l in lines) + " ET"
+    objs = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, o in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{o}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def _image_pdf(pages: int) -> bytes:
+    imgs = [Image.new("RGB", (300, 400), "white") for _ in range(pages)]
+    buf = io.BytesIO()
+    imgs[0].save(buf, format="PDF", save_all=True, append_images=imgs[1:])
+    return buf.getvalue()
+
+
+def test_pdf_text_layer_skips_ocr(monkeypatch):
+    def no_ocr(*args, **kwargs):
+        raise AssertionError("text-layer pages must not be OCR'd")
+
+    monkeypatch.setattr(ocrmod.pytesseract, "image_to_data", no_ocr)
+    client = TestClient(ocrmod.app)
+    data = _text_pdf(["SUPERMERCATO ROSSI", "LATTE UHT 1L 1,29", "TOTALE 1,29"])
+    r = client.post("/extract", files={"file": ("r.pdf", data, "application/pdf")})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["text"].splitlines() == ["SUPERMERCATO ROSSI", "LATTE UHT 1L 1,29", "TOTALE 1,29"]
+    assert body["pages"] == [{"page": 1, "source": "text", "lineCount": 3}]
+    assert body["pageCount"] == 1 and body["truncated"] is False
+
+
+def test_pdf_image_pages_are_ocrd_and_merged(monkeypatch):
+    calls = []
+
+    def fake_image_to_data(img, output_type=None, config=None, lang=None):
+        calls.append(img.size)
+        label = "LATTE 1,29" if len(calls) == 1 else "PANE 2,10"
+        return {
+            "text": [label], "block_num": [1], "par_num": [1], "line_num": [1],
+            "left": [10], "top": [5], "width": [200], "height": [30],
+        }
+
+    monkeypatch.setattr(ocrmod.pytesseract, "image_to_data", fake_image_to_data)
+    monkeypatch.setattr(ocrmod.pdf_input, "PDF_WORKERS", 1)
+    monkeypatch.setattr(ocrmod, "_PDF_OCR_POOL", ocrmod.ThreadPoolExecutor(max_workers=1))
+
+    pred = ocrmod.KIE.infer_image(_image_pdf(2))
+    assert len(calls) == 2
+    assert sorted(l["labelRaw"] for l in pred["lines"]) == ["LATTE", "PANE"]
+
+
+def test_pages_past_the_limit_are_reported_as_truncated(monkeypatch):
+    calls = []
+
+    def fake_image_to_data(img, output_type=None, config=None, lang=None):
+        calls.append(img.size)
+        return {
+            "text": ["LATTE 1,29"], "block_num": [1], "par_num": [1], "line_num": [1],
+            "left": [10], "top": [5], "width": [200], "height": [30],
+        }
+
+    monkeypatch.setattr(ocrmod.pytesseract, "image_to_data", fake_image_to_data)
+    monkeypatch.setattr(ocrmod, "OCR_STUB_ENABLED", False)
+    monkeypatch.setattr(ocrmod.pdf_input, "PDF_WORKERS", 1)
+    monkeypatch.setattr(ocrmod.pdf_input, "PDF_MAX_PAGES", 2)
+    monkeypatch.setattr(ocrmod, "_PDF_OCR_POOL", ocrmod.ThreadPoolExecutor(max_workers=1))
+    client = TestClient(ocrmod.app)
+    files = {"file": ("r.pdf", _image_pdf(3), "application/pdf")}
+
+    body = client.post("/extract", files=files).json()
+    assert [p["page"] for p in body["pages"]] == [1, 2]
+    assert body["pageCount"] == 3 and body["truncated"] is True
+
+    r = client.post("/extract/stream", files=files)
+    events = [json.loads(l) for l in r.text.splitlines() if l.strip()]
+    assert [e["page"] for e in events if e["event"] == "page"] == [1, 2]
+    assert events[-1]["pageCount"] == 3 and events[-1]["truncated"] is True
+    assert len(calls) == 4
+
+
+def test_pdf_dpi_outside_range_is_rejected():
+    client = TestClient(ocrmod.app)
+    data = _text_pdf(["LATTE UHT 1L 1,29", "TOTALE 1,29"])
+    for path in ("/extract", "/extract/stream"):
+        for dpi in (0, 71, 601, 10000):
+            r = client.post(f"{path}?dpi={dpi}", files={"file": ("r.pdf", data, "application/pdf")})
+            assert r.status_code == 422
+    assert client.post("/extract?dpi=300", files={"file": ("r.pdf", data, "application/pdf")}).status_code == 200
@@ -1,3 +1,4 @@
 from .redis_logger import RedisLogger, LogSeverity
+from .normalize import normalize_label
 
-__all__ = ["RedisLogger", "LogSeverity"]
+__all__ = ["RedisLogger", "LogSeverity", "normalize_label"]
@@ -0,0 +1,86 @@
+"""Canonical form of receipt labels, shared by the OCR parser and the ML service.
+
+The same product reaches the services as "LATTE P.S. 1 L", "Latte PS 1l" or "LATTE PS 1 LT";
+normalize_label maps all of them to "latte ps 1l", so the vectorizer, the cache, feedback
+aggregation and the neighbour index see one input instead of three. Steps, in order:
+
+  1. casefold, then one str.translate pass (precompiled table): accents dropped, punctuation
+     other than . , and % turned into spaces;
+  2. dotted abbreviations joined ("p.s." -> "ps", "s.p.a." -> "spa");
+  3. OCR confusions fixed by context: O/S inside a quantity become digits ("5OOG" -> "500g"),
+     0/5 inside a word of three or more characters, at least two of them letters, become
+     letters ("C0OP" -> "coop", "BISC0TTI" -> "biscotti"); short codes like "B5", "A5" stay;
+  4. decimal commas become dots ("1,5" -> "1.5"), any other . or , becomes a space;
+  5. units, % included, attached to their number and spelled one way ("1 LT" -> "1l",
+     "500 GR" -> "500g", "6 X 1,5 L" -> "6x1.5l", "5 %" -> "5%");
+  6. whitespace folded.
+
+The result is idempotent (normalizing it again changes nothing). Receipts repeat the same
+labels all day, so results are memoized in a bounded LRU.
+"""
+import os
+import re
+from functools import lru_cache
+
+# Distinct labels whose normalized form is memoized (LRU)
+NORMALIZE_CACHE_SIZE = int(os.getenv("LABEL_NORMALIZE_CACHE", "65536"))
+
+_ACCENTS = {"à": "a", "á": "a", "â": "a", "ä": "a", "è": "e", "é": "e", "ê": "e", "ë": "e", "ì": "i", "í": "i",
+            "î": "i", "ï": "i", "ò": "o", "ó": "o", "ô": "o", "ö": "o", "ù": "u", "ú": "u", "û": "u", "ü": "u",
+            "ç": "c", "ñ": "n"}
+# Every punctuation/symbol a receipt line may carry, except . and , which depend on context and %
+# which is a unit ("birra 5%")
+_SEPARATORS = "!\"#$&'()*+-/:;<=>?@[\\]^_`{|}~‘’“”´·•€£°"
+_TABLE = str.maketrans({**_ACCENTS, **{ch: " " for ch in _SEPARATORS}})
+
+_UNITS = {
+    "l": "l", "lt": "l", "lit": "l", "litro": "l", "litri": "l",
+    "ml": "ml", "cl": "cl", "dl": "dl",
+    "g": "g", "gr": "g", "grammi": "g",
+    "hg": "hg", "etto": "hg", "etti": "hg",
+    "kg": "kg", "chilo": "kg", "chili": "kg",
+    "pz": "pz", "pezzi": "pz",
+    "%": "%",
+}
+_UNIT_ALT = "|".join(sorted(_UNITS, key=len, reverse=True))
+
+_ABBREVIATION = re.compile(r"\b[a-z](?:\.[a-z])+\b\.?")
+# A quantity with at least one real digit and at least one O/S read instead of 0/5, optionally
+# followed by a unit: "5oo", "1o0g", "o,5l"
+_QUANTITY_OCR = re.compile(rf"(?<![a-z0-9.,])(?=[0-9os.,]*[0-9])(?=[0-9.,]*[os])[0-9os]+(?:[.,][0-9os]+)?"
+                           rf"(?=(?:{_UNIT_ALT})?(?![a-z0-9]))")
+# A word with letters and 0/5 but no other digit: "c0op", "b5"
+_WORD_OCR = re.compile(r"(?<![a-z0-9.,])(?=[a-z05]*[05])(?=[05]*[a-z])[a-z05]+(?![a-z0-9.,])")
+# ...unless it is a number with its unit ("5l", "50g", "5x")
+_AMOUNT = re.compile(rf"[05]+(?:{_UNIT_ALT}|x)")
+_DECIMAL = re.compile(r"(?<=[0-9]),(?=[0-9])")
+_LOOSE_PUNCT = re.compile(r"(?<![0-9])\.|\.(?![0-9])|,")
+_UNIT = re.compile(rf"(?<=[0-9])\s*({_UNIT_ALT})(?![a-z])")
+_MULTIPACK = re.compile(r"(?<=[0-9])\s*x\s*(?=[0-9])|(?<![a-z0-9])x\s+(?=[0-9])")
+_TO_DIGITS = str.maketrans("os", "05")
+_TO_LETTERS = str.maketrans("05", "os")
+
+
+def _fix_word(m: "re.Match") -> str:
+    word = m.group()
+    letters = sum(ch.isalpha() for ch in word)
+    # "b5" (vitamin), "a5" (paper size), "e5" or "b50" are codes rather than misread words:
+    # only fix mostly-letter tokens of three or more characters with at least two letters
+    if len(word) < 3 or letters < 2 or letters < len(word) - letters or _AMOUNT.fullmatch(word):
+        return word
+    return word.translate(_TO_LETTERS)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_label(text: str) -> str:
+    """Canonical form of a label or brand (see the module docstring); "" for empty input."""
+    if not text:
+        return ""
+    s = text.casefold().translate(_TABLE)
+    s = _ABBREVIATION.sub(lambda m: m.group().replace(".", ""), s)
+    s = _QUANTITY_OCR.sub(lambda m: m.group().translate(_TO_DIGITS), s)
+    s = _WORD_OCR.sub(_fix_word, s)
+    s = _LOOSE_PUNCT.sub(" ", _DECIMAL.sub(".", s))
+    s = _UNIT.sub(lambda m: _UNITS[m.group(1)], s)
+    s = _MULTIPACK.sub("x", s)
+    return " ".join(s.split())